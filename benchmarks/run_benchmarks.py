@@ -0,0 +1,326 @@
+"""Throughput benchmarks on synthetic transcripts and lexicons
+
+Generates a corpus of each requested size (see `features.synthetic`), times
+every stage of the pipeline on it and writes the results as JSON, e.g.,
+
+    python benchmarks/run_benchmarks.py --sizes 10 100 --out results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+
+With `--baseline`, every benchmark is compared against the stored results and
+the run fails (exit code 1) if any of them got slower than `--tolerance`.
+"""
+
+import argparse
+import copy
+import functools
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../psynlp"))
+
+import numpy as np
+
+from features import columnar
+from features import featurizers
+from features import parse
+from features import synthetic
+from features import utils
+from features import vocab
+
+FORMAT_VERSION = 1
+
+
+def time_it(
+    fn: Callable[[object], None],
+    setup: Callable[[], object] = lambda: None,
+    repeats: int = 3,
+) -> Dict[str, float]:
+    """Wall-clock time of `fn(setup())` over several runs; setup isn't timed"""
+    timings = []
+    for _ in range(repeats):
+        state = setup()
+        start = time.perf_counter()
+        fn(state)
+        timings.append(time.perf_counter() - start)
+    return {
+        "best": min(timings),
+        "median": float(np.median(timings)),
+        "repeats": repeats,
+    }
+
+
+def _read_transcripts(paths: List[str]) -> List[featurizers.Transcript]:
+    transcripts = []
+    for path_to_transcript in paths:
+        session_id, session_num = utils.extract_metadata_from_path(path_to_transcript)
+        transcript = featurizers.Transcript(
+            session_id=session_id, session_num=session_num, fpath=path_to_transcript
+        )
+        for person, time_in_mins, text in zip(
+            *utils.read_transcript(path_to_transcript)
+        ):
+            transcript.lines.append(
+                featurizers.Line(speaker=person, start_time=time_in_mins, text=text)
+            )
+        transcripts.append(transcript)
+    return transcripts
+
+
+def run_benchmarks(
+    work_dir: str,
+    num_sessions: int,
+    turns_per_session: int,
+    seed: int,
+    repeats: int,
+    workers: int,
+) -> List[Dict]:
+    """Run every benchmark on a corpus of `num_sessions` synthetic sessions"""
+    path_to_liwc, path_to_emolex = synthetic.write_lexicons(
+        os.path.join(work_dir, "lexicons"), seed=seed
+    )
+    paths = synthetic.write_corpus(
+        os.path.join(work_dir, f"corpus_{num_sessions}"),
+        num_sessions,
+        turns_per_session=turns_per_session,
+        seed=seed,
+    )
+    featurizer_objs = parse.build_featurizers(path_to_liwc, path_to_emolex)
+    transcripts = _read_transcripts(paths)
+    for transcript in transcripts:
+        transcript.postprocess()
+    num_lines = sum(len(transcript.lines) for transcript in transcripts)
+    featurized = copy.deepcopy(transcripts)
+    for transcript in featurized:
+        transcript.calculate_features(featurizer_objs)
+
+    def fresh_lines():
+        # Copies drop the cached token views, as in a real run
+        return [copy.deepcopy(transcript.lines) for transcript in transcripts]
+
+    def encoded_lines():
+        # As in `Transcript.calculate_features`, lexicon featurizers share
+        # the ids of every transcript, which are benchmarked as encode_ids
+        line_ids_per_transcript = [vocab.LineIds(lines) for lines in fresh_lines()]
+        for line_ids in line_ids_per_transcript:
+            line_ids.tokens, line_ids.pieces
+        return line_ids_per_transcript
+
+    def write_columnar(_):
+        with tempfile.TemporaryDirectory(dir=work_dir) as out_dir:
+            with columnar.ColumnarWriter(
+                out_dir, featurizers.feature_schema(featurizer_objs)
+            ) as writer:
+                for transcript in featurized:
+                    writer.write_transcript(transcript)
+
+    def run_pipeline(num_workers):
+        def run(_):
+            with open(os.path.join(work_dir, "out.tsv"), mode="w") as f:
+                for _, transcript, error in parse.parse_transcripts(
+                    paths,
+                    build_featurizers_fn=functools.partial(
+                        parse.build_featurizers, path_to_liwc, path_to_emolex
+                    ),
+                    workers=num_workers,
+                    featurizer_objs=featurizer_objs,
+                ):
+                    if error is not None:
+                        raise RuntimeError(error)
+                    transcript.to_tsv(out=f)
+
+        return run
+
+    benchmarks = {
+        "read_transcripts": (lambda _: _read_transcripts(paths), None),
+        "postprocess": (
+            lambda copies: [transcript.postprocess() for transcript in copies],
+            lambda: _read_transcripts(paths),
+        ),
+        "calculate_features": (
+            lambda copies: [
+                transcript.calculate_features(featurizer_objs) for transcript in copies
+            ],
+            lambda: copy.deepcopy(transcripts),
+        ),
+        "to_tsv": (
+            lambda _: [
+                transcript.to_tsv(out=io.StringIO()) for transcript in featurized
+            ],
+            None,
+        ),
+        "columnar": (write_columnar, None),
+        "pickle": (
+            lambda _: [pickle.dumps(transcript) for transcript in featurized],
+            None,
+        ),
+        "pipeline[workers=1]": (run_pipeline(1), None),
+    }
+    benchmarks["encode_ids"] = (
+        lambda lines_per_transcript: [
+            (line_ids.tokens, line_ids.pieces)
+            for line_ids in map(vocab.LineIds, lines_per_transcript)
+        ],
+        fresh_lines,
+    )
+    for featurizer_obj in featurizer_objs:
+        if featurizer_obj.uses_vocab:
+            benchmarks["featurize/" + featurizer_obj.profile_name()] = (
+                lambda line_ids_per_transcript, featurizer_obj=featurizer_obj: [
+                    featurizer_obj.featurize_ids(line_ids)
+                    for line_ids in line_ids_per_transcript
+                ],
+                encoded_lines,
+            )
+            continue
+        benchmarks["featurize/" + featurizer_obj.profile_name()] = (
+            lambda lines_per_transcript, featurizer_obj=featurizer_obj: [
+                featurizer_obj.featurize_batch(lines) for lines in lines_per_transcript
+            ],
+            fresh_lines,
+        )
+    if workers > 1:
+        benchmarks[f"pipeline[workers={workers}]"] = (run_pipeline(workers), None)
+
+    results = []
+    for name, (fn, setup) in benchmarks.items():
+        timing = time_it(fn, setup or (lambda: None), repeats=repeats)
+        results.append(
+            {
+                "name": name,
+                "sessions": num_sessions,
+                "lines": num_lines,
+                **timing,
+                "lines_per_second": num_lines / timing["best"],
+            }
+        )
+        print(
+            f"{name:<44} {num_sessions:>6} sessions {timing['best']:>9.4f}s"
+            f" {num_lines / timing['best']:>12.0f} lines/s"
+        )
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> bool:
+    """Print the change of every benchmark against the baseline
+
+    Returns:
+        False if any benchmark is more than `tolerance` (a fraction) slower
+    """
+    baseline_times = {
+        (result["name"], result["sessions"]): result["best"] for result in baseline
+    }
+    ok = True
+    for result in results:
+        key = (result["name"], result["sessions"])
+        if key not in baseline_times:
+            continue
+        ratio = result["best"] / baseline_times[key]
+        regressed = ratio > 1 + tolerance
+        ok = ok and not regressed
+        print(
+            f"{result['name']:<44} {result['sessions']:>6} sessions"
+            f" {ratio:>7.2f}x baseline time{'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 50, 200],
+        help="Corpus sizes (number of sessions) to benchmark",
+    )
+    parser.add_argument(
+        "--turns_per_session",
+        type=int,
+        default=400,
+        help="Average number of talk turns per synthetic session",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Also benchmark the pipeline with this many worker processes",
+    )
+    parser.add_argument(
+        "--out", type=str, default=None, help="Where to write the results as JSON"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="JSON results of an earlier run to compare against",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Slowdown (as a fraction) relative to the baseline that counts as"
+        " a regression",
+    )
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for num_sessions in args.sizes:
+            results += run_benchmarks(
+                work_dir,
+                num_sessions,
+                args.turns_per_session,
+                args.seed,
+                args.repeats,
+                args.workers,
+            )
+
+    report = {
+        "format_version": FORMAT_VERSION,
+        "meta": {
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "turns_per_session": args.turns_per_session,
+            "repeats": args.repeats,
+        },
+        "results": results,
+    }
+    if args.out is not None:
+        with open(args.out, mode="w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote results to {args.out}")
+    if args.baseline is not None:
+        with open(args.baseline, mode="r") as f:
+            baseline = json.load(f)
+        if not compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,258 @@
+"""Session-, speaker- and quintile-level summaries of featurized transcripts
+
+Rather than pivoting the long-format .tsv, summaries are computed from the
+arrays of each featurized `Transcript`: every line is assigned to a group
+(session, speaker and time quintile) and all feature columns are summed per
+group at once. Coarser levels are rolled up from those groups, so every line
+is only visited once.
+
+There are three summary levels:
+
+    session     one row per session
+    speaker     one row per (session, speaker)
+    quintile    one row per (session, speaker, quintile), where quintile k
+                covers the k-th fifth of the session's duration
+
+Each row has the number of lines and words of the group, the minutes spoken
+(the summed durations of its lines) and, for every feature, its sum and mean.
+Count features (e.g., the number of hedges) also get rates per word and per
+minute spoken.
+"""
+
+import csv
+import os
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from features import featurizers
+
+LEVELS = ("session", "speaker", "quintile")
+_LEVEL_KEYS = {
+    "session": ("session_id",),
+    "speaker": ("session_id", "speaker"),
+    "quintile": ("session_id", "speaker", "quintile"),
+}
+# Totals kept per group besides the feature sums
+TOTALS = ("num_lines", "num_words", "minutes")
+
+
+def time_quintiles(
+    start_times: np.ndarray, end_times: np.ndarray, num_quintiles: int = 5
+) -> np.ndarray:
+    """Index of the time quintile (0 to num_quintiles - 1) each line starts in
+
+    Quintiles split the session from its first start time to its last end (or
+    start) time into equal parts. Without usable time stamps lines are split
+    into equal parts by position instead.
+    """
+    num_lines = len(start_times)
+    if num_lines == 0:
+        return np.zeros(0, dtype=np.int64)
+    duration = np.nan
+    if not np.isnan(start_times).any():
+        session_start = np.min(start_times)
+        duration = np.nanmax(np.concatenate([start_times, end_times])) - session_start
+    if duration > 0:
+        positions = (start_times - session_start) / duration
+    else:
+        positions = np.arange(num_lines) / num_lines
+    return np.minimum((positions * num_quintiles).astype(np.int64), num_quintiles - 1)
+
+
+def summary_columns(
+    schema: featurizers.FeatureSchema,
+    totals: np.ndarray,
+    sums: np.ndarray,
+    counts: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Summary columns of groups given their totals and feature sums
+
+    Args:
+        schema: Features of the `sums` and `counts` columns
+        totals: (groups x 3) number of lines, words and minutes of each group
+        sums: (groups x features) sum of every feature over the group's lines
+        counts: (groups x features) number of lines where the feature is known
+    """
+    columns: Dict[str, np.ndarray] = {}
+    columns["num_lines"] = totals[:, 0].astype(np.int64)
+    columns["num_words"] = totals[:, 1].astype(np.int64)
+    columns["minutes"] = totals[:, 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+        per_word = sums / totals[:, 1:2]
+        per_minute = sums / totals[:, 2:3]
+    for col, (name, dtype) in enumerate(schema.columns()):
+        columns[f"{name}_sum"] = sums[:, col]
+        columns[f"{name}_mean"] = means[:, col]
+        if dtype is int:
+            columns[f"{name}_per_word"] = np.where(
+                totals[:, 1] > 0, per_word[:, col], np.nan
+            )
+            columns[f"{name}_per_minute"] = np.where(
+                totals[:, 2] > 0, per_minute[:, col], np.nan
+            )
+    return columns
+
+
+class SummaryAccumulator(object):
+    """Accumulates per-group sums over many featurized transcripts
+
+    Add transcripts with `add` (or `add_arrays`), then build tables with
+    `table` or write them all with `write`.
+    """
+
+    def __init__(self, schema: featurizers.FeatureSchema, num_quintiles: int = 5):
+        self.schema = schema
+        self.num_quintiles = num_quintiles
+        self._session_ids: List[str] = []
+        self._speakers: List[str] = []
+        self._quintiles: List[np.ndarray] = []
+        self._totals: List[np.ndarray] = []
+        self._sums: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+
+    def add(self, transcript: featurizers.Transcript):
+        if transcript.feature_matrix is None:
+            raise ValueError("Transcript has no features; call calculate_features")
+        transcript.compute_pending_features(self.schema.names)
+        cols = [transcript.schema.index[name] for name in self.schema.names]
+        self.add_arrays(
+            str(transcript.session_id),
+            transcript.speakers,
+            transcript.speaker_codes,
+            transcript.start_times,
+            transcript.end_times,
+            transcript.word_counts,
+            transcript.feature_matrix[:, cols],
+        )
+
+    def add_arrays(
+        self,
+        session_id: str,
+        speakers: Sequence[str],
+        speaker_codes: np.ndarray,
+        start_times: np.ndarray,
+        end_times: np.ndarray,
+        word_counts: np.ndarray,
+        feature_matrix: np.ndarray,
+    ):
+        """Add one session given as arrays with one entry (or row) per line
+
+        Args:
+            session_id: ID of the session
+            speakers: Speaker of each code in `speaker_codes`
+            speaker_codes: Index into `speakers` for every line
+            start_times: Start times in minutes (NaN when unknown)
+            end_times: End times in minutes (NaN when unknown)
+            word_counts: Number of words of every line
+            feature_matrix: One column per feature of the accumulator's schema
+        """
+        if len(start_times) == 0:
+            return
+        num_groups = len(speakers) * self.num_quintiles
+        group_ids = speaker_codes * self.num_quintiles + time_quintiles(
+            start_times, end_times, self.num_quintiles
+        )
+        durations = np.nan_to_num(end_times - start_times)
+        totals = np.zeros((num_groups, len(TOTALS)))
+        np.add.at(
+            totals,
+            group_ids,
+            np.column_stack([np.ones(len(group_ids)), word_counts, durations]),
+        )
+        is_known = ~np.isnan(feature_matrix)
+        sums = np.zeros((num_groups, feature_matrix.shape[1]))
+        np.add.at(sums, group_ids, np.where(is_known, feature_matrix, 0.0))
+        counts = np.zeros((num_groups, feature_matrix.shape[1]))
+        np.add.at(counts, group_ids, is_known)
+
+        # Only keep the groups that have lines
+        present = np.flatnonzero(totals[:, 0])
+        self._session_ids.extend([session_id] * len(present))
+        self._speakers.extend(
+            speakers[group_id // self.num_quintiles] for group_id in present.tolist()
+        )
+        self._quintiles.append(present % self.num_quintiles)
+        self._totals.append(totals[present])
+        self._sums.append(sums[present])
+        self._counts.append(counts[present])
+
+    def _rolled_up(
+        self, level: str
+    ) -> Tuple[Dict[str, list], np.ndarray, np.ndarray, np.ndarray]:
+        """Keys, totals, feature sums and feature counts of every group"""
+        num_features = len(self.schema)
+        if not self._totals:
+            empty = np.zeros((0, num_features))
+            keys = {name: [] for name in _LEVEL_KEYS[level]}
+            return keys, np.zeros((0, len(TOTALS))), empty, empty
+        quintiles = np.concatenate(self._quintiles).tolist()
+        key_columns = {
+            "session_id": self._session_ids,
+            "speaker": self._speakers,
+            "quintile": quintiles,
+        }
+        group_keys = list(zip(*(key_columns[name] for name in _LEVEL_KEYS[level])))
+        group_index: Dict[tuple, int] = {}
+        group_ids = np.array(
+            [group_index.setdefault(key, len(group_index)) for key in group_keys],
+            dtype=np.int64,
+        )
+        rolled_up = []
+        for parts in (self._totals, self._sums, self._counts):
+            values = np.concatenate(parts)
+            out = np.zeros((len(group_index), values.shape[1]))
+            np.add.at(out, group_ids, values)
+            rolled_up.append(out)
+        keys = {
+            name: [key[i] for key in group_index]
+            for i, name in enumerate(_LEVEL_KEYS[level])
+        }
+        return (keys, *rolled_up)
+
+    def table(self, level: str) -> Dict[str, Sequence]:
+        """Summary table of one of `LEVELS` as a mapping of column -> values"""
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level '{level}', expected one of {LEVELS}")
+        keys, totals, sums, counts = self._rolled_up(level)
+        table: Dict[str, Sequence] = dict(keys)
+        table.update(summary_columns(self.schema, totals, sums, counts))
+        return table
+
+    def to_dataframe(self, level: str):
+        import pandas as pd
+
+        return pd.DataFrame(self.table(level))
+
+    def write(self, out_dir: str, levels: Optional[Sequence[str]] = None) -> List[str]:
+        """Write each summary table to `<out_dir>/<level>.tsv`
+
+        Missing values (e.g., the mean of a feature no line of the group has)
+        are written as empty fields.
+
+        Returns:
+            The paths of the written tables
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for level in levels if levels is not None else LEVELS:
+            table = self.table(level)
+            columns = []
+            for values in table.values():
+                values = np.asarray(values)
+                formatted = values.astype(str)
+                if values.dtype.kind == "f":
+                    formatted[np.isnan(values)] = ""
+                columns.append(formatted.tolist())
+            path = os.path.join(out_dir, f"{level}.tsv")
+            with open(path, mode="w", newline="") as f:
+                writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+                writer.writerow(table.keys())
+                writer.writerows(zip(*columns))
+            paths.append(path)
+        return paths
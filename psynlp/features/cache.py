@@ -0,0 +1,156 @@
+"""Per-transcript cache of featurized transcripts
+
+Every transcript is cached in its own pickle file, keyed by a hash of
+everything its featurized result depends on: the transcript file's content
+and name, the parser settings and the signatures of the featurizers. A run
+only has to process transcripts that are new or changed (or that were
+featurized differently), and cached ones are loaded one at a time.
+
+Entries are stored as `<cache_dir>/<key[:2]>/<key>.pkl`.
+"""
+
+import collections
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Iterable
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+
+from features import featurizers
+
+CacheStats = collections.namedtuple(
+    "CacheStats", ["entries", "bytes", "hits", "misses", "writes"]
+)
+
+
+def featurizers_signature(featurizer_objs: Iterable[featurizers.Featurizer]) -> str:
+    """Hash of the signatures of all featurizers, in order"""
+    sha = hashlib.sha256()
+    for featurizer_obj in featurizer_objs:
+        sha.update(featurizer_obj.signature().encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+class TranscriptCache(object):
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @staticmethod
+    def key(
+        path_to_transcript: str,
+        featurizers_hash: str,
+        settings: Optional[Mapping[str, str]] = None,
+    ) -> str:
+        """Cache key for featurizing a transcript
+
+        Args:
+            path_to_transcript: Path to the transcript; its content and file
+                name (which the session metadata is parsed from) are hashed
+            featurizers_hash: See `featurizers_signature`
+            settings: Any parser settings that affect the result
+
+        Raises:
+            OSError: If the transcript can't be read
+        """
+        sha = hashlib.sha256()
+        with open(path_to_transcript, mode="rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        sha.update(b"\0" + os.path.basename(path_to_transcript).encode("utf-8"))
+        sha.update(b"\0" + featurizers_hash.encode("utf-8"))
+        for name, value in sorted((settings or {}).items()):
+            sha.update(f"\0{name}={value}".encode("utf-8"))
+        return sha.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[featurizers.Transcript]:
+        """The cached transcript, or None on a miss
+
+        Entries that can't be unpickled (corrupted, or stale ones pickled by
+        an older version of the code) count as misses and are deleted.
+        """
+        path = self._path(key)
+        try:
+            with open(path, mode="rb") as f:
+                transcript = pickle.load(f)
+        except OSError:
+            self.misses += 1
+            return None
+        except (
+            EOFError,
+            pickle.UnpicklingError,
+            AttributeError,
+            TypeError,
+            ValueError,
+            ImportError,
+        ):
+            self.misses += 1
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        self.hits += 1
+        return transcript
+
+    def put(self, key: str, transcript: featurizers.Transcript):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, mode="wb") as f:
+                pickle.dump(transcript, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.writes += 1
+
+    def _iter_entries(self) -> Iterable[Tuple[str, str]]:
+        """(key, path) of every entry in the cache directory"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for sub_dir in sorted(os.listdir(self.cache_dir)):
+            sub_path = os.path.join(self.cache_dir, sub_dir)
+            if not os.path.isdir(sub_path):
+                continue
+            for fname in sorted(os.listdir(sub_path)):
+                if fname.endswith(".pkl"):
+                    yield fname[: -len(".pkl")], os.path.join(sub_path, fname)
+
+    def stats(self) -> CacheStats:
+        num_entries = 0
+        num_bytes = 0
+        for _, path in self._iter_entries():
+            num_entries += 1
+            num_bytes += os.path.getsize(path)
+        return CacheStats(num_entries, num_bytes, self.hits, self.misses, self.writes)
+
+    def prune(self, keep_keys: Iterable[str]) -> Tuple[int, int]:
+        """Delete every entry whose key isn't in keep_keys
+
+        Returns:
+            The number of entries and bytes removed
+        """
+        keep_keys = set(keep_keys)
+        num_removed = 0
+        num_bytes_removed = 0
+        for key, path in self._iter_entries():
+            if key not in keep_keys:
+                num_bytes_removed += os.path.getsize(path)
+                os.remove(path)
+                num_removed += 1
+        return num_removed, num_bytes_removed
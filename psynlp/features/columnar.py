@@ -0,0 +1,317 @@
+"""Columnar (wide-format) feature output
+
+The long-format .tsv repeats the session id, line id, speaker, times and text
+of a line once per feature. The columnar format instead stores one row per
+`Line` and one typed column per feature, each column in its own .npy file so
+it loads without any parsing (and can be memory-mapped):
+
+    <out_dir>/
+        meta.json                 number of rows, features and their dtypes
+        lines/start_time.npy      float64, NaN when unknown
+        lines/end_time.npy        float64, NaN when unknown
+        lines/session_id.*        string columns (see below)
+        lines/line_id.*
+        lines/speaker.*
+        features/<feature>.npy    one column per feature
+        text/line_id.*            the line text table, keyed by line_id
+        text/text.*
+
+A string column `<name>` is stored as `<name>.data.npy`, the UTF-8 bytes of
+all values concatenated, and `<name>.offsets.npy`, where value i spans
+`data[offsets[i]:offsets[i + 1]]`.
+"""
+
+import json
+import os
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+LINE_STRING_COLUMNS = ("session_id", "line_id", "speaker")
+LINE_TIME_COLUMNS = ("start_time", "end_time")
+
+# Room for the .npy header of any 1-D array; written for real on close
+_NPY_HEADER_SIZE = 128
+
+
+def _npy_header(dtype: np.dtype, num_rows: int) -> bytes:
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+        np.lib.format.dtype_to_descr(dtype),
+        num_rows,
+    )
+    magic = np.lib.format.magic(1, 0)
+    header_len = _NPY_HEADER_SIZE - len(magic) - 2
+    return (
+        magic
+        + header_len.to_bytes(2, "little")
+        + (header.ljust(header_len - 1) + "\n").encode("latin1")
+    )
+
+
+class NpyAppender(object):
+    """Streams a 1-D array to a .npy file without holding it in memory"""
+
+    def __init__(self, path: str, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.num_rows = 0
+        self._f = open(path, mode="wb")
+        self._f.write(_npy_header(self.dtype, 0))
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype)
+        self._f.write(values.tobytes())
+        self.num_rows += len(values)
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.seek(0)
+        self._f.write(_npy_header(self.dtype, self.num_rows))
+        self._f.close()
+
+
+class StringColumnAppender(object):
+    """Streams a column of strings as concatenated UTF-8 bytes plus offsets"""
+
+    def __init__(self, path_prefix: str):
+        self._data = NpyAppender(path_prefix + ".data.npy", np.uint8)
+        self._offsets = NpyAppender(path_prefix + ".offsets.npy", np.int64)
+        self._offsets.append([0])
+        self._num_bytes = 0
+
+    def append(self, values: Iterable[str]):
+        encoded = [value.encode("utf-8") for value in values]
+        ends = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+        self._offsets.append(self._num_bytes + ends)
+        self._num_bytes += int(ends[-1]) if len(ends) else 0
+        self._data.append(np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def append_encoded(self, data: np.ndarray, lengths: np.ndarray):
+        """Append already encoded values, given as their bytes and lengths"""
+        self._offsets.append(self._num_bytes + np.cumsum(lengths, dtype=np.int64))
+        self._num_bytes += len(data)
+        self._data.append(data)
+
+    def close(self):
+        self._data.close()
+        self._offsets.close()
+
+
+class ColumnarWriter(object):
+    """Writes featurized transcripts, one after another, in columnar format"""
+
+    def __init__(self, out_dir: str, schema: Sequence[Tuple[str, type]]):
+        """
+        Args:
+            out_dir: Directory to write the columns to
+            schema: (feature name, dtype) for every feature column, e.g., as
+                returned by `featurizers.feature_schema`
+        """
+        self.out_dir = out_dir
+        self.schema = [(name, np.dtype(dtype)) for name, dtype in schema]
+        self.num_rows = 0
+        for sub_dir in ("lines", "features", "text"):
+            os.makedirs(os.path.join(out_dir, sub_dir), exist_ok=True)
+        self._strings = {
+            name: StringColumnAppender(os.path.join(out_dir, "lines", name))
+            for name in LINE_STRING_COLUMNS
+        }
+        self._times = {
+            name: NpyAppender(os.path.join(out_dir, "lines", name + ".npy"), np.float64)
+            for name in LINE_TIME_COLUMNS
+        }
+        self._features = {
+            name: NpyAppender(os.path.join(out_dir, "features", name + ".npy"), dtype)
+            for name, dtype in self.schema
+        }
+        self._text = {
+            name: StringColumnAppender(os.path.join(out_dir, "text", name))
+            for name in ("line_id", "text")
+        }
+
+    def write_transcript(self, transcript):
+        transcript.compute_pending_features()
+        lines = transcript.lines
+        if not lines:
+            return
+        line_ids = [line.line_id for line in lines]
+        self._strings["session_id"].append([str(transcript.session_id)] * len(lines))
+        self._strings["line_id"].append(line_ids)
+        self._strings["speaker"].append([line.speaker for line in lines])
+        if transcript.feature_matrix is not None:
+            # Featurized transcripts already hold every column as an array
+            self._times["start_time"].append(transcript.start_times)
+            self._times["end_time"].append(transcript.end_times)
+            for name, _ in self.schema:
+                col = transcript.schema.index[name]
+                self._features[name].append(transcript.feature_matrix[:, col])
+        else:
+            for name, appender in self._times.items():
+                appender.append([_to_float(getattr(line, name)) for line in lines])
+            for name, dtype in self.schema:
+                values = [line.features[name] for line in lines]
+                if dtype.kind == "f":
+                    values = [_to_float(value) for value in values]
+                self._features[name].append(values)
+        self._text["line_id"].append(line_ids)
+        self._text["text"].append([line.text for line in lines])
+        self.num_rows += len(lines)
+
+    def close(self):
+        appenders = [
+            *self._strings.values(),
+            *self._times.values(),
+            *self._features.values(),
+            *self._text.values(),
+        ]
+        for appender in appenders:
+            appender.close()
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "num_rows": self.num_rows,
+            "features": [[name, dtype.str] for name, dtype in self.schema],
+        }
+        with open(os.path.join(self.out_dir, "meta.json"), mode="w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _to_float(value) -> float:
+    return np.nan if value is None else value
+
+
+def read_meta(out_dir: str) -> Dict:
+    with open(os.path.join(out_dir, "meta.json"), mode="r") as f:
+        meta = json.load(f)
+    if meta["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"{out_dir} has format version {meta['format_version']}, "
+            f"expected {FORMAT_VERSION}"
+        )
+    return meta
+
+
+def read_feature(out_dir: str, name: str, mmap: bool = True) -> np.ndarray:
+    return np.load(
+        os.path.join(out_dir, "features", name + ".npy"),
+        mmap_mode="r" if mmap else None,
+    )
+
+
+def read_times(out_dir: str, name: str, mmap: bool = True) -> np.ndarray:
+    """Read the `start_time` or `end_time` column"""
+    return np.load(
+        os.path.join(out_dir, "lines", name + ".npy"), mmap_mode="r" if mmap else None
+    )
+
+
+def read_strings(
+    out_dir: str,
+    name: str,
+    table: str = "lines",
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> List[str]:
+    """Decode a string column, e.g., `read_strings(d, "text", table="text")`
+
+    Only rows `start:stop` (all rows by default) are read, from the
+    memory-mapped column.
+    """
+    data, offsets = _load_strings(os.path.join(out_dir, table, name))
+    stop = stop if stop is not None else len(offsets) - 1
+    offsets = offsets[start : stop + 1].tolist()
+    if not offsets:
+        return []
+    buffer = data[offsets[0] : offsets[-1]].tobytes()
+    return [
+        buffer[begin - offsets[0] : end - offsets[0]].decode("utf-8")
+        for begin, end in zip(offsets[:-1], offsets[1:])
+    ]
+
+
+def _load_strings(path_prefix: str) -> Tuple[np.ndarray, np.ndarray]:
+    return (
+        np.load(path_prefix + ".data.npy", mmap_mode="r"),
+        np.load(path_prefix + ".offsets.npy", mmap_mode="r"),
+    )
+
+
+def concatenate(
+    sources: Sequence[str], slices: Sequence[Tuple[int, int, int]], out_dir: str
+) -> int:
+    """Write row ranges of several columnar outputs, one after another
+
+    The sources are memory-mapped and copied one column and one range at a
+    time, so nothing is loaded into memory as a whole.
+
+    Args:
+        sources: Directories of columnar outputs with the same features
+        slices: (index into `sources`, first row, number of rows) of every
+            range, in output order
+        out_dir: Directory to write the concatenated columns to
+
+    Returns:
+        The number of rows written
+    """
+    schema = read_meta(sources[0])["features"]
+    for source in sources[1:]:
+        if read_meta(source)["features"] != schema:
+            raise ValueError(f"{source} has different features than {sources[0]}")
+    writer = ColumnarWriter(
+        out_dir, [(name, np.dtype(dtype)) for name, dtype in schema]
+    )
+    string_columns = [
+        ("lines", name, writer._strings[name]) for name in writer._strings
+    ]
+    string_columns += [("text", name, writer._text[name]) for name in writer._text]
+    for table, name, appender in string_columns:
+        columns = [_load_strings(os.path.join(src, table, name)) for src in sources]
+        for source, start, num_rows in slices:
+            data, offsets = columns[source]
+            ends = np.asarray(offsets[start : start + num_rows + 1])
+            appender.append_encoded(data[ends[0] : ends[-1]], np.diff(ends))
+    number_columns = [
+        (appender, [read_times(src, name) for src in sources])
+        for name, appender in writer._times.items()
+    ]
+    number_columns += [
+        (appender, [read_feature(src, name) for src in sources])
+        for name, appender in writer._features.items()
+    ]
+    for appender, columns in number_columns:
+        for source, start, num_rows in slices:
+            appender.append(columns[source][start : start + num_rows])
+    writer.num_rows = sum(num_rows for _, _, num_rows in slices)
+    writer.close()
+    return writer.num_rows
+
+
+def to_dataframe(
+    out_dir: str, features: Optional[Sequence[str]] = None, with_text: bool = False
+):
+    """Load the line metadata plus the requested feature columns into pandas"""
+    import pandas as pd
+
+    meta = read_meta(out_dir)
+    if features is None:
+        features = [name for name, _ in meta["features"]]
+    columns = {name: read_strings(out_dir, name) for name in LINE_STRING_COLUMNS}
+    for name in LINE_TIME_COLUMNS:
+        columns[name] = read_times(out_dir, name, mmap=False)
+    for name in features:
+        columns[name] = read_feature(out_dir, name, mmap=False)
+    if with_text:
+        columns["text"] = read_strings(out_dir, "text", table="text")
+    return pd.DataFrame(columns)
@@ -1,3 +1,15 @@
 EMOLEX_PATH = "lexicons/NRC-Emotion-Lexicon-Wordlevel-v0.92.txt"
 LIWC_PATH = "lexicons/LIWC2007_English100131.dic"
 METADATA_PATH = "/vol0/psych_audio/scotty/results/metadata.tsv"
+
+# Format of a talk turn in a transcript, e.g., "P [TIME: 20:15]: I'm sad" means
+# the patient said "I'm sad" 20'15" into the conversation. Edit as needed, but
+# keep the named groups and don't let the pattern match across line breaks.
+LINE_PATTERN = (
+    r"(?P<speaker>[A-Za-z]+)[^\S\n]"
+    r"\[TIME: (?P<minutes>[0-9]+):(?P<seconds>[0-9]+)\]:(?P<text>.*)"
+)
+
+# Speaker codes of the therapist and the patient in the transcripts
+THERAPIST_SPEAKER = "T"
+PATIENT_SPEAKER = "P"
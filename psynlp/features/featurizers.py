@@ -1,9 +1,16 @@
+import io
 import re
+import sys
+from collections.abc import MutableMapping
 from typing import Callable
+from typing import Dict
 from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Mapping
 from typing import Optional
+from typing import Sequence
+from typing import Set
 from typing import Tuple
 from typing import Union
 import time
@@ -13,19 +20,338 @@ import numpy as np
 
 import features
 from features import config
+from features import lexicon
 from features import liwc
+from features import profiling
 from features import utils
+from features import vocab
+
+
+_NOT_PLAIN = object()
+
+
+def _plain_data(value):
+    """A canonical, repr-able version of value, or _NOT_PLAIN"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_plain_data(item) for item in value]
+        if any(item is _NOT_PLAIN for item in items):
+            return _NOT_PLAIN
+        return sorted(items) if isinstance(value, (set, frozenset)) else items
+    if isinstance(value, dict):
+        items = [(_plain_data(k), _plain_data(v)) for k, v in value.items()]
+        if any(k is _NOT_PLAIN or v is _NOT_PLAIN for k, v in items):
+            return _NOT_PLAIN
+        return items
+    return _NOT_PLAIN
 
 
 class Featurizer(object):
+    # Type of the value(s) output by the featurizer; None values are allowed
+    # for float features only, and stand for a missing value
+    feature_dtype: type = float
+    # Number of preceding lines the features of a line depend on (e.g., for
+    # the gap since the previous line), 0 if they only depend on the line
+    context_lines: int = 0
+    # Whether the featurizer counts lexicon hits over vocabulary ids (see
+    # `featurize_ids`), so a transcript's lines are interned once for all
+    # such featurizers
+    uses_vocab: bool = False
+
     def __init__(self, feature_descr: Optional[str] = None):
         self.feature_descr = feature_descr
 
-    def featurize(self) -> Tuple[Union[float, int], str]:
-        return 0, ""
+    @property
+    def feature_descrs(self) -> List[str]:
+        """Names of all the features this featurizer outputs"""
+        return [self.feature_descr]
+
+    def featurize(self, line: "Line" = None) -> Tuple[Union[float, int], str]:
+        """Featurize a line into a (value, descr) pair
+
+        Single-output featurizers implement this. Featurizers that implement
+        `featurize_multi` instead get it for free when configured with a
+        single output.
+
+        Raises:
+            TypeError: If the featurizer has several outputs
+        """
+        if type(self).featurize_multi is Featurizer.featurize_multi:
+            return 0, ""
+        if len(self.feature_descrs) > 1:
+            raise TypeError(
+                f"{type(self).__name__} has several outputs, use featurize_multi"
+            )
+        ((feat_value, feat_descr),) = self.featurize_multi(line)
+        return feat_value, feat_descr
+
+    def signature(self) -> str:
+        """Identifies what this featurizer computes, e.g., for caching results
+
+        Made up of the class name and every attribute holding plain data
+        (strings, numbers and collections of them), such as feature names,
+        term lists and lexicon checksums. Attributes holding other objects,
+        like a loaded lexicon, are left out.
+        """
+        state = {}
+        for name, value in sorted(vars(self).items()):
+            plain_value = _plain_data(value)
+            if plain_value is not _NOT_PLAIN:
+                state[name] = plain_value
+        return f"{type(self).__qualname__}:{state!r}"
+
+    def featurize_multi(self, line: "Line") -> List[Tuple[Union[float, int], str]]:
+        """Featurize a line into one (value, descr) pair per output feature
+
+        Featurizers with more than one output override this rather than
+        `featurize`.
+        """
+        return [self.featurize(line)]
+
+    def profile_name(self) -> str:
+        """Name of the featurizer in profiling reports"""
+        if self.feature_descr is not None:
+            return self.feature_descr
+        feature_descrs = self.feature_descrs
+        if len(feature_descrs) == 1:
+            return f"{type(self).__name__}[{feature_descrs[0]}]"
+        return f"{type(self).__name__}[{feature_descrs[0]}..{feature_descrs[-1]}]"
+
+    def featurize_batch(self, lines: Sequence["Line"]) -> np.ndarray:
+        """Featurize many lines (e.g., a whole transcript) at once
+
+        The default calls `featurize_multi` line by line, or `featurize_ids`
+        if the featurizer `uses_vocab` and implements it; featurizers that can
+        do better (vectorized or in a single compiled pass) override it.
+
+        Returns:
+            A (lines x features) float array with a column per entry of
+            `feature_descrs` (a single column for single-output featurizers),
+            holding NaN for missing values
+        """
+        if self.uses_vocab and type(self).featurize_ids is not Featurizer.featurize_ids:
+            return self.featurize_ids(vocab.LineIds(lines))
+        col_index = {
+            feature_descr: col for col, feature_descr in enumerate(self.feature_descrs)
+        }
+        values = np.full((len(lines), len(col_index)), np.nan)
+        for i, line in enumerate(lines):
+            for feat_value, feat_descr in self.featurize_multi(line):
+                if feat_value is not None:
+                    values[i, col_index[feat_descr]] = feat_value
+        return values
+
+    def featurize_ids(self, line_ids: vocab.LineIds) -> np.ndarray:
+        """Featurize many lines given by their vocabulary ids
+
+        Implemented by featurizers that `uses_vocab`, with the same output as
+        `featurize_batch`. Lexicon tables are compiled against
+        `line_ids.vocabulary` (see `vocab.Vocabulary.table`). The default
+        featurizes the lines with `featurize_batch`, so `uses_vocab` is only
+        a hint that this is faster.
+        """
+        return self.featurize_batch(line_ids.lines)
+
+
+class LazyFeaturizer(Featurizer):
+    """Stands in for a featurizer that is only constructed when first used
+
+    The names and dtype of its features are known up front, so it can be part
+    of a schema without loading any lexicon; the featurizer (and its lexicon)
+    is built the first time it has to compute something.
+
+    Args:
+        feature_descrs: Names of the features the featurizer outputs
+        feature_dtype: Type of their values
+        build: Constructs the featurizer
+    """
+
+    def __init__(
+        self,
+        feature_descrs: Sequence[str],
+        feature_dtype: type,
+        build: Callable[[], Featurizer],
+    ):
+        self.feature_descr = None
+        self.feature_dtype = feature_dtype
+        self._feature_descrs = list(feature_descrs)
+        self._build = build
+        self._featurizer: Optional[Featurizer] = None
+
+    @property
+    def featurizer(self) -> Featurizer:
+        if self._featurizer is None:
+            featurizer_obj = self._build()
+            if featurizer_obj.feature_descrs != self._feature_descrs:
+                raise ValueError(
+                    f"Expected a featurizer of {self._feature_descrs}, built one"
+                    f" of {featurizer_obj.feature_descrs}"
+                )
+            self._featurizer = featurizer_obj
+        return self._featurizer
+
+    @property
+    def is_built(self) -> bool:
+        return self._featurizer is not None
+
+    @property
+    def feature_descrs(self) -> List[str]:
+        return list(self._feature_descrs)
+
+    @property
+    def context_lines(self) -> int:
+        return self.featurizer.context_lines
+
+    @property
+    def uses_vocab(self) -> bool:
+        return self.featurizer.uses_vocab
+
+    def signature(self) -> str:
+        return self.featurizer.signature()
+
+    def profile_name(self) -> str:
+        return self.featurizer.profile_name()
+
+    def featurize(self, line: "Line"):
+        return self.featurizer.featurize(line)
+
+    def featurize_multi(self, line: "Line"):
+        return self.featurizer.featurize_multi(line)
+
+    def featurize_batch(self, lines: Sequence["Line"]) -> np.ndarray:
+        return self.featurizer.featurize_batch(lines)
+
+    def featurize_ids(self, line_ids: vocab.LineIds) -> np.ndarray:
+        return self.featurizer.featurize_ids(line_ids)
+
+
+def feature_schema(featurizer_objs: Iterable[Featurizer]) -> List[Tuple[str, type]]:
+    """(feature name, dtype) of every feature output by the featurizers"""
+    return [
+        (feature_descr, featurizer_obj.feature_dtype)
+        for featurizer_obj in featurizer_objs
+        for feature_descr in featurizer_obj.feature_descrs
+    ]
+
+
+class FeatureSchema(object):
+    """Column layout of transcript feature matrices
+
+    One schema is shared by all transcripts featurized with the same
+    featurizers, mapping each feature name to its column and dtype.
+    """
+
+    __slots__ = ("names", "dtypes", "index")
+
+    def __init__(self, columns: Sequence[Tuple[str, type]]):
+        self.names: List[str] = [name for name, _ in columns]
+        self.dtypes: List[type] = [dtype for _, dtype in columns]
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_featurizers(cls, featurizer_objs: Iterable[Featurizer]) -> "FeatureSchema":
+        return cls(feature_schema(featurizer_objs))
+
+    def columns(self) -> List[Tuple[str, type]]:
+        return list(zip(self.names, self.dtypes))
+
+    def to_value(self, col: int, value: float) -> Optional[Union[float, int]]:
+        """Convert a matrix cell back to what the featurizer returned"""
+        if value != value:  # NaN
+            return None
+        return int(value) if self.dtypes[col] is int else float(value)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, FeatureSchema)
+            and self.names == other.names
+            and self.dtypes == other.dtypes
+        )
+
+    def __getstate__(self):
+        return self.columns()
+
+    def __setstate__(self, columns):
+        self.__init__(columns)
+
+
+class FeatureRow(MutableMapping):
+    """A `Line.features` view onto one row of a transcript's feature matrix"""
+
+    __slots__ = ("_matrix", "_schema", "_row")
+
+    def __init__(self, matrix: np.ndarray, schema: FeatureSchema, row: int):
+        self._matrix = matrix
+        self._schema = schema
+        self._row = row
+
+    def __getitem__(self, feat_descr: str) -> Optional[Union[float, int]]:
+        col = self._schema.index[feat_descr]
+        return self._schema.to_value(col, self._matrix[self._row, col])
+
+    def __setitem__(self, feat_descr: str, feat_value: Optional[Union[float, int]]):
+        if feat_descr not in self._schema.index:
+            raise KeyError(
+                f"'{feat_descr}' is not a column of the transcript's feature matrix"
+            )
+        col = self._schema.index[feat_descr]
+        self._matrix[self._row, col] = np.nan if feat_value is None else feat_value
+
+    def __delitem__(self, feat_descr: str):
+        raise TypeError("Can't delete a column from a transcript's feature matrix")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._schema.names)
+
+    def __len__(self) -> int:
+        return len(self._schema)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class LazyFeatureRow(FeatureRow):
+    """A `FeatureRow` of a lazily featurized transcript
+
+    Reading a feature that hasn't been computed yet runs its featurizer over
+    the whole transcript first (see `Transcript.compute_pending_features`).
+    """
+
+    __slots__ = ("_transcript",)
+
+    def __init__(
+        self,
+        matrix: np.ndarray,
+        schema: FeatureSchema,
+        row: int,
+        transcript: "Transcript",
+    ):
+        super().__init__(matrix, schema, row)
+        self._transcript = transcript
+
+    def __getitem__(self, feat_descr: str) -> Optional[Union[float, int]]:
+        if self._transcript.pending_features:
+            self._transcript.compute_pending_features([feat_descr])
+        return super().__getitem__(feat_descr)
 
 
 class Line(object):
+    __slots__ = (
+        "line_id",
+        "speaker",
+        "start_time",
+        "end_time",
+        "features",
+        "_text",
+        "_tokens",
+        "_lower_tokens",
+        "_word_pieces",
+    )
+
     def __init__(
         self,
         line_id: Optional[str] = None,
@@ -42,10 +368,78 @@ class Line(object):
         self.text = text
         self.features = features if features is not None else dict()
 
+    @classmethod
+    def from_tokens(cls, tokens: List[str], **kwargs) -> "Line":
+        """A line whose text is the tokens joined by single spaces
+
+        The tokens are kept, so they aren't split out of the text again.
+        """
+        line = cls(text=" ".join(tokens), **kwargs)
+        line._tokens = tokens
+        return line
+
+    @property
+    def text(self) -> Optional[str]:
+        return self._text
+
+    @text.setter
+    def text(self, text: Optional[str]):
+        # Drop any token views computed from the previous text
+        self._text = text
+        self._tokens = None
+        self._lower_tokens = None
+        self._word_pieces = None
+
+    @property
+    def tokens(self) -> List[str]:
+        """Whitespace-delimited tokens of the text, computed once"""
+        if self._tokens is None:
+            self._tokens = self._text.split() if self._text is not None else []
+        return self._tokens
+
+    @property
+    def lower_tokens(self) -> List[str]:
+        if self._lower_tokens is None:
+            self._lower_tokens = [token.lower() for token in self.tokens]
+        return self._lower_tokens
+
+    @property
+    def num_words(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def word_pieces(self) -> List[str]:
+        """Lowercased word/non-word pieces of the text used for term matching"""
+        if self._word_pieces is None:
+            text = self._text.lower() if self._text is not None else ""
+            self._word_pieces = features.utils.split_word_pieces(text)
+        return self._word_pieces
+
     def calculate_features(self, featurizer_objs: Iterable[Featurizer]):
         for featurizer_obj in featurizer_objs:
-            feat_value, feat_descr = featurizer_obj.featurize(self)
-            self.features[feat_descr] = feat_value
+            for feat_value, feat_descr in featurizer_obj.featurize_multi(self):
+                self.features[feat_descr] = feat_value
+
+    def __getstate__(self):
+        # Cached token views are cheap to recompute, so don't pickle them
+        return (
+            self.line_id,
+            self.speaker,
+            self.start_time,
+            self.end_time,
+            self._text,
+            self.features,
+        )
+
+    def __setstate__(self, state):
+        (
+            self.line_id,
+            self.speaker,
+            self.start_time,
+            self.end_time,
+            self.text,
+            self.features,
+        ) = state
 
     def __str__(self):
         p_str = f"{self.line_id} " if self.line_id is not None else ""
@@ -64,7 +458,34 @@ class Line(object):
         return p_str
 
 
+TSV_HEADER = [
+    "session_id",
+    "line_id",
+    "speaker",
+    "start_time",
+    "end_time",
+    "feature_descr",
+    "feature_value",
+    "text",
+]
+
+
 class Transcript(object):
+    """A session transcript
+
+    Lines are parsed and postprocessed as `Line` objects. Once features are
+    calculated, the transcript is also held as arrays (one entry per line):
+    `start_times` and `end_times` (NaN when unknown), `word_counts`,
+    `speaker_codes` indexing into `speakers`, and `feature_matrix` with one
+    column per feature as laid out by `schema`. Each line's `features` is then
+    a view onto its row of the feature matrix.
+    """
+
+    # Featurizers of a lazily featurized transcript that haven't run yet, by
+    # column, and the lines' vocabulary ids they will share
+    _pending: Optional[Dict[int, Featurizer]] = None
+    _line_ids: Optional[vocab.LineIds] = None
+
     def __init__(
         self,
         lines: Optional[List[Line]] = None,
@@ -76,12 +497,23 @@ class Transcript(object):
         self.session_id = session_id
         self.session_num = session_num
         self.fpath = fpath
+        self.start_times: Optional[np.ndarray] = None
+        self.end_times: Optional[np.ndarray] = None
+        self.word_counts: Optional[np.ndarray] = None
+        self.speaker_codes: Optional[np.ndarray] = None
+        self.speakers: List[str] = []
+        self.feature_matrix: Optional[np.ndarray] = None
+        self.schema: Optional[FeatureSchema] = None
 
-    def postprocess(self):
-        self.drop_blank_lines()
-        self.merge_repeat_speaker_lines()
-        self.impute_end_times()
-        self.assign_line_ids()
+    def postprocess(self, profiler: profiling.Profiler = profiling.NULL_PROFILER):
+        with profiler.stage("drop_blank_lines"):
+            self.drop_blank_lines()
+        with profiler.stage("merge_repeat_speaker_lines"):
+            self.merge_repeat_speaker_lines()
+        with profiler.stage("impute_end_times"):
+            self.impute_end_times()
+        with profiler.stage("assign_line_ids"):
+            self.assign_line_ids()
 
     def drop_blank_lines(self):
         new_list = []
@@ -93,8 +525,11 @@ class Transcript(object):
     def merge_repeat_speaker_lines(self):
         """Merge two lines if they are adjacent and from the same speaker
         NOTE: Does not handle line_id or features
-        Assumes text and num_words has been initialized
+        Assumes text has been initialized. Merged lines are new `Line`
+        objects, so their cached tokens are recomputed from the merged text.
         """
+        if not self.lines:
+            return
         prev_line = self.lines[0]
         new_list = [prev_line]
         for curr_line in self.lines[1:]:
@@ -110,6 +545,8 @@ class Transcript(object):
                 )
                 new_list.pop()
                 new_list.append(new_line)
+                # Keep merging into the combined line for runs of 3+ lines
+                curr_line = new_line
             else:
                 new_list.append(curr_line)
             prev_line = curr_line
@@ -119,6 +556,8 @@ class Transcript(object):
         """
         Note: The last sentence will not have an imputed end time. Just have to drop it...
         """
+        if not self.lines:
+            return
         prev_line = self.lines[0]
         for curr_line in self.lines[1:]:
             prev_line.end_time = curr_line.start_time
@@ -130,52 +569,272 @@ class Transcript(object):
                 self.session_id, i, line_id_len=6
             )
 
-    def calculate_features(self, featurizer_objs: Iterable[Featurizer]):
-        for line in tqdm(self.lines, total=len(self.lines)):
-            line.calculate_features(featurizer_objs)
+    def build_line_arrays(self):
+        """Collect the per-line times, word counts and speakers into arrays"""
+        self.start_times = np.array(
+            [_nan_if_none(line.start_time) for line in self.lines], dtype=np.float64
+        )
+        self.end_times = np.array(
+            [_nan_if_none(line.end_time) for line in self.lines], dtype=np.float64
+        )
+        self.word_counts = np.array(
+            [line.num_words for line in self.lines], dtype=np.int64
+        )
+        speaker_codes = {}
+        self.speaker_codes = np.array(
+            [
+                speaker_codes.setdefault(
+                    sys.intern(str(line.speaker)), len(speaker_codes)
+                )
+                for line in self.lines
+            ],
+            dtype=np.int32,
+        )
+        self.speakers = list(speaker_codes)
+
+    def calculate_features(
+        self,
+        featurizer_objs: Iterable[Featurizer],
+        schema: Optional[FeatureSchema] = None,
+        profiler: profiling.Profiler = profiling.NULL_PROFILER,
+        lazy: bool = False,
+        vocabulary: vocab.Vocabulary = vocab.VOCABULARY,
+        line_ids: Optional[vocab.LineIds] = None,
+    ):
+        """Fill the feature matrix, one row per line
+
+        Args:
+            featurizer_objs: Featurizers to apply to every line
+            schema: The featurizers' schema, if already built; pass the same
+                schema object when featurizing many transcripts
+            profiler: Records the time spent in each featurizer, along with
+                the number of lines and tokens it processed and its number of
+                lexicon hits (the sum of its counts, for count features)
+            lazy: If True, only run a featurizer once one of its features is
+                read from a line's `features` (or with
+                `compute_pending_features`), e.g., for interactive use
+            vocabulary: Vocabulary the lines are interned into for the
+                lexicon featurizers; pass the same one (but not the
+                process-wide default) when featurizing many transcripts
+            line_ids: The lines' vocabulary ids, if already known; replaces
+                `vocabulary`
+        """
+        featurizer_objs = list(featurizer_objs)
+        if schema is None:
+            schema = FeatureSchema.from_featurizers(featurizer_objs)
+        with profiler.stage("line_arrays"):
+            self.build_line_arrays()
+        self.feature_matrix = np.full((len(self.lines), len(schema)), np.nan)
+        self.schema = schema
+        # Lexicon featurizers share the lines' vocabulary ids, each view
+        # (tokens or word pieces) being encoded by the first that needs it
+        if line_ids is None:
+            line_ids = vocab.LineIds(self.lines, vocabulary)
+        if lazy:
+            self._pending = {
+                schema.index[descr]: featurizer_obj
+                for featurizer_obj in featurizer_objs
+                for descr in featurizer_obj.feature_descrs
+            }
+            self._line_ids = line_ids
+            for i, line in enumerate(self.lines):
+                line.features = LazyFeatureRow(self.feature_matrix, schema, i, self)
+            return
+        self._pending = self._line_ids = None
+        for featurizer_obj in tqdm(featurizer_objs, total=len(featurizer_objs)):
+            self._run_featurizer(featurizer_obj, line_ids, profiler)
+        for i, line in enumerate(self.lines):
+            line.features = FeatureRow(self.feature_matrix, schema, i)
+
+    def _run_featurizer(
+        self,
+        featurizer_obj: Featurizer,
+        line_ids: vocab.LineIds,
+        profiler: profiling.Profiler = profiling.NULL_PROFILER,
+    ):
+        cols = [self.schema.index[descr] for descr in featurizer_obj.feature_descrs]
+        stage_name = "featurize/" + featurizer_obj.profile_name()
+        with profiler.stage(stage_name):
+            if featurizer_obj.uses_vocab:
+                values = featurizer_obj.featurize_ids(line_ids)
+            else:
+                values = featurizer_obj.featurize_batch(self.lines)
+        self.feature_matrix[:, cols] = values
+        if profiler.enabled:
+            profiler.count(stage_name, "lines", len(self.lines))
+            profiler.count(stage_name, "tokens", self.word_counts.sum())
+            if featurizer_obj.feature_dtype is int:
+                profiler.count(stage_name, "lexicon_hits", np.nansum(values))
+
+    @property
+    def pending_features(self) -> List[str]:
+        """Features of a lazily featurized transcript not computed yet"""
+        if not self._pending:
+            return []
+        return [self.schema.names[col] for col in sorted(self._pending)]
+
+    def compute_pending_features(self, feature_names: Optional[Iterable[str]] = None):
+        """Run the featurizers a lazily featurized transcript hasn't run yet
+
+        Args:
+            feature_names: Only run the featurizers of these features; by
+                default, run all of them so the feature matrix is complete
+        """
+        if not self._pending:
+            return
+        if feature_names is None:
+            cols = list(self._pending)
+        else:
+            cols = [self.schema.index[feat_descr] for feat_descr in feature_names]
+        for col in cols:
+            featurizer_obj = self._pending.get(col)
+            if featurizer_obj is None:
+                continue
+            self._run_featurizer(featurizer_obj, self._line_ids)
+            for feat_descr in featurizer_obj.feature_descrs:
+                del self._pending[self.schema.index[feat_descr]]
+        if not self._pending:
+            self._pending = self._line_ids = None
+
+    def to_tsv(
+        self, fpath: Optional[str] = None, use_header: bool = False, out=None
+    ) -> Optional[str]:
+        """Serialize to long format, i.e., one row per (line, feature) pair
+
+        Args:
+            fpath: If given, write the rows (always preceded by the header)
+                to this file; it is gzip-compressed if the path ends in .gz
+            use_header: Whether to write the header row before the rows when
+                streaming to `out` or returning a string
+            out: A writable text file handle, or a `csv.writer`-like object
+                with a `writerow` method, to stream the rows to
+
+        Returns:
+            The serialized rows if neither `fpath` nor `out` is given,
+            otherwise None
+        """
+        if fpath is not None:
+            with utils.open_output(fpath) as f:
+                self.to_tsv(use_header=True, out=f)
+            return None
+        if out is None:
+            buffer = io.StringIO()
+            self.to_tsv(use_header=use_header, out=buffer)
+            return buffer.getvalue()
 
-    def to_tsv(self, fpath: str = "transcripts.csv", use_header: bool = False):
-        serialized = ""
+        writerow = getattr(out, "writerow", None)
         if use_header:
-            header_elements = [
-                "session_id",
-                "line_id",
-                "speaker",
-                "start_time",
-                "end_time",
-                "feature_descr",
-                "feature_value",
-                "text",
-            ]
-            header = "\t".join(header_elements)
-            serialized += header + "\n"
+            if writerow is not None:
+                writerow(TSV_HEADER)
+            else:
+                out.write("\t".join(TSV_HEADER) + "\n")
+        for row in self.iter_tsv_rows():
+            if writerow is not None:
+                writerow(row)
+            else:
+                out.write("\t".join(row) + "\n")
+        return None
 
+    def iter_tsv_rows(self) -> Iterator[List[str]]:
+        """Long-format rows; `end_time` is left empty when it is unknown"""
+        self.compute_pending_features()
+        if self.feature_matrix is not None:
+            yield from self._iter_tsv_rows_from_arrays()
+            return
+        session_id = str(self.session_id)
         for transcript_line in self.lines:
+            start_time = str(transcript_line.start_time)
+            end_time = (
+                str(transcript_line.end_time)
+                if transcript_line.end_time is not None
+                else ""
+            )
             for feat_descr, feat_value in transcript_line.features.items():
-                tsv_line = []
-                tsv_line.append(str(self.session_id))
-                tsv_line.append(transcript_line.line_id)
-                tsv_line.append(transcript_line.speaker)
-                tsv_line.append(str(transcript_line.start_time))
-                if transcript_line.end_time is not None:
-                    tsv_line.append(str(transcript_line.end_time))
-                tsv_line.append(feat_descr)
-                tsv_line.append(str(feat_value))
-                tsv_line.append(transcript_line.text)
-                serialized += "\t".join(tsv_line) + "\n"
-
-        return serialized
+                yield [
+                    session_id,
+                    transcript_line.line_id,
+                    transcript_line.speaker,
+                    start_time,
+                    end_time,
+                    feat_descr,
+                    str(feat_value),
+                    transcript_line.text,
+                ]
+
+    def _iter_tsv_rows_from_arrays(self) -> Iterator[List[str]]:
+        session_id = str(self.session_id)
+        schema = self.schema
+        # Format each feature column in one go; values print exactly as the
+        # featurizers returned them (ints as ints, missing values as None)
+        formatted_columns = []
+        for col, dtype in enumerate(schema.dtypes):
+            column = self.feature_matrix[:, col]
+            missing = np.isnan(column)
+            if dtype is int:
+                values = [str(v) for v in column.astype(np.int64, copy=False).tolist()]
+            else:
+                values = [str(v) for v in column.tolist()]
+            for i in np.flatnonzero(missing).tolist():
+                values[i] = "None"
+            formatted_columns.append(values)
+        start_times = self.start_times.tolist()
+        end_times = self.end_times.tolist()
+        for i, transcript_line in enumerate(self.lines):
+            start_time = str(start_times[i])
+            end_time = str(end_times[i]) if end_times[i] == end_times[i] else ""
+            for col, feat_descr in enumerate(schema.names):
+                yield [
+                    session_id,
+                    transcript_line.line_id,
+                    transcript_line.speaker,
+                    start_time,
+                    end_time,
+                    feat_descr,
+                    formatted_columns[col][i],
+                    transcript_line.text,
+                ]
 
     def __str__(self):
         return "\n".join([str(l) for l in self.lines])
 
 
+def _nan_if_none(value: Optional[float]) -> float:
+    return np.nan if value is None else value
+
+
 #################################################
 # LIWC FEATURIZERS (PRONOUNS, TIME ORIENTATION) #
 #################################################
 
 
+def liwc_table(
+    liwc_obj: liwc.LIWC,
+    categories: Sequence[str],
+    vocabulary: vocab.Vocabulary = vocab.VOCABULARY,
+) -> vocab.LexiconTable:
+    """Table of the columns (one per category) each token counts towards
+
+    Each distinct token is searched in the lexicon once, when it first shows
+    up in the vocabulary.
+    """
+    col_index: Dict[str, List[int]] = {}
+    for col, category in enumerate(categories):
+        col_index.setdefault(category, []).append(col)
+
+    def lookup(token: str) -> List[int]:
+        return [
+            col
+            for category in liwc_obj.search(token)
+            for col in col_index.get(category, ())
+        ]
+
+    return vocab.LexiconTable(lookup, len(categories), vocabulary)
+
+
 class LIWCFeaturizer(Featurizer):
+    feature_dtype = int
+    uses_vocab = True
+
     def __init__(
         self,
         feature_descr: str,
@@ -185,18 +844,177 @@ class LIWCFeaturizer(Featurizer):
         self.feature_descr = feature_descr
         self.target_category = target_category
         self.liwc_obj = liwc.LIWC(path_to_lexicon)
+        self.lexicon_checksum = self.liwc_obj.checksum
 
     def featurize(self, line: Line):
-        line_ctr = self.liwc_obj.parse(line.text.lower().split())
+        line_ctr = self.liwc_obj.parse(line.lower_tokens)
         return line_ctr[self.target_category], self.feature_descr
 
+    def featurize_ids(self, line_ids: vocab.LineIds) -> np.ndarray:
+        table = line_ids.vocabulary.table(
+            self,
+            lambda vocabulary: liwc_table(
+                self.liwc_obj, [self.target_category], vocabulary
+            ),
+        )
+        return table.count(*line_ids.tokens)
+
+
+class MultiLIWCFeaturizer(Featurizer):
+    """Counts several LIWC categories with one lexicon and one parse per line"""
+
+    feature_dtype = int
+    uses_vocab = True
+
+    def __init__(
+        self,
+        target_categories: Optional[Mapping[str, str]] = None,
+        path_to_lexicon: str = config.LIWC_PATH,
+        prefix: str = "liwc_",
+    ):
+        """
+        Args:
+            target_categories: Maps each feature description to the LIWC
+                category it counts. If None, every category in the lexicon is
+                output, with the feature description `prefix + category`.
+            path_to_lexicon: Path to the LIWC .dic file
+            prefix: Prefix for feature descriptions when outputting all
+                categories
+        """
+        self.feature_descr = None
+        self.liwc_obj = liwc.LIWC(path_to_lexicon)
+        self.lexicon_checksum = self.liwc_obj.checksum
+        if target_categories is None:
+            target_categories = {
+                prefix + category: category
+                for category in self.liwc_obj.categories.values()
+            }
+        self.target_categories = dict(target_categories)
+
+    @property
+    def feature_descrs(self) -> List[str]:
+        return list(self.target_categories)
+
+    def featurize_multi(self, line: Line):
+        line_ctr = self.liwc_obj.parse(line.lower_tokens)
+        return [
+            (line_ctr[target_category], feature_descr)
+            for feature_descr, target_category in self.target_categories.items()
+        ]
+
+    def featurize_ids(self, line_ids: vocab.LineIds) -> np.ndarray:
+        table = line_ids.vocabulary.table(
+            self,
+            lambda vocabulary: liwc_table(
+                self.liwc_obj, list(self.target_categories.values()), vocabulary
+            ),
+        )
+        return table.count(*line_ids.tokens)
+
+
+class TermCountFeaturizer(Featurizer):
+    """Counts occurrences of the terms in `self.target_set`
+
+    Subclasses set `target_set` and build `self.matcher` from it.
+    """
+
+    feature_dtype = int
+    uses_vocab = True
+
+    def featurize(self, line: Line):
+        n_terms_in_line = self.matcher.count_pieces(line.word_pieces)
+        return n_terms_in_line, self.feature_descr
+
+    def featurize_ids(self, line_ids: vocab.LineIds) -> np.ndarray:
+        table = line_ids.vocabulary.table(
+            self,
+            lambda vocabulary: vocab.PhraseTable(
+                self.matcher.terms, num_groups=1, vocabulary=vocabulary
+            ),
+        )
+        return table.count(line_ids)
+
+
+class MultiTermFeaturizer(Featurizer):
+    """Counts several term lists (one per feature) in a single pass per line"""
+
+    feature_dtype = int
+    uses_vocab = True
+
+    def __init__(self, term_sets: Mapping[str, Iterable[str]]):
+        """
+        Args:
+            term_sets: Maps each feature description to the terms it counts
+        """
+        self.feature_descr = None
+        self.term_sets = {
+            feature_descr: terms if isinstance(terms, (set, frozenset)) else list(terms)
+            for feature_descr, terms in term_sets.items()
+        }
+        terms = []
+        groups = []
+        for group, target_set in enumerate(self.term_sets.values()):
+            terms.extend(target_set)
+            groups.extend([group] * len(target_set))
+        self.matcher = features.utils.PhraseMatcher(terms, groups)
+
+    @property
+    def feature_descrs(self) -> List[str]:
+        return list(self.term_sets)
+
+    def featurize_multi(self, line: Line):
+        counts = self.matcher.count_groups(line.word_pieces)
+        return list(zip(counts, self.term_sets))
+
+    def featurize_ids(self, line_ids: vocab.LineIds) -> np.ndarray:
+        table = line_ids.vocabulary.table(
+            self,
+            lambda vocabulary: vocab.PhraseTable(
+                self.matcher.terms,
+                self.matcher.groups,
+                num_groups=len(self.term_sets),
+                vocabulary=vocabulary,
+            ),
+        )
+        return table.count(line_ids)
+
 
 ###########################################
 # EMOLEX FEATURIZERS (EMOTIONAL POLARITY) #
 ###########################################
 
 
-class EmoLexFeaturizer(Featurizer):
+def load_emolex_terms(
+    target_emos: Optional[Iterable[str]] = None,
+    path_to_lexicon: str = config.EMOLEX_PATH,
+) -> Dict[str, Set[str]]:
+    """Words conveying each of the target emotions, reading the lexicon once
+
+    All emotions and sentiments of the lexicon are loaded if no target
+    emotions are given. The compiled artifact of the lexicon is used if there
+    is one.
+    """
+    target_sets: Dict[str, Set[str]] = {}
+    if target_emos is not None:
+        target_sets = {emo: set() for emo in target_emos}
+    compiled = lexicon.load_compiled(path_to_lexicon, kind=lexicon.EMOLEX_KIND)
+    if compiled is not None:
+        if target_emos is None:
+            target_sets = {emo: set() for emo in compiled.categories}
+        for emo, target_set in target_sets.items():
+            target_set.update(compiled.words_in_category(emo))
+        return target_sets
+    with open(path_to_lexicon, mode="r", encoding="utf-8") as f:
+        for line in f:
+            word, emo, word_conveys_emo = line.split()
+            if target_emos is None:
+                target_sets.setdefault(emo, set())
+            if word_conveys_emo == "1" and emo in target_sets:
+                target_sets[emo].add(word)
+    return target_sets
+
+
+class EmoLexFeaturizer(TermCountFeaturizer):
     def __init__(
         self,
         feature_descr: str,
@@ -204,16 +1022,95 @@ class EmoLexFeaturizer(Featurizer):
         path_to_lexicon: str = config.EMOLEX_PATH,
     ):
         self.feature_descr = feature_descr
-        self.target_set = set()
-        with open(path_to_lexicon, mode="r", encoding="utf-8") as f:
-            for line in f:
-                word, emo, word_conveys_emo = line.split()
-                if emo == target_emo and word_conveys_emo == "1":
-                    self.target_set.add(word)
+        self.target_set = load_emolex_terms([target_emo], path_to_lexicon)[target_emo]
+        self.matcher = features.utils.PhraseMatcher(self.target_set)
 
-    def featurize(self, line: Line):
-        n_terms_in_line = features.utils.count_terms_in_line(line.text, self.target_set)
-        return n_terms_in_line, self.feature_descr
+
+# A lexicon entry that is a single word piece (see `utils.split_word_pieces`)
+_SINGLE_PIECE_PATTERN = re.compile(r"\w+")
+
+
+class MultiEmoLexFeaturizer(Featurizer):
+    """Counts the words of several EmoLex emotions (one per feature) at once
+
+    The lexicon is read once into a table mapping each word to a bitmask of
+    the features it counts towards, which is compiled into a table over the
+    vocabulary, so every line costs one gather per word piece no matter how
+    many emotions are counted. Counts are the same as those of one
+    `EmoLexFeaturizer` per emotion: entries that span several pieces (e.g.,
+    hyphenated words) are counted as phrases (see `vocab.PhraseTable`).
+    """
+
+    feature_dtype = int
+    uses_vocab = True
+
+    def __init__(
+        self,
+        emotions: Optional[Mapping[str, str]] = None,
+        path_to_lexicon: str = config.EMOLEX_PATH,
+    ):
+        """
+        Args:
+            emotions: Maps each feature description to the emotion (or
+                sentiment) it counts; by default every category of the
+                lexicon is counted as `emolex_<category>`
+            path_to_lexicon: Path to the NRC EmoLex word-level file
+        """
+        self.feature_descr = None
+        target_sets = load_emolex_terms(
+            emotions.values() if emotions is not None else None, path_to_lexicon
+        )
+        if emotions is None:
+            emotions = {f"emolex_{emo}": emo for emo in target_sets}
+        self.emotions = dict(emotions)
+        self.word_masks: Dict[str, int] = {}
+        phrases = []
+        phrase_groups = []
+        for group, emo in enumerate(self.emotions.values()):
+            bit = 1 << group
+            # Sorted, so the tables (and the signature) don't depend on the
+            # iteration order of the set, which changes with the hash seed
+            for term in sorted(target_sets[emo]):
+                word = term.lower()
+                mask = self.word_masks.get(word, 0)
+                # Entries differing only in case are each counted, like the
+                # separate terms of a `PhraseMatcher`
+                if _SINGLE_PIECE_PATTERN.fullmatch(word) and not mask & bit:
+                    self.word_masks[word] = mask | bit
+                else:
+                    phrases.append(term)
+                    phrase_groups.append(group)
+        # Kept as plain data so that they are part of the signature
+        self.phrases = phrases
+        self.phrase_groups = phrase_groups
+        self.phrase_matcher = (
+            features.utils.PhraseMatcher(phrases, phrase_groups) if phrases else None
+        )
+
+    @property
+    def feature_descrs(self) -> List[str]:
+        return list(self.emotions)
+
+    def featurize_multi(self, line: Line):
+        counts = self.featurize_batch([line])[0]
+        return [(int(count), descr) for count, descr in zip(counts, self.emotions)]
+
+    def _phrase_table(self, vocabulary: vocab.Vocabulary) -> vocab.PhraseTable:
+        terms = []
+        groups = []
+        for word, mask in self.word_masks.items():
+            for group in range(len(self.emotions)):
+                if mask >> group & 1:
+                    terms.append(word)
+                    groups.append(group)
+        if self.phrase_matcher is not None:
+            terms.extend(self.phrase_matcher.terms)
+            groups.extend(self.phrase_matcher.groups)
+        return vocab.PhraseTable(terms, groups, len(self.emotions), vocabulary)
+
+    def featurize_ids(self, line_ids: vocab.LineIds) -> np.ndarray:
+        table = line_ids.vocabulary.table(self, self._phrase_table)
+        return table.count(line_ids)
 
 
 #####################
@@ -221,209 +1118,310 @@ class EmoLexFeaturizer(Featurizer):
 #####################
 
 
-class CheckingForUnderstandingFeaturizer(Featurizer):
+CHECKING_FOR_UNDERSTANDING_TERMS = [
+    "it sounds like",
+    "you seem to be saying",
+    "let me make sure",
+    "heard you correctly",
+    "let me see",
+    "sounds like",
+    "seems like",
+    "it seems",
+    "it sounds",
+    "that seems",
+    "that sounds",
+    "this seems",
+    "this sounds",
+    "you seem",
+    "you sound",
+]
+
+
+class CheckingForUnderstandingFeaturizer(TermCountFeaturizer):
     def __init__(self, feature_descr: str = "checking_for_understanding"):
         self.feature_descr = feature_descr
-        self.target_set = [
-            "it sounds like",
-            "you seem to be saying",
-            "let me make sure",
-            "heard you correctly",
-            "let me see",
-            "sounds like",
-            "seems like",
-            "it seems",
-            "it sounds",
-            "that seems",
-            "that sounds",
-            "this seems",
-            "this sounds",
-            "you seem",
-            "you sound",
-        ]
+        self.target_set = list(CHECKING_FOR_UNDERSTANDING_TERMS)
+        self.matcher = features.utils.PhraseMatcher(self.target_set)
 
-    def featurize(self, line: Line):
-        n_terms_in_line = features.utils.count_terms_in_line(line.text, self.target_set)
-        return n_terms_in_line, self.feature_descr
 
+DEMONSTRATING_UNDERSTANDING_TERMS = [
+    "i hear you",
+    "i see",
+    "i understand",
+    "i can see",
+    "i get that",
+    "gotcha",
+]
 
-class DemonstratingUnderstandingFeaturizer(Featurizer):
+
+class DemonstratingUnderstandingFeaturizer(TermCountFeaturizer):
     def __init__(self, feature_descr: str = "demonstrating_understanding"):
         self.feature_descr = feature_descr
-        self.target_set = [
-            "i hear you",
-            "i see",
-            "i understand",
-            "i can see",
-            "i get that",
-            "gotcha",
-        ]
+        self.target_set = list(DEMONSTRATING_UNDERSTANDING_TERMS)
+        self.matcher = features.utils.PhraseMatcher(self.target_set)
 
-    def featurize(self, line: Line):
-        n_terms_in_line = features.utils.count_terms_in_line(line.text, self.target_set)
-        return n_terms_in_line, self.feature_descr
+
+HEDGING_TERMS = [
+    "think",
+    "thought",
+    "thinking",
+    "almost",
+    "apparent",
+    "apparently",
+    "appear",
+    "appeared",
+    "appears",
+    "approximately",
+    "around",
+    "assume",
+    "assumed",
+    "certain amount",
+    "certain extent",
+    "certain level",
+    "claim",
+    "claimed",
+    "doubt",
+    "doubtful",
+    "essentially",
+    "estimate",
+    "estimated",
+    "feel",
+    "felt",
+    "frequently",
+    "from our perspective",
+    "generally",
+    "guess",
+    "in general",
+    "in most cases",
+    "in most instances",
+    "in our view",
+    "indicate",
+    "indicated",
+    "largely",
+    "likely",
+    "mainly",
+    "may",
+    "maybe",
+    "might",
+    "mostly",
+    "often",
+    "on the whole",
+    "ought",
+    "perhaps",
+    "plausible",
+    "plausibly",
+    "possible",
+    "possibly",
+    "postulate",
+    "postulated",
+    "presumable",
+    "probable",
+    "probably",
+    "relatively",
+    "roughly",
+    "seems",
+    "should",
+    "sometimes",
+    "somewhat",
+    "suggest",
+    "suggested",
+    "suppose",
+    "suspect",
+    "tend to",
+    "tends to",
+    "typical",
+    "typically",
+    "uncertain",
+    "uncertainly",
+    "unclear",
+    "unclearly",
+    "unlikely",
+    "usually",
+    "broadly",
+    "tended to",
+    "presumably",
+    "suggests",
+    "from this perspective",
+    "from my perspective",
+    "in my view",
+    "in this view",
+    "in our opinion",
+    "in my opinion",
+    "to my knowledge",
+    "fairly",
+    "quite",
+    "rather",
+    "argue",
+    "argues",
+    "argued",
+    "claims",
+    "feels",
+    "indicates",
+    "supposed",
+    "supposes",
+    "suspects",
+    "postulates",
+]
 
 
-class HedgingFeaturizer(Featurizer):
+class HedgingFeaturizer(TermCountFeaturizer):
     def __init__(self, feature_descr: str = "hedging"):
         self.feature_descr = feature_descr
-        self.target_set = [
-            "think",
-            "thought",
-            "thinking",
-            "almost",
-            "apparent",
-            "apparently",
-            "appear",
-            "appeared",
-            "appears",
-            "approximately",
-            "around",
-            "assume",
-            "assumed",
-            "certain amount",
-            "certain extent",
-            "certain level",
-            "claim",
-            "claimed",
-            "doubt",
-            "doubtful",
-            "essentially",
-            "estimate",
-            "estimated",
-            "feel",
-            "felt",
-            "frequently",
-            "from our perspective",
-            "generally",
-            "guess",
-            "in general",
-            "in most cases",
-            "in most instances",
-            "in our view",
-            "indicate",
-            "indicated",
-            "largely",
-            "likely",
-            "mainly",
-            "may",
-            "maybe",
-            "might",
-            "mostly",
-            "often",
-            "on the whole",
-            "ought",
-            "perhaps",
-            "plausible",
-            "plausibly",
-            "possible",
-            "possibly",
-            "postulate",
-            "postulated",
-            "presumable",
-            "probable",
-            "probably",
-            "relatively",
-            "roughly",
-            "seems",
-            "should",
-            "sometimes",
-            "somewhat",
-            "suggest",
-            "suggested",
-            "suppose",
-            "suspect",
-            "tend to",
-            "tends to",
-            "typical",
-            "typically",
-            "uncertain",
-            "uncertainly",
-            "unclear",
-            "unclearly",
-            "unlikely",
-            "usually",
-            "broadly",
-            "tended to",
-            "presumably",
-            "suggests",
-            "from this perspective",
-            "from my perspective",
-            "in my view",
-            "in this view",
-            "in our opinion",
-            "in my opinion",
-            "to my knowledge",
-            "fairly",
-            "quite",
-            "rather",
-            "argue",
-            "argues",
-            "argued",
-            "claims",
-            "feels",
-            "indicates",
-            "supposed",
-            "supposes",
-            "suspects",
-            "postulates",
-        ]
+        self.target_set = list(HEDGING_TERMS)
+        self.matcher = features.utils.PhraseMatcher(self.target_set)
 
-    def featurize(self, line: Line):
-        n_terms_in_line = features.utils.count_terms_in_line(line.text, self.target_set)
-        return n_terms_in_line, self.feature_descr
+
+ABSOLUTIST_TERMS = [
+    "absolutely",
+    "all",
+    "always",
+    "complete",
+    "completely",
+    "constant",
+    "constantly",
+    "definitely",
+    "entire",
+    "ever",
+    "every",
+    "everyone",
+    "everything",
+    "full",
+    "must",
+    "never",
+    "nothing",
+    "totally",
+    "whole",
+]
 
 
-class AbsolutistFeaturizer(Featurizer):
+class AbsolutistFeaturizer(TermCountFeaturizer):
     def __init__(self, feature_descr: str = "absolutist"):
         self.feature_descr = feature_descr
-        self.target_set = [
-            "absolutely",
-            "all",
-            "always",
-            "complete",
-            "completely",
-            "constant",
-            "constantly",
-            "definitely",
-            "entire",
-            "ever",
-            "every",
-            "everyone",
-            "everything",
-            "full",
-            "must",
-            "never",
-            "nothing",
-            "totally",
-            "whole",
-        ]
+        self.target_set = list(ABSOLUTIST_TERMS)
+        self.matcher = features.utils.PhraseMatcher(self.target_set)
 
-    def featurize(self, line: Line):
-        n_terms_in_line = features.utils.count_terms_in_line(line.text, self.target_set)
-        return n_terms_in_line, self.feature_descr
 
+#############################################
+# TIMING FEATURIZERS (PARALINGUISTIC STYLE) #
+#############################################
+
+
+TIMING_MEASURES = (
+    "seconds_per_talk_turn",
+    "words_per_second",
+    "inter_turn_gap",
+    "overlap",
+)
+# Measures that depend on the previous line; the others only use the line
+_GAP_MEASURES = ("inter_turn_gap", "overlap")
+
+
+def timing_measures(
+    start_times: np.ndarray, end_times: np.ndarray, word_counts: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Timing measures of consecutive lines, in seconds
+
+    Args:
+        start_times: Start time of each line in minutes
+        end_times: End time of each line in minutes, NaN if unknown (as for
+            the last line of a transcript)
+        word_counts: Number of words in each line
+
+    Returns:
+        An array per measure, NaN wherever the measure is undefined:
+            seconds_per_talk_turn: Duration of the line
+            words_per_second: Undefined for lines without words or with a
+                duration of zero or less
+            inter_turn_gap: Time between the end of the previous line and the
+                start of this one, negative if they overlap; undefined for
+                the first line
+            overlap: How long the line overlaps the previous one, 0 if it
+                doesn't
+        Since imputed end times are the start of the next line, the gap and
+        overlap are only informative for transcripts with real end times.
+    """
+    start_times = np.asarray(start_times, dtype=np.float64)
+    end_times = np.asarray(end_times, dtype=np.float64)
+    word_counts = np.asarray(word_counts, dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        durations = (end_times - start_times) * 60.0
+        has_rate = (durations > 0) & (word_counts > 0)
+        words_per_second = np.where(has_rate, word_counts / durations, np.nan)
+        gaps = np.full(len(start_times), np.nan)
+        gaps[1:] = (start_times[1:] - end_times[:-1]) * 60.0
+        overlaps = np.where(gaps < 0, -gaps, gaps * 0.0)
+    return {
+        "seconds_per_talk_turn": durations,
+        "words_per_second": words_per_second,
+        "inter_turn_gap": gaps,
+        "overlap": overlaps,
+    }
 
-class SecondsPerTalkTurnFeaturizer(Featurizer):
+
+class TimingFeaturizer(Featurizer):
+    """Paralinguistic timing measures (see `timing_measures`)"""
+
+    def __init__(self, measures: Optional[Mapping[str, str]] = None):
+        """
+        Args:
+            measures: Maps each feature description to the measure in
+                `TIMING_MEASURES` it outputs; all measures by default
+        """
+        self.feature_descr = None
+        if measures is None:
+            measures = {measure: measure for measure in TIMING_MEASURES}
+        for measure in measures.values():
+            if measure not in TIMING_MEASURES:
+                raise ValueError(f"Unknown timing measure '{measure}'")
+        self.measures = dict(measures)
+
+    @property
+    def context_lines(self) -> int:
+        return int(any(measure in _GAP_MEASURES for measure in self.measures.values()))
+
+    @property
+    def feature_descrs(self) -> List[str]:
+        return list(self.measures)
+
+    def _featurize_arrays(self, start_times, end_times, word_counts) -> np.ndarray:
+        values = timing_measures(start_times, end_times, word_counts)
+        return np.column_stack(
+            [values[measure] for measure in self.measures.values()]
+        ).reshape(len(start_times), len(self.measures))
+
+    def featurize_batch(self, lines: Sequence[Line]) -> np.ndarray:
+        return self._featurize_arrays(
+            [_nan_if_none(line.start_time) for line in lines],
+            [_nan_if_none(line.end_time) for line in lines],
+            [line.num_words for line in lines],
+        )
+
+    def featurize_multi(self, line: Line):
+        # On its own, a line has no previous line to measure gaps against
+        row = self._featurize_arrays(
+            [_nan_if_none(line.start_time)],
+            [_nan_if_none(line.end_time)],
+            [line.num_words],
+        )[0]
+        return [
+            (None if np.isnan(value) else float(value), feature_descr)
+            for value, feature_descr in zip(row.tolist(), self.measures)
+        ]
+
+
+class SecondsPerTalkTurnFeaturizer(TimingFeaturizer):
     def __init__(self, feature_descr: str = "seconds_per_talk_turn"):
+        super().__init__({feature_descr: "seconds_per_talk_turn"})
         self.feature_descr = feature_descr
 
     def featurize(self, line: Line):
-        if line.end_time is None or line.start_time is None:
-            return None, self.feature_descr
-        return (line.end_time - line.start_time) * 60.0, self.feature_descr
+        return self.featurize_multi(line)[0]
 
 
-class WordsPerSecondFeaturizer(Featurizer):
+class WordsPerSecondFeaturizer(TimingFeaturizer):
     def __init__(self, feature_descr: str = "words_per_second"):
+        super().__init__({feature_descr: "words_per_second"})
         self.feature_descr = feature_descr
 
-    def featurize(self, line: Line):  # TODO: Handle case where line has duration 0
-        wps = None
-        if line.end_time is None or line.start_time is None:
-            return wps, self.feature_descr
-        line_dur_in_seconds = (line.end_time - line.start_time) * 60.0
-        num_words_in_line = len(line.text.split())
-        if line_dur_in_seconds > 0 and num_words_in_line > 0:
-            wps = num_words_in_line / line_dur_in_seconds
-        return wps, self.feature_descr
+    def featurize(self, line: Line):
+        return self.featurize_multi(line)[0]
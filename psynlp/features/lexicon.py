@@ -0,0 +1,365 @@
+"""Compiled lexicon artifacts
+
+Parsing a LIWC .dic file (and building its trie) or scanning the ~140k lines
+of the NRC EmoLex word-level file takes far longer than the featurization of
+a short transcript. `compile_lexicon` converts either file into a directory of
+NumPy arrays: a sorted word array, a sorted array of wildcard prefixes and one
+row of category bits per entry. The arrays are memory-mapped on load, so
+loading is fast and worker processes share the same read-only pages, and
+lookups binary-search the sorted arrays rather than building an index.
+
+Artifacts are keyed by the checksum of the source file, so editing a lexicon
+never silently reuses a stale artifact. `planner.build_featurizers` (and so
+`parse.py`) compiles the lexicons it needs the first time they are used; to
+compile a lexicon ahead of time, run e.g.
+
+    python psynlp/features/lexicon.py lexicons/LIWC2007_English100131.dic
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+LIWC_KIND = "liwc"
+EMOLEX_KIND = "emolex"
+
+FORMAT_VERSION = 1
+_ARRAY_NAMES = ("words", "word_masks", "prefixes", "prefix_masks")
+
+
+# (path, inode, size, modification time) -> checksum of the files hashed so
+# far, so building featurizers again doesn't re-read unchanged lexicons
+_checksums: Dict[Tuple[str, int, int, int], str] = {}
+
+
+def file_checksum(path: str) -> str:
+    """SHA-256 hex digest of a file's contents
+
+    Only hashed again if the file's size or modification time changed.
+    """
+    stat = os.stat(path)
+    stat_key = (os.path.abspath(path), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    checksum = _checksums.get(stat_key)
+    if checksum is None:
+        sha = hashlib.sha256()
+        with open(path, mode="rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+        checksum = _checksums[stat_key] = sha.hexdigest()
+    return checksum
+
+
+def infer_kind(path: str) -> str:
+    return LIWC_KIND if path.lower().endswith(".dic") else EMOLEX_KIND
+
+
+def artifact_path(
+    source_path: str, checksum: Optional[str] = None, cache_dir: Optional[str] = None
+) -> str:
+    """Location of the compiled artifact for a lexicon source file
+
+    By default artifacts live in a `compiled` folder next to the source file.
+    """
+    if checksum is None:
+        checksum = file_checksum(source_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source_path), "compiled")
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{checksum[:16]}")
+
+
+class CompiledLexicon(object):
+    """A lexicon mapping words (and LIWC-style `prefix*` wildcards) to categories
+
+    Lookups follow the semantics of `liwc.LIWC.search`: if any prefix of the
+    token is a wildcard entry, the categories of the shortest such prefix are
+    returned, otherwise those of an exact match.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        categories: Sequence[str],
+        words: np.ndarray,
+        word_masks: np.ndarray,
+        prefixes: np.ndarray,
+        prefix_masks: np.ndarray,
+        category_ids: Optional[Sequence[str]] = None,
+        checksum: Optional[str] = None,
+    ):
+        self.kind = kind
+        self.categories = list(categories)
+        self.category_ids = (
+            list(category_ids) if category_ids is not None else list(self.categories)
+        )
+        self.words = words
+        self.word_masks = word_masks
+        self.prefixes = prefixes
+        self.prefix_masks = prefix_masks
+        self.checksum = checksum
+        # Distinct lengths of the wildcard prefixes, found on the first lookup
+        self._prefix_lengths: Optional[List[int]] = None
+        self._decoded: Dict[Tuple[bool, int], List[str]] = {}
+
+    @classmethod
+    def from_entries(
+        cls,
+        kind: str,
+        categories: Sequence[str],
+        entries: Dict[str, Sequence[str]],
+        category_ids: Optional[Sequence[str]] = None,
+        checksum: Optional[str] = None,
+    ) -> "CompiledLexicon":
+        """Build from a mapping of word (or `prefix*` pattern) -> category names"""
+        category_bits = {category: i for i, category in enumerate(categories)}
+        n_blocks = max(1, (len(categories) + 63) // 64)
+        exact: Dict[str, List[int]] = {}
+        wildcard: Dict[str, List[int]] = {}
+        for pattern, cat_names in entries.items():
+            bits = [category_bits[cat_name] for cat_name in cat_names]
+            if "*" in pattern:
+                wildcard[pattern.split("*")[0]] = bits
+            else:
+                exact[pattern] = bits
+
+        def to_arrays(table):
+            keys = sorted(table)
+            masks = np.zeros((len(keys), n_blocks), dtype=np.uint64)
+            for row, key in enumerate(keys):
+                for bit in table[key]:
+                    masks[row, bit // 64] |= np.uint64(1 << (bit % 64))
+            return np.array(keys, dtype=str), masks
+
+        words, word_masks = to_arrays(exact)
+        prefixes, prefix_masks = to_arrays(wildcard)
+        return cls(
+            kind,
+            categories,
+            words,
+            word_masks,
+            prefixes,
+            prefix_masks,
+            category_ids=category_ids,
+            checksum=checksum,
+        )
+
+    def category_map(self) -> Dict[str, str]:
+        """Category id -> category name, as in `liwc.LIWC.categories`"""
+        return dict(zip(self.category_ids, self.categories))
+
+    @staticmethod
+    def _find(keys: np.ndarray, key: str) -> Optional[int]:
+        """Row of `key` in the sorted `keys`, or None if it isn't there"""
+        row = int(np.searchsorted(keys, key))
+        if row < len(keys) and keys[row] == key:
+            return row
+        return None
+
+    def _decode(self, is_prefix: bool, row: int) -> List[str]:
+        key = (is_prefix, row)
+        cat_names = self._decoded.get(key)
+        if cat_names is None:
+            masks = self.prefix_masks if is_prefix else self.word_masks
+            cat_names = []
+            for block_num, block in enumerate(masks[row].tolist()):
+                while block:
+                    lowest_bit = block & -block
+                    bit = block_num * 64 + lowest_bit.bit_length() - 1
+                    cat_names.append(self.categories[bit])
+                    block ^= lowest_bit
+            self._decoded[key] = cat_names
+        return cat_names
+
+    def search(self, token: str) -> List[str]:
+        """Categories the token belongs to (empty if it isn't in the lexicon)"""
+        if self._prefix_lengths is None:
+            self._prefix_lengths = np.unique(np.char.str_len(self.prefixes)).tolist()
+        for length in self._prefix_lengths:
+            if length > len(token):
+                break
+            row = self._find(self.prefixes, token[:length])
+            if row is not None:
+                return self._decode(True, row)
+        row = self._find(self.words, token)
+        if row is not None:
+            return self._decode(False, row)
+        return []
+
+    def words_in_category(self, category: str) -> List[str]:
+        """All exact-match words belonging to the given category"""
+        if category not in self.categories:
+            return []
+        bit = self.categories.index(category)
+        column = self.word_masks[:, bit // 64]
+        in_category = (column >> np.uint64(bit % 64)) & np.uint64(1)
+        return self.words[in_category.astype(bool)].tolist()
+
+    def save(self, path: str):
+        """Write the artifact directory atomically"""
+        parent_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix=".compiling-")
+        try:
+            for name in _ARRAY_NAMES:
+                np.save(os.path.join(tmp_dir, name + ".npy"), getattr(self, name))
+            meta = {
+                "format_version": FORMAT_VERSION,
+                "kind": self.kind,
+                "checksum": self.checksum,
+                "categories": self.categories,
+                "category_ids": self.category_ids,
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), mode="w") as f:
+                json.dump(meta, f)
+            try:
+                os.rename(tmp_dir, path)
+            except OSError:
+                # Another process finished compiling the same artifact first
+                if not os.path.isdir(path):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledLexicon":
+        with open(os.path.join(path, "meta.json"), mode="r") as f:
+            meta = json.load(f)
+        if meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has format version {meta['format_version']}, "
+                f"expected {FORMAT_VERSION}; recompile the lexicon"
+            )
+        mmap_mode = "r" if mmap else None
+        arrays = [
+            np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+            for name in _ARRAY_NAMES
+        ]
+        return cls(
+            meta["kind"],
+            meta["categories"],
+            *arrays,
+            category_ids=meta["category_ids"],
+            checksum=meta["checksum"],
+        )
+
+
+def _read_liwc(path: str) -> Tuple[List[str], List[str], Dict[str, List[str]]]:
+    """Parse a LIWC .dic file the same way `liwc.LIWC._load_dict_file` does"""
+    categories: Dict[str, str] = {}
+    entries: Dict[str, List[str]] = {}
+    percent_sign_count = 0
+    with open(path, mode="r") as f:
+        for line in f:
+            stp = line.strip()
+            if not stp:
+                continue
+            parts = stp.split("\t")
+            if parts[0] == "%":
+                percent_sign_count += 1
+            elif percent_sign_count == 1:
+                categories[parts[0]] = parts[1]
+            else:
+                entries[parts[0]] = [categories[cat_id] for cat_id in parts[1:]]
+    return list(categories.values()), list(categories), entries
+
+
+def _read_emolex(path: str) -> Tuple[List[str], Dict[str, List[str]]]:
+    """Parse the NRC word-level file ("word<TAB>emotion<TAB>0/1" per line)"""
+    categories: Dict[str, None] = {}
+    entries: Dict[str, List[str]] = {}
+    with open(path, mode="r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            word, emo, word_conveys_emo = line.split()
+            categories.setdefault(emo)
+            if word_conveys_emo == "1":
+                entries.setdefault(word, []).append(emo)
+    return list(categories), entries
+
+
+def compile_lexicon(
+    source_path: str, kind: Optional[str] = None, checksum: Optional[str] = None
+) -> CompiledLexicon:
+    """Parse a LIWC .dic or EmoLex .txt file into a `CompiledLexicon`"""
+    kind = kind if kind is not None else infer_kind(source_path)
+    checksum = checksum if checksum is not None else file_checksum(source_path)
+    if kind == LIWC_KIND:
+        categories, category_ids, entries = _read_liwc(source_path)
+    elif kind == EMOLEX_KIND:
+        categories, entries = _read_emolex(source_path)
+        category_ids = None
+    else:
+        raise ValueError(f"Unknown lexicon kind '{kind}'")
+    return CompiledLexicon.from_entries(
+        kind, categories, entries, category_ids=category_ids, checksum=checksum
+    )
+
+
+def load_compiled(
+    source_path: str,
+    kind: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    compile_missing: bool = False,
+) -> Optional[CompiledLexicon]:
+    """Load the compiled artifact for a lexicon, if there is one
+
+    Args:
+        source_path: Path to the lexicon source file, or directly to a
+            compiled artifact directory
+        kind: `LIWC_KIND` or `EMOLEX_KIND`; inferred from the file extension
+            if not given
+        cache_dir: Directory holding compiled artifacts
+        compile_missing: Compile and save the artifact if it doesn't exist yet
+
+    Returns:
+        The compiled lexicon, or None if no up-to-date artifact exists and
+        `compile_missing` is False
+    """
+    if os.path.isdir(source_path):
+        return CompiledLexicon.load(source_path)
+    checksum = file_checksum(source_path)
+    path = artifact_path(source_path, checksum=checksum, cache_dir=cache_dir)
+    if os.path.isdir(path):
+        return CompiledLexicon.load(path)
+    if not compile_missing:
+        return None
+    compiled = compile_lexicon(source_path, kind=kind, checksum=checksum)
+    compiled.save(path)
+    return CompiledLexicon.load(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compile LIWC .dic / EmoLex .txt lexicons into binary artifacts"
+    )
+    parser.add_argument("sources", nargs="+", help="Lexicon files to compile")
+    parser.add_argument(
+        "--kind",
+        choices=[LIWC_KIND, EMOLEX_KIND],
+        default=None,
+        help="Lexicon format (default: 'liwc' for .dic files, 'emolex' otherwise)",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Where to store the artifacts (default: 'compiled' next to each file)",
+    )
+    args = parser.parse_args()
+
+    for source_path in args.sources:
+        checksum = file_checksum(source_path)
+        path = artifact_path(source_path, checksum=checksum, cache_dir=args.cache_dir)
+        compile_lexicon(source_path, kind=args.kind, checksum=checksum).save(path)
+        print(f"Compiled {source_path} -> {path}")
@@ -9,6 +9,76 @@ MIT License
 
 import collections
 
+from features import lexicon as lexicon_artifacts
+
+DEFAULT_CACHE_SIZE = 1 << 16
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "size", "capacity", "eviction"]
+)
+
+_MISSING = object()
+
+
+class TokenCache:
+    """
+    Bounded token -> categories cache.
+    Conversational speech is very Zipfian, so a small cache of recent tokens
+    answers most lookups without walking the trie.
+    """
+
+    EVICTION_POLICIES = ("lru", "fifo")
+
+    def __init__(self, capacity=DEFAULT_CACHE_SIZE, eviction="lru"):
+        """
+        :param capacity: maximum number of cached tokens. None means
+                         unbounded, 0 disables caching.
+        :param eviction: 'lru' evicts the least recently used token, 'fifo'
+                         the least recently inserted one.
+        """
+        if eviction not in self.EVICTION_POLICIES:
+            raise ValueError(
+                f"eviction must be one of {self.EVICTION_POLICIES}, got '{eviction}'"
+            )
+        self.capacity = capacity
+        self.eviction = eviction
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def get(self, token):
+        """
+        :return: the cached categories, or None on a miss.
+        """
+        cats = self._entries.get(token, _MISSING)
+        if cats is _MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.eviction == "lru":
+            self._entries.move_to_end(token)
+        return cats
+
+    def put(self, token, cats):
+        if self.capacity == 0:
+            return
+        self._entries[token] = cats
+        if self.capacity is not None and len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def is_full(self):
+        return self.capacity is not None and len(self._entries) >= self.capacity
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return CacheInfo(
+            self.hits, self.misses, len(self._entries), self.capacity, self.eviction
+        )
+
 
 class LIWC:
     """
@@ -16,12 +86,39 @@ class LIWC:
     The dictionary files are proprietary and can be obtained by liwc.net
     """
 
-    def __init__(self, filepath):
+    def __init__(
+        self,
+        filepath,
+        use_compiled=True,
+        cache_dir=None,
+        cache_size=DEFAULT_CACHE_SIZE,
+        cache_eviction="lru",
+    ):
         """
-        :param filepath: path to the LIWC .dic file.
+        :param filepath: path to the LIWC .dic file, or to an artifact
+                         compiled from it (see features/lexicon.py).
+        :param use_compiled: load the compiled artifact for the .dic file if
+                             one exists, rather than parsing the text file.
+        :param cache_dir: where compiled artifacts are stored.
+        :param cache_size: number of token lookups to memoize (None for
+                           unbounded, 0 to disable).
+        :param cache_eviction: 'lru' or 'fifo', see TokenCache.
         """
-        self.categories, self.lexicon = self._load_dict_file(filepath)
-        self._trie = self._build_char_trie(self.lexicon)
+        self._cache = TokenCache(cache_size, cache_eviction)
+        self._compiled = None
+        if use_compiled:
+            self._compiled = lexicon_artifacts.load_compiled(
+                filepath, kind=lexicon_artifacts.LIWC_KIND, cache_dir=cache_dir
+            )
+        if self._compiled is not None:
+            self.categories = self._compiled.category_map()
+            self.lexicon = None
+            self._trie = None
+            self.checksum = self._compiled.checksum
+        else:
+            self.categories, self.lexicon = self._load_dict_file(filepath)
+            self._trie = self._build_char_trie(self.lexicon)
+            self.checksum = lexicon_artifacts.file_checksum(filepath)
 
     def search(self, word):
         """
@@ -30,6 +127,39 @@ class LIWC:
         :return: a list of the liwc categories the word belongs.
                  an empty list if the word is not found in the dictionary.
         """
+        cats = self._cache.get(word)
+        if cats is None:
+            cats = self._lookup(word)
+            self._cache.put(word, cats)
+        return cats
+
+    def prewarm(self):
+        """
+        Fill the cache with the dictionary's exact-match (non-wildcard)
+        entries, up to the cache capacity.
+        :return: the number of tokens added to the cache.
+        """
+        if self._compiled is not None:
+            words = self._compiled.words.tolist()
+        else:
+            words = [word for word in self.lexicon if "*" not in word]
+        num_added = 0
+        for word in words:
+            if self._cache.is_full() or self._cache.capacity == 0:
+                break
+            self._cache.put(word, self._lookup(word))
+            num_added += 1
+        return num_added
+
+    def cache_info(self):
+        """
+        :return: a CacheInfo with the hit/miss statistics of search().
+        """
+        return self._cache.info()
+
+    def _lookup(self, word):
+        if self._compiled is not None:
+            return self._compiled.search(word)
         return self._search_trie(self._trie, word)
 
     def parse(self, tokens):
@@ -111,12 +241,14 @@ class LIWC:
         """
         Search the given char trie for paths that match the token.
         """
-        if "*" in trie:
-            return trie["*"]
-        elif "$" in trie and i == len(token):
-            return trie["$"]
-        elif i < len(token):
+        cursor = trie
+        while True:
+            if "*" in cursor:
+                return cursor["*"]
+            elif i == len(token):
+                return cursor.get("$", [])
             char = token[i]
-            if char in trie:
-                return LIWC._search_trie(trie[char], token, i + 1)
-        return []
+            if char not in cursor:
+                return []
+            cursor = cursor[char]
+            i += 1
@@ -0,0 +1,246 @@
+"""Incremental featurization of a session as its lines arrive
+
+`Transcript.postprocess` needs the whole session before it can drop blank
+lines, merge adjacent lines of the same speaker and impute end times. An
+`OnlineTranscript` does the same one line at a time: the current speaker's
+turn stays open while lines of that speaker keep arriving, and once another
+speaker starts talking the turn is final. It then gets its end time (the new
+turn's start), line ID and features, and is handed back right away:
+
+    transcript = OnlineTranscript(session_id, featurizer_objs)
+    for raw_line in stream:
+        for line in transcript.add_raw_line(raw_line):
+            ...  # a finished turn with its features
+    for line in transcript.close():
+        ...  # the last turn, without an end time
+
+The turns are the same as those of `parse.parse_transcript` on the whole
+session, with the same features. Each line costs O(1) work besides the
+featurizers, and only the few previous turns that featurizers look back at
+(see `Featurizer.context_lines`) are kept.
+
+Running totals of the finished turns, per speaker and for the whole session,
+are available at any time with `summary`, with the columns of the
+session- and speaker-level tables of `aggregate`.
+"""
+
+import collections
+from typing import Deque
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+import numpy as np
+
+from features import aggregate
+from features import featurizers
+from features import utils
+from features import vocab
+
+# Summary levels available while the session is still going; quintiles need
+# the length of the whole session
+LEVELS = ("session", "speaker")
+
+
+class _OpenTurn(object):
+    """Text of a turn still being merged, kept as pieces until it's final
+
+    Merging a line into the turn gives the same text as
+    `Transcript.merge_repeat_speaker_lines`, i.e., `(text + " " + line).strip()`,
+    without copying the text merged so far.
+    """
+
+    __slots__ = ("speaker", "start_time", "end_time", "pieces")
+
+    def __init__(self, speaker: str, start_time: float, end_time, text: str):
+        self.speaker = speaker
+        self.start_time = start_time
+        self.end_time = end_time
+        self.pieces: Deque[str] = collections.deque([text])
+
+    def merge(self, end_time, text: str):
+        pieces = self.pieces
+        pieces.append(" ")
+        pieces.append(text)
+        # Strip the merged text on both ends, dropping all-blank pieces
+        while pieces and not pieces[0].lstrip():
+            pieces.popleft()
+        if pieces:
+            pieces[0] = pieces[0].lstrip()
+        while pieces and not pieces[-1].rstrip():
+            pieces.pop()
+        if pieces:
+            pieces[-1] = pieces[-1].rstrip()
+        self.end_time = end_time
+
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+
+class OnlineTranscript(object):
+    """Featurizes the turns of one session as its lines arrive
+
+    Args:
+        session_id: ID of the session, used for the line IDs
+        featurizer_objs: Featurizers to apply to every turn
+        session_num: Number of the session
+        schema: The featurizers' schema, if already built
+        vocabulary: Vocabulary to intern the turns into (see `vocab`), e.g.,
+            to share one across the sessions of a run; a new one by default
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        featurizer_objs: Iterable[featurizers.Featurizer],
+        session_num: Optional[int] = None,
+        schema: Optional[featurizers.FeatureSchema] = None,
+        vocabulary: Optional[vocab.Vocabulary] = None,
+    ):
+        self.session_id = session_id
+        self.session_num = session_num
+        self.featurizer_objs = list(featurizer_objs)
+        self.schema = (
+            schema
+            if schema is not None
+            else featurizers.FeatureSchema.from_featurizers(self.featurizer_objs)
+        )
+        self.vocabulary = vocabulary if vocabulary is not None else vocab.Vocabulary()
+        self._cols = [
+            [self.schema.index[descr] for descr in featurizer_obj.feature_descrs]
+            for featurizer_obj in self.featurizer_objs
+        ]
+        # Finished turns the featurizers look back at
+        max_context = max(
+            [featurizer_obj.context_lines for featurizer_obj in self.featurizer_objs],
+            default=0,
+        )
+        self._history: Deque[featurizers.Line] = collections.deque(maxlen=max_context)
+        self._open_turn: Optional[_OpenTurn] = None
+        self.num_lines = 0
+        self.closed = False
+        # Running totals of the finished turns of each speaker, laid out as
+        # for `aggregate.summary_columns`
+        self._speaker_index: Dict[str, int] = {}
+        self._totals: List[np.ndarray] = []
+        self._sums: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+
+    def add_raw_line(self, raw_line: str) -> List[featurizers.Line]:
+        """Add a line of transcript text, e.g., "P [TIME: 20:15]: I'm sad"
+
+        Lines that don't match `config.LINE_PATTERN` are ignored.
+        """
+        line_metadata = utils.extract_metadata_from_line(raw_line)
+        if line_metadata is None:
+            return []
+        speaker, start_time, line_content = line_metadata
+        return self.add_line(speaker, start_time, utils.preprocess_text(line_content))
+
+    def add_line(
+        self,
+        speaker: str,
+        start_time: float,
+        text: str,
+        end_time: Optional[float] = None,
+    ) -> List[featurizers.Line]:
+        """Add an already cleaned line
+
+        Returns:
+            The turns this line finished (the previous speaker's turn, if the
+            speaker changed), with their features
+        """
+        if self.closed:
+            raise ValueError("Can't add lines to a closed transcript")
+        if len(text) == 0:
+            return []
+        open_turn = self._open_turn
+        if open_turn is not None and open_turn.speaker == speaker:
+            open_turn.merge(end_time, text)
+            return []
+        self._open_turn = _OpenTurn(speaker, start_time, end_time, text)
+        if open_turn is None:
+            return []
+        return [self._finish(open_turn, end_time=start_time)]
+
+    def close(self) -> List[featurizers.Line]:
+        """End the session
+
+        Returns:
+            The last turn, if there is one; as in `Transcript.impute_end_times`,
+            its end time is left as it was
+        """
+        self.closed = True
+        open_turn, self._open_turn = self._open_turn, None
+        if open_turn is None:
+            return []
+        return [self._finish(open_turn, end_time=open_turn.end_time)]
+
+    def _finish(self, open_turn: _OpenTurn, end_time) -> featurizers.Line:
+        line = featurizers.Line(
+            line_id=utils.generate_line_id(
+                self.session_id, self.num_lines, line_id_len=6
+            ),
+            speaker=open_turn.speaker,
+            start_time=open_turn.start_time,
+            end_time=end_time,
+            text=open_turn.text(),
+        )
+        row = np.full((1, len(self.schema)), np.nan)
+        for featurizer_obj, cols in zip(self.featurizer_objs, self._cols):
+            lines = [line]
+            if featurizer_obj.context_lines:
+                lines = list(self._history)[-featurizer_obj.context_lines :] + lines
+            if featurizer_obj.uses_vocab:
+                values = featurizer_obj.featurize_ids(
+                    vocab.LineIds(lines, self.vocabulary)
+                )
+            else:
+                values = featurizer_obj.featurize_batch(lines)
+            row[0, cols] = values[-1]
+        line.features = featurizers.FeatureRow(row, self.schema, 0)
+        self._history.append(line)
+        self.num_lines += 1
+        self._accumulate(line, row[0])
+        return line
+
+    def _accumulate(self, line: featurizers.Line, values: np.ndarray):
+        speaker = self._speaker_index.setdefault(line.speaker, len(self._speaker_index))
+        if speaker == len(self._totals):
+            self._totals.append(np.zeros(len(aggregate.TOTALS)))
+            self._sums.append(np.zeros(len(self.schema)))
+            self._counts.append(np.zeros(len(self.schema)))
+        duration = 0.0
+        if line.start_time is not None and line.end_time is not None:
+            duration = line.end_time - line.start_time
+        self._totals[speaker] += (1, line.num_words, duration)
+        is_known = ~np.isnan(values)
+        self._sums[speaker] += np.where(is_known, values, 0.0)
+        self._counts[speaker] += is_known
+
+    def summary(self, level: str = "session") -> Dict[str, Sequence]:
+        """Summary of the turns finished so far, as a mapping of column -> values
+
+        Has one row for the session, or one per speaker, with the columns of
+        `aggregate.SummaryAccumulator.table` at that level.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level '{level}', expected one of {LEVELS}")
+        num_features = len(self.schema)
+        totals = np.array(self._totals).reshape(-1, len(aggregate.TOTALS))
+        sums = np.array(self._sums).reshape(-1, num_features)
+        counts = np.array(self._counts).reshape(-1, num_features)
+        if level == "session":
+            table: Dict[str, Sequence] = {"session_id": [str(self.session_id)]}
+            totals, sums, counts = (
+                values.sum(axis=0, keepdims=True) for values in (totals, sums, counts)
+            )
+        else:
+            table = {
+                "session_id": [str(self.session_id)] * len(self._speaker_index),
+                "speaker": list(self._speaker_index),
+            }
+        table.update(aggregate.summary_columns(self.schema, totals, sums, counts))
+        return table
@@ -1,19 +1,56 @@
 import argparse
+import concurrent.futures
+import functools
 import os
 import sys
+import time
+import traceback
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 
 sys.path.append("../../psynlp")
 
 import pandas as pd
-import pickle
 from tqdm import tqdm
 
+from features import aggregate
+from features import cache
+from features import columnar
 from features import config
 from features import featurizers
+from features import planner
+from features import prefetch
+from features import profiling
+from features import responsiveness
+from features import shard
+from features import store
 from features import utils
+from features import vocab
 
 
-def parse_transcript(path_to_transcript, featurizer_objs):
+# Anything that changes how transcripts are parsed must be reflected here so
+# that cached results are invalidated; bump the version for code changes
+PARSER_SETTINGS = {"parser_version": "2", "line_pattern": config.LINE_PATTERN}
+
+# Transcripts per worker that are submitted largest-first (see
+# `_submission_order`), which also bounds how many results are held back
+# to be yielded in input order
+_REORDER_WINDOW_PER_WORKER = 4
+
+
+def parse_transcript(
+    path_to_transcript,
+    featurizer_objs,
+    profiler: profiling.Profiler = profiling.NULL_PROFILER,
+    text: Optional[str] = None,
+    lazy: bool = False,
+    vocabulary: vocab.Vocabulary = vocab.VOCABULARY,
+):
     # Make sure we can extract the necessary metadata from the
     # transcript path before parsing its contents
     path_metadata = utils.extract_metadata_from_path(path_to_transcript)
@@ -24,28 +61,348 @@ def parse_transcript(path_to_transcript, featurizer_objs):
         session_id=session_id, session_num=session_num, fpath=path_to_transcript
     )
 
-    with open(path_to_transcript, mode="r", encoding="utf-8") as f:
-        for line in f:
-            line_metadata = utils.extract_metadata_from_line(line)
-            if line_metadata is None:
+    # The text may have been read ahead already (see `prefetch.Prefetcher`)
+    if text is None:
+        with profiler.stage("read"):
+            text = prefetch.read_text(path_to_transcript)
+    with profiler.stage("preprocess"):
+        speakers, start_times, texts = utils.parse_transcript_text(text)
+    profiler.count("read", "files")
+    profiler.count("read", "chars", len(text))
+    profiler.count("preprocess", "turns", len(speakers))
+    for person, time_in_mins, cleaned_line in zip(speakers, start_times, texts):
+        line_obj = featurizers.Line()
+        line_obj.speaker = person
+        line_obj.start_time = time_in_mins
+        line_obj.text = cleaned_line
+
+        transcript_obj.lines.append(line_obj)
+
+    transcript_obj.postprocess(profiler)
+    # Lazily featurized transcripts only compute features once they are read
+    # (see `Transcript.calculate_features`), e.g., in a notebook
+    transcript_obj.calculate_features(
+        featurizer_objs, profiler=profiler, lazy=lazy, vocabulary=vocabulary
+    )
+
+    return transcript_obj
+
+
+def build_featurizers(
+    path_to_liwc: str = config.LIWC_PATH,
+    path_to_emolex: str = config.EMOLEX_PATH,
+    feature_names: Optional[Sequence[str]] = None,
+    lazy: bool = False,
+    compile_lexicons: bool = True,
+) -> List[featurizers.Featurizer]:
+    """Featurizers computing the given features (see `planner.FEATURES`)
+
+    By default, `planner.DEFAULT_FEATURES` are computed. With `lazy`, each
+    featurizer is only constructed once it first computes something. With
+    `compile_lexicons`, lexicons are compiled on first use (see `lexicon`).
+    """
+    return planner.build_featurizers(
+        feature_names,
+        path_to_liwc,
+        path_to_emolex,
+        lazy=lazy,
+        compile_lexicons=compile_lexicons,
+    )
+
+
+FeaturizerFactory = Callable[[], List[featurizers.Featurizer]]
+
+# Featurizers of the current worker process, constructed once by
+# `_init_worker` so that lexicons aren't pickled along with every task, and
+# the vocabulary its transcripts are interned into
+_worker_featurizers: Optional[List[featurizers.Featurizer]] = None
+_worker_vocabulary: Optional[vocab.Vocabulary] = None
+_worker_profile = False
+
+
+def _init_worker(build_featurizers_fn: FeaturizerFactory, profile: bool = False):
+    global _worker_featurizers, _worker_vocabulary, _worker_profile
+    _worker_featurizers = build_featurizers_fn()
+    _worker_vocabulary = vocab.Vocabulary()
+    _worker_profile = profile
+
+
+def _try_parse_transcript(
+    path_to_transcript: str,
+    featurizer_objs: List[featurizers.Featurizer],
+    profiler: profiling.Profiler = profiling.NULL_PROFILER,
+    text: Optional[str] = None,
+    vocabulary: vocab.Vocabulary = vocab.VOCABULARY,
+) -> Tuple[Optional[featurizers.Transcript], Optional[str]]:
+    try:
+        return (
+            parse_transcript(
+                path_to_transcript,
+                featurizer_objs,
+                profiler,
+                text,
+                vocabulary=vocabulary,
+            ),
+            None,
+        )
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def _parse_in_worker(
+    path_to_transcript: str,
+    text: Optional[str] = None,
+) -> Tuple[Optional[featurizers.Transcript], Optional[str], Optional[Dict]]:
+    """Returns the task's profile (see `Profiler.to_dict`) along with the result"""
+    if not _worker_profile:
+        return (
+            *_try_parse_transcript(
+                path_to_transcript,
+                _worker_featurizers,
+                text=text,
+                vocabulary=_worker_vocabulary,
+            ),
+            None,
+        )
+    profiler = profiling.Profiler()
+    transcript, error = _try_parse_transcript(
+        path_to_transcript, _worker_featurizers, profiler, text, _worker_vocabulary
+    )
+    return transcript, error, profiler.to_dict()
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _submission_order(paths: Sequence[str], window: int) -> List[int]:
+    """Indices of the paths, largest file first within each window of paths
+
+    Submitting the largest transcripts first means a long session picked up
+    at the very end doesn't leave the other workers idle. Only sorting within
+    windows bounds how far ahead of the next result in input order a worker
+    can get, and so how many results have to be held back.
+    """
+    order = []
+    for start in range(0, len(paths), window):
+        order.extend(
+            sorted(
+                range(start, min(start + window, len(paths))),
+                key=lambda i: _file_size(paths[i]),
+                reverse=True,
+            )
+        )
+    return order
+
+
+def parse_transcripts(
+    paths: Sequence[str],
+    build_featurizers_fn: FeaturizerFactory = build_featurizers,
+    workers: int = 1,
+    featurizer_objs: Optional[List[featurizers.Featurizer]] = None,
+    transcript_cache: Optional[cache.TranscriptCache] = None,
+    profiler: profiling.Profiler = profiling.NULL_PROFILER,
+    prefetch_depth: int = 0,
+    prefetch_max_bytes: int = prefetch.DEFAULT_MAX_BYTES,
+) -> Iterator[Tuple[int, Optional[featurizers.Transcript], Optional[str]]]:
+    """Parse and featurize many transcripts, optionally in a process pool
+
+    Args:
+        paths: Paths to the transcripts
+        build_featurizers_fn: Constructs the featurizers; called once per
+            worker process (or once overall when `workers` is 1)
+        workers: Number of worker processes
+        featurizer_objs: Already constructed featurizers to use instead of
+            calling `build_featurizers_fn` when `workers` is 1
+        transcript_cache: If given, transcripts found in the cache are loaded
+            rather than parsed, and newly parsed ones are added to it
+        profiler: Records the time spent in each stage, including the stages
+            run in worker processes
+        prefetch_depth: If positive, read up to this many transcripts ahead in
+            background threads while the current ones are featurized (see
+            `prefetch.Prefetcher`); with workers, the transcripts are read in
+            this process and handed to the workers
+        prefetch_max_bytes: Cap on the total size of the transcripts read ahead
+
+    Yields:
+        (index into `paths`, transcript, error) in the order of `paths`. On
+        failure the transcript is None and error holds the traceback, so one
+        bad transcript doesn't abort the run. A transcript is also None (with
+        no error) if its path doesn't follow the expected naming scheme.
+
+    The transcripts parsed in this process (or in each worker process) are
+    interned into a vocabulary of their own (see `vocab`), dropped at the end.
+    """
+    vocabulary = vocab.Vocabulary()
+    if transcript_cache is None:
+        yield from _parse_uncached(
+            paths,
+            build_featurizers_fn,
+            workers,
+            featurizer_objs,
+            profiler,
+            prefetch_depth,
+            prefetch_max_bytes,
+            vocabulary,
+        )
+        return
+
+    if featurizer_objs is None:
+        featurizer_objs = build_featurizers_fn()
+    with profiler.stage("cache_keys"):
+        keys = cache_keys(paths, featurizer_objs)
+    cached = {}
+    for i, key in enumerate(keys):
+        if key is not None and key in transcript_cache:
+            cached[i] = key
+    to_parse = [i for i in range(len(paths)) if i not in cached]
+    transcript_cache.misses += len(to_parse)
+    parsed = _parse_uncached(
+        [paths[i] for i in to_parse],
+        build_featurizers_fn,
+        workers,
+        featurizer_objs,
+        profiler,
+        prefetch_depth,
+        prefetch_max_bytes,
+        vocabulary,
+    )
+    for i in range(len(paths)):
+        if i in cached:
+            with profiler.stage("cache_get"):
+                transcript = transcript_cache.get(cached[i])
+            if transcript is not None:
+                yield i, transcript, None
                 continue
-            person, time_in_mins, spoken_line = line_metadata
-            cleaned_line = utils.preprocess_text(spoken_line)
+            # The entry vanished or is corrupt, so parse the transcript now
+            transcript, error = _try_parse_transcript(
+                paths[i], featurizer_objs, profiler, vocabulary=vocabulary
+            )
+        else:
+            _, transcript, error = next(parsed)
+        if transcript is not None and keys[i] is not None:
+            with profiler.stage("cache_put"):
+                transcript_cache.put(keys[i], transcript)
+        yield i, transcript, error
 
-            line_obj = featurizers.Line()
-            line_obj.speaker = person
-            line_obj.start_time = time_in_mins
-            line_obj.text = cleaned_line
 
-            transcript_obj.lines.append(line_obj)
+def cache_keys(
+    paths: Sequence[str], featurizer_objs: List[featurizers.Featurizer]
+) -> List[Optional[str]]:
+    """Cache key of every transcript, or None if the transcript can't be read"""
+    featurizers_hash = cache.featurizers_signature(featurizer_objs)
+    keys = []
+    for path_to_transcript in paths:
+        try:
+            keys.append(
+                cache.TranscriptCache.key(
+                    path_to_transcript, featurizers_hash, PARSER_SETTINGS
+                )
+            )
+        except OSError:
+            keys.append(None)
+    return keys
 
-    transcript_obj.drop_blank_lines()
-    transcript_obj.merge_repeat_speaker_lines()
-    transcript_obj.impute_end_times()
-    transcript_obj.assign_line_ids()
-    transcript_obj.calculate_features(featurizer_objs)
 
-    return transcript_obj
+def _read_ahead(
+    paths: Sequence[str],
+    prefetch_depth: int,
+    prefetch_max_bytes: int,
+    profiler: profiling.Profiler = profiling.NULL_PROFILER,
+) -> Iterator[Optional[str]]:
+    """Text of each transcript if it was read ahead, otherwise None
+
+    Transcripts that couldn't be read ahead are read (and fail) again when
+    parsed, so errors are reported the same way with and without prefetching.
+    """
+    if prefetch_depth <= 0:
+        for _ in paths:
+            yield None
+        return
+    texts = iter(
+        prefetch.Prefetcher(paths, depth=prefetch_depth, max_bytes=prefetch_max_bytes)
+    )
+    for _ in paths:
+        # Only the time spent waiting on the reader threads is left to count
+        with profiler.stage("read"):
+            _, text, _ = next(texts)
+        yield text
+
+
+def _worker_result(
+    future: concurrent.futures.Future, profiler: profiling.Profiler
+) -> Tuple[Optional[featurizers.Transcript], Optional[str]]:
+    try:
+        transcript, error, profile = future.result()
+    except Exception:
+        # e.g., the worker process died or the result couldn't be pickled
+        transcript, error, profile = None, traceback.format_exc(), None
+    if profile is not None:
+        profiler.merge(profiling.Profiler.from_dict(profile))
+    return transcript, error
+
+
+def _parse_uncached(
+    paths: Sequence[str],
+    build_featurizers_fn: FeaturizerFactory,
+    workers: int,
+    featurizer_objs: Optional[List[featurizers.Featurizer]],
+    profiler: profiling.Profiler = profiling.NULL_PROFILER,
+    prefetch_depth: int = 0,
+    prefetch_max_bytes: int = prefetch.DEFAULT_MAX_BYTES,
+    vocabulary: vocab.Vocabulary = vocab.VOCABULARY,
+) -> Iterator[Tuple[int, Optional[featurizers.Transcript], Optional[str]]]:
+    if workers <= 1:
+        if featurizer_objs is None:
+            featurizer_objs = build_featurizers_fn()
+        texts = _read_ahead(paths, prefetch_depth, prefetch_max_bytes, profiler)
+        for i, (path_to_transcript, text) in enumerate(zip(paths, texts)):
+            yield (
+                i,
+                *_try_parse_transcript(
+                    path_to_transcript, featurizer_objs, profiler, text, vocabulary
+                ),
+            )
+        return
+
+    # Results are handed back in input order as soon as each next one is
+    # ready. Submitting largest-first within windows of paths bounds the
+    # results in flight or held back for reordering to a window's worth
+    window = _REORDER_WINDOW_PER_WORKER * workers
+    order = _submission_order(paths, window)
+    texts = _read_ahead([paths[i] for i in order], prefetch_depth, prefetch_max_bytes)
+    # Transcripts read ahead are held by their tasks until a worker picks them
+    # up, so only keep enough tasks pending to keep the workers busy
+    max_pending = 2 * workers if prefetch_depth > 0 else window
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(build_featurizers_fn, profiler.enabled),
+    ) as executor:
+        pending: Dict[concurrent.futures.Future, int] = {}
+        finished = {}
+        next_index = 0
+        for i, text in zip(order, texts):
+            # The next result in input order was always submitted by the time
+            # a window's worth is in flight or held back, so this can't stall
+            while len(pending) >= max_pending or len(pending) + len(finished) >= window:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    finished[pending.pop(future)] = _worker_result(future, profiler)
+                while next_index in finished:
+                    yield (next_index, *finished.pop(next_index))
+                    next_index += 1
+            pending[executor.submit(_parse_in_worker, paths[i], text)] = i
+        for future in concurrent.futures.as_completed(pending):
+            finished[pending[future]] = _worker_result(future, profiler)
+            while next_index in finished:
+                yield (next_index, *finished.pop(next_index))
+                next_index += 1
 
 
 if __name__ == "__main__":
@@ -60,75 +417,335 @@ if __name__ == "__main__":
         type=str,
         default="transcripts.tsv",
         help="Location where the .tsv containing the summary"
-        " of transcript preprocessing & featurization should be saved",
+        " of transcript preprocessing & featurization should be saved"
+        " (gzip-compressed if it ends in .gz)",
+    )
+    parser.add_argument(
+        "--features",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Names of the features to compute (default: all features used in"
+        " the paper); LIWC categories and EmoLex emotions can also be requested"
+        " as liwc_<category> and emolex_<emotion>",
+    )
+    parser.add_argument(
+        "--no_compile_lexicons",
+        action="store_true",
+        help="Don't compile the LIWC and EmoLex lexicons into memory-mapped"
+        " artifacts (next to each lexicon, in a 'compiled' folder) on first use;"
+        " lexicons without an artifact are then parsed by every run and worker",
+    )
+    parser.add_argument(
+        "--list_features",
+        action="store_true",
+        help="Print the names of the registered features and exit",
     )
     parser.add_argument(
         "--use_cache",
         action="store_true",
-        help="If True, cache transcript objects as pickle "
-        "prior to serialization serialization",
+        help="If True, cache each featurized transcript and only process"
+        " transcripts that are new or changed since the last run",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default="transcript_cache",
+        help="Directory where featurized transcripts are cached",
+    )
+    parser.add_argument(
+        "--prune_cache",
+        action="store_true",
+        help="Remove cache entries that aren't used by the current metadata"
+        " and featurizers (requires --use_cache)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse and featurize transcripts",
+    )
+    parser.add_argument(
+        "--columnar_out",
+        type=str,
+        default=None,
+        help="If given, also write the features in columnar format (one row per"
+        " line, one .npy file per feature) to this directory",
+    )
+    parser.add_argument(
+        "--summary_out",
+        type=str,
+        default=None,
+        help="If given, write session-, speaker- and quintile-level summary"
+        " tables of the features to this directory",
+    )
+    parser.add_argument(
+        "--responsiveness_out",
+        type=str,
+        default=None,
+        help="If given, write how each therapist turn relates to the preceding"
+        " patient turn(s) to this .tsv (gzip-compressed if it ends in .gz)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in each stage and featurizer at the end",
     )
     parser.add_argument(
-        "--cache_filepath",
+        "--profile_out",
         type=str,
-        default="transcripts.pkl",
-        help="Location where to cache a pickle file"
-        "representing transcripts before serialization",
+        default=None,
+        help="If given, write the profile of the run to this .json file",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        help="If positive, read up to this many transcripts ahead in the"
+        " background while the current ones are featurized",
+    )
+    parser.add_argument(
+        "--prefetch_mb",
+        type=float,
+        default=prefetch.DEFAULT_MAX_BYTES / 2**20,
+        help="Cap (in MB) on the total size of the transcripts read ahead",
+    )
+    parser.add_argument(
+        "--shard",
+        type=int,
+        default=0,
+        help="Which shard of the metadata to process (0 to --num_shards - 1);"
+        " each shard writes its outputs with a .shard-<i>-of-<n> suffix, which"
+        " shard.py merges once all shards are done",
+    )
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=1,
+        help="Number of shards the metadata is split into, e.g., one per node",
+    )
+    parser.add_argument(
+        "--store_out",
+        type=str,
+        default=None,
+        help="If given, also write the postprocessed transcripts to a tokenized"
+        " store in this directory, which --from_store featurizes without"
+        " re-parsing",
+    )
+    parser.add_argument(
+        "--from_store",
+        type=str,
+        default=None,
+        help="If given, featurize the transcripts of this store (written with"
+        " --store_out) instead of parsing the transcripts in the metadata",
     )
     args = parser.parse_args()
+    if args.list_features:
+        for name, (resource, _) in planner.FEATURES.items():
+            default = " (default)" if name in planner.DEFAULT_FEATURES else ""
+            print(f"{name}\t{resource}{default}")
+        for prefix, resource in planner.PREFIXES.items():
+            print(f"{prefix}<{resource} category>\t{resource}")
+        sys.exit(0)
+    if not 0 <= args.shard < args.num_shards:
+        parser.error(f"--shard must be between 0 and {args.num_shards - 1}")
+    if args.num_shards > 1 and args.prune_cache:
+        # Entries of the other shards would look unused
+        parser.error("--prune_cache can't be combined with --num_shards")
+    if args.from_store is not None and (
+        args.num_shards > 1 or args.use_cache or args.store_out is not None
+    ):
+        parser.error(
+            "--from_store can't be combined with --num_shards, --use_cache or"
+            " --store_out"
+        )
+    profiler = profiling.Profiler(enabled=args.profile or args.profile_out is not None)
+    run_start = time.perf_counter()
 
-    featurizer_objs = [
-        featurizers.LIWCFeaturizer("you_pronouns", "you"),
-        featurizers.LIWCFeaturizer("they_pronouns", "they"),
-        featurizers.LIWCFeaturizer("personal_pronouns", "ppron"),
-        featurizers.LIWCFeaturizer("i_pronouns", "i"),
-        featurizers.LIWCFeaturizer("we_pronouns", "we"),
-        featurizers.LIWCFeaturizer("past_oriented", "past"),
-        featurizers.LIWCFeaturizer("present_oriented", "present"),
-        featurizers.LIWCFeaturizer("future_oriented", "future"),
-        featurizers.EmoLexFeaturizer("negative", "negative"),
-        featurizers.EmoLexFeaturizer("positive", "positive"),
-        featurizers.CheckingForUnderstandingFeaturizer(),
-        featurizers.DemonstratingUnderstandingFeaturizer(),
-        featurizers.HedgingFeaturizer(),
-        featurizers.AbsolutistFeaturizer(),
-        featurizers.SecondsPerTalkTurnFeaturizer(),
-        featurizers.WordsPerSecondFeaturizer(),
-    ]
-
-    meta_df = pd.read_csv(
-        config.METADATA_PATH,
-        sep="\t",
-        converters={
-            "ID_number": str,
-            "Site_ID_number": str,
-            "Therapist_ID_number": str,
-            "Patient_ID_number": str,
-        },
-    )
+    corpus_store = None
+    if args.from_store is not None:
+        corpus_store = store.CorpusStore(args.from_store)
+        meta_df = pd.DataFrame({"session_id": corpus_store.session_ids})
+    else:
+        meta_df = pd.read_csv(
+            config.METADATA_PATH,
+            sep="\t",
+            converters={
+                "ID_number": str,
+                "Site_ID_number": str,
+                "Therapist_ID_number": str,
+                "Patient_ID_number": str,
+            },
+        )
+
+    manifest = None
+    if args.num_shards > 1:
+        # Every node computes the same partition from the metadata, balancing
+        # the shards by the size of their transcripts
+        gold_paths = meta_df["gold_path"].tolist()
+        session_keys = []
+        for path_to_transcript in gold_paths:
+            path_metadata = utils.extract_metadata_from_path(path_to_transcript)
+            session_keys.append(
+                path_metadata[0] if path_metadata is not None else path_to_transcript
+            )
+        shard_of = shard.assign_shards(
+            session_keys, args.num_shards, [_file_size(p) for p in gold_paths]
+        )
+        assigned = [
+            i for i, shard_num in enumerate(shard_of) if shard_num == args.shard
+        ]
+        num_metadata_rows = len(meta_df)
+        meta_df = meta_df.iloc[assigned]
+        for name in (
+            "out",
+            "columnar_out",
+            "summary_out",
+            "responsiveness_out",
+            "profile_out",
+        ):
+            if getattr(args, name) is not None:
+                setattr(
+                    args,
+                    name,
+                    shard.shard_path(getattr(args, name), args.shard, args.num_shards),
+                )
+        manifest = shard.ShardManifest(
+            args.shard,
+            args.num_shards,
+            num_metadata_rows,
+            assigned,
+            tsv=args.out,
+            columnar=args.columnar_out,
+        )
+        print(f"Shard {args.shard} of {args.num_shards}", end=": ")
 
     print(f"Processing {len(meta_df)} transcripts...")
+    build_featurizers_fn = functools.partial(
+        build_featurizers,
+        feature_names=args.features,
+        compile_lexicons=not args.no_compile_lexicons,
+    )
+    featurizer_objs = build_featurizers_fn()
 
-    # If the transcripts have already been cached, load from disk
-    # Otherwise, preprocess + featurize each transcript individually
-    if os.path.exists(args.cache_filepath) and args.use_cache:
-        with open(args.cache_filepath, "rb") as f:
-            transcripts = pickle.load(f)
-    else:
-        transcripts = []
-        for i, row in tqdm(meta_df.iterrows(), total=meta_df.shape[0]):
-            path_to_transcript = row["gold_path"]
-            transcripts.append(parse_transcript(path_to_transcript, featurizer_objs))
+    def iter_transcripts():
+        if corpus_store is not None:
+            # Already postprocessed, so only featurize
+            yield from enumerate(
+                tqdm(
+                    corpus_store.featurize(featurizer_objs, profiler=profiler),
+                    total=len(corpus_store),
+                )
+            )
+            return
+        # Preprocess + featurize each transcript individually, or load it from
+        # the cache if it hasn't changed since it was last featurized
+        transcript_cache = None
         if args.use_cache:
-            with open(args.cache_filepath, "wb") as f:
-                pickle.dump(transcripts, f)
-
-    # Serialize all the transcripts and store them as a .tsv
-    tsv_str = ""
-    for i, transcript in enumerate(transcripts):
-        if i == 0:
-            tsv_str += transcript.to_tsv(use_header=True)
-        else:
-            tsv_str += transcript.to_tsv(use_header=False)
-    with open("transcripts.tsv", "w") as f:
-        f.write(tsv_str)
+            transcript_cache = cache.TranscriptCache(args.cache_dir)
+        paths = meta_df["gold_path"].tolist()
+        failures = []
+        for i, transcript, error in tqdm(
+            parse_transcripts(
+                paths,
+                build_featurizers_fn=build_featurizers_fn,
+                workers=args.workers,
+                featurizer_objs=featurizer_objs,
+                transcript_cache=transcript_cache,
+                profiler=profiler,
+                prefetch_depth=args.prefetch,
+                prefetch_max_bytes=int(args.prefetch_mb * 2**20),
+            ),
+            total=len(paths),
+        ):
+            if error is not None:
+                failures.append((paths[i], error))
+            yield i, transcript
+        for path_to_transcript, error in failures:
+            print(f"Failed to parse {path_to_transcript}:\n{error}", file=sys.stderr)
+        if failures:
+            print(
+                f"{len(failures)} of {len(paths)} transcripts failed", file=sys.stderr
+            )
+        if transcript_cache is not None:
+            if args.prune_cache:
+                num_removed, num_bytes = transcript_cache.prune(
+                    cache_keys(paths, featurizer_objs)
+                )
+                print(f"Pruned {num_removed} cache entries ({num_bytes} bytes)")
+            stats = transcript_cache.stats()
+            print(
+                f"Cache: {stats.hits} hits, {stats.misses} misses, {stats.writes}"
+                f" writes; {stats.entries} entries ({stats.bytes} bytes)"
+            )
+
+    # Stream each transcript to the .tsv as soon as it has been featurized
+    columnar_writer = None
+    if args.columnar_out is not None:
+        columnar_writer = columnar.ColumnarWriter(
+            args.columnar_out, featurizers.feature_schema(featurizer_objs)
+        )
+    summary = None
+    if args.summary_out is not None:
+        summary = aggregate.SummaryAccumulator(
+            featurizers.FeatureSchema.from_featurizers(featurizer_objs)
+        )
+    store_writer = None
+    if args.store_out is not None:
+        store_writer = store.StoreWriter(args.store_out, PARSER_SETTINGS)
+    responsiveness_f = None
+    responsiveness_header = True
+    if args.responsiveness_out is not None:
+        responsiveness_f = utils.open_output(args.responsiveness_out)
+    with utils.open_output(args.out) as f:
+        f.write("\t".join(featurizers.TSV_HEADER) + "\n")
+        for i, transcript in iter_transcripts():
+            if transcript is None:
+                continue
+            if manifest is not None:
+                manifest.add(manifest.assigned[i], transcript)
+            with profiler.stage("serialize/tsv"):
+                transcript.to_tsv(out=f)
+            if columnar_writer is not None:
+                with profiler.stage("serialize/columnar"):
+                    columnar_writer.write_transcript(transcript)
+            if store_writer is not None:
+                with profiler.stage("serialize/store"):
+                    store_writer.write_transcript(transcript)
+            if summary is not None:
+                with profiler.stage("aggregate"):
+                    summary.add(transcript)
+            if responsiveness_f is not None:
+                with profiler.stage("responsiveness"):
+                    responsiveness.write_tsv(
+                        responsiveness_f, [transcript], use_header=responsiveness_header
+                    )
+                responsiveness_header = False
+    if columnar_writer is not None:
+        with profiler.stage("serialize/columnar"):
+            columnar_writer.close()
+    if store_writer is not None:
+        with profiler.stage("serialize/store"):
+            store_writer.close()
+    if summary is not None:
+        with profiler.stage("aggregate"):
+            summary.write(args.summary_out)
+    if responsiveness_f is not None:
+        responsiveness_f.close()
+    if manifest is not None:
+        manifest.write(shard.manifest_path(args.out))
+
+    if profiler.enabled:
+        elapsed = time.perf_counter() - run_start
+        if args.profile:
+            print(profiler.summary_table(), file=sys.stderr)
+            print(f"Elapsed: {elapsed:.3f}s", file=sys.stderr)
+        if args.profile_out is not None:
+            profiler.to_json(
+                args.profile_out,
+                meta={
+                    "elapsed": elapsed,
+                    "workers": args.workers,
+                    "transcripts": len(meta_df),
+                },
+            )
@@ -0,0 +1,271 @@
+"""Builds the featurizers for a list of requested feature names
+
+Every feature is computed from an underlying resource: a LIWC category, an
+EmoLex emotion, a therapist tactic phrase list or a timing measure. The
+planner groups the requested features by resource and builds one engine per
+group, so that each lexicon is loaded once and each group of features is
+computed in a single pass over every line:
+
+    LIWC features       one `MultiLIWCFeaturizer`, one gather per token
+    EmoLex features     one `MultiEmoLexFeaturizer`, one gather per word
+    Tactic features     one `MultiTermFeaturizer` over all phrase lists
+    Timing features     one `TimingFeaturizer`
+
+The lexicon featurizers work on vocabulary ids of the tokens (see `vocab`),
+which every transcript encodes once for all of them.
+
+Besides the named features in `FEATURES`, any LIWC category or EmoLex emotion
+can be requested as `liwc_<category>` or `emolex_<emotion>`.
+
+`FEATURES` is a registry: more features can be added with `register_feature`
+(or `register_phrase_list`), and whole new resources with `register_resource`.
+Registration has to happen at import time (e.g., in a module imported before
+`build_featurizers` is called) so that worker processes see it too. With
+`lazy=True`, `build_featurizers` only constructs a featurizer (and loads its
+lexicon) once one of its features is actually computed.
+
+Lexicons are compiled (see `lexicon`) the first time they are used, so later
+runs and worker processes memory-map the compiled artifacts rather than
+parsing the source files.
+"""
+
+import functools
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from features import config
+from features import featurizers
+from features import lexicon
+
+LIWC_RESOURCE = "liwc"
+EMOLEX_RESOURCE = "emolex"
+PHRASES_RESOURCE = "phrases"
+TIMING_RESOURCE = "timing"
+
+# Feature name -> (resource, what it computes from the resource), in the
+# order of the default output
+FEATURES: Dict[str, Tuple[str, str]] = {
+    "you_pronouns": (LIWC_RESOURCE, "you"),
+    "they_pronouns": (LIWC_RESOURCE, "they"),
+    "personal_pronouns": (LIWC_RESOURCE, "ppron"),
+    "i_pronouns": (LIWC_RESOURCE, "i"),
+    "we_pronouns": (LIWC_RESOURCE, "we"),
+    "past_oriented": (LIWC_RESOURCE, "past"),
+    "present_oriented": (LIWC_RESOURCE, "present"),
+    "future_oriented": (LIWC_RESOURCE, "future"),
+    "negative": (EMOLEX_RESOURCE, "negative"),
+    "positive": (EMOLEX_RESOURCE, "positive"),
+    "checking_for_understanding": (PHRASES_RESOURCE, "checking_for_understanding"),
+    "demonstrating_understanding": (
+        PHRASES_RESOURCE,
+        "demonstrating_understanding",
+    ),
+    "hedging": (PHRASES_RESOURCE, "hedging"),
+    "absolutist": (PHRASES_RESOURCE, "absolutist"),
+    "seconds_per_talk_turn": (TIMING_RESOURCE, "seconds_per_talk_turn"),
+    "words_per_second": (TIMING_RESOURCE, "words_per_second"),
+    "inter_turn_gap": (TIMING_RESOURCE, "inter_turn_gap"),
+    "overlap": (TIMING_RESOURCE, "overlap"),
+}
+DEFAULT_FEATURES = [
+    name for name in FEATURES if name not in ("inter_turn_gap", "overlap")
+]
+PHRASE_LISTS = {
+    "checking_for_understanding": featurizers.CHECKING_FOR_UNDERSTANDING_TERMS,
+    "demonstrating_understanding": featurizers.DEMONSTRATING_UNDERSTANDING_TERMS,
+    "hedging": featurizers.HEDGING_TERMS,
+    "absolutist": featurizers.ABSOLUTIST_TERMS,
+}
+# Prefix -> resource of the features requested as `<prefix><key>`
+PREFIXES = {"liwc_": LIWC_RESOURCE, "emolex_": EMOLEX_RESOURCE}
+
+
+def resolve(feature_name: str) -> Tuple[str, str]:
+    """(resource, what it computes) of a feature
+
+    Raises:
+        ValueError: If the feature is unknown
+    """
+    if feature_name in FEATURES:
+        return FEATURES[feature_name]
+    for prefix, resource in PREFIXES.items():
+        if feature_name.startswith(prefix) and len(feature_name) > len(prefix):
+            return resource, feature_name[len(prefix) :]
+    raise ValueError(
+        f"Unknown feature '{feature_name}'; expected one of {list(FEATURES)}"
+        f" or {' / '.join(prefix + '<category>' for prefix in PREFIXES)}"
+    )
+
+
+def plan(feature_names: Sequence[str]) -> Dict[str, Dict[str, str]]:
+    """Group the features by resource
+
+    Returns:
+        resource -> {feature name: what it computes}, with resources in the
+        order their first feature was requested
+    """
+    groups: Dict[str, Dict[str, str]] = {}
+    for feature_name in feature_names:
+        resource, key = resolve(feature_name)
+        groups.setdefault(resource, {})[feature_name] = key
+    return groups
+
+
+def _build_liwc(
+    features_to_keys: Dict[str, str], path_to_lexicon: Optional[str]
+) -> featurizers.Featurizer:
+    return featurizers.MultiLIWCFeaturizer(
+        features_to_keys, path_to_lexicon=path_to_lexicon
+    )
+
+
+def _build_emolex(
+    features_to_keys: Dict[str, str], path_to_lexicon: Optional[str]
+) -> featurizers.Featurizer:
+    return featurizers.MultiEmoLexFeaturizer(
+        features_to_keys, path_to_lexicon=path_to_lexicon
+    )
+
+
+def _build_phrases(
+    features_to_keys: Dict[str, str], path_to_lexicon: Optional[str]
+) -> featurizers.Featurizer:
+    return featurizers.MultiTermFeaturizer(
+        {
+            name: PHRASE_LISTS[phrase_list]
+            for name, phrase_list in features_to_keys.items()
+        }
+    )
+
+
+def _build_timing(
+    features_to_keys: Dict[str, str], path_to_lexicon: Optional[str]
+) -> featurizers.Featurizer:
+    return featurizers.TimingFeaturizer(features_to_keys)
+
+
+# Builds the featurizer of a group of features of a resource, given
+# {feature name: what it computes} and the path to the resource's lexicon
+ResourceBuilder = Callable[[Dict[str, str], Optional[str]], featurizers.Featurizer]
+
+# Resource -> (builder, type of the values of its features)
+RESOURCES: Dict[str, Tuple[ResourceBuilder, type]] = {
+    LIWC_RESOURCE: (_build_liwc, int),
+    EMOLEX_RESOURCE: (_build_emolex, int),
+    PHRASES_RESOURCE: (_build_phrases, int),
+    TIMING_RESOURCE: (_build_timing, float),
+}
+
+
+def register_resource(
+    resource: str,
+    builder: ResourceBuilder,
+    feature_dtype: type = int,
+    prefix: Optional[str] = None,
+):
+    """Add a resource whose features are computed by the featurizer `builder` builds
+
+    Args:
+        resource: Name of the resource
+        builder: Builds the featurizer of a group of features of the resource
+        feature_dtype: Type of the values of its features
+        prefix: If given, any `<prefix><key>` can be requested as a feature
+            computing `key` from the resource
+
+    Raises:
+        ValueError: If the resource or prefix is already registered
+    """
+    if resource in RESOURCES:
+        raise ValueError(f"Resource '{resource}' is already registered")
+    if prefix is not None and prefix in PREFIXES:
+        raise ValueError(f"Prefix '{prefix}' is already registered")
+    RESOURCES[resource] = (builder, feature_dtype)
+    if prefix is not None:
+        PREFIXES[prefix] = resource
+
+
+def register_feature(name: str, resource: str, key: str, default: bool = False):
+    """Add a named feature computing `key` from a registered resource
+
+    Args:
+        default: Whether to also compute the feature by default
+
+    Raises:
+        ValueError: If the feature is already registered or the resource isn't
+    """
+    if name in FEATURES:
+        raise ValueError(f"Feature '{name}' is already registered")
+    if resource not in RESOURCES:
+        raise ValueError(
+            f"Unknown resource '{resource}'; expected one of {list(RESOURCES)}"
+        )
+    FEATURES[name] = (resource, key)
+    if default:
+        DEFAULT_FEATURES.append(name)
+
+
+def register_phrase_list(name: str, terms: Iterable[str], default: bool = False):
+    """Add a feature counting the terms of a phrase list, like the tactics"""
+    if name in FEATURES:
+        raise ValueError(f"Feature '{name}' is already registered")
+    PHRASE_LISTS[name] = list(terms)
+    register_feature(name, PHRASES_RESOURCE, name, default=default)
+
+
+def _compile_and_build(
+    builder: ResourceBuilder,
+    features_to_keys: Dict[str, str],
+    path_to_lexicon: Optional[str],
+    kind: Optional[str],
+) -> featurizers.Featurizer:
+    if kind is not None:
+        try:
+            lexicon.load_compiled(path_to_lexicon, kind=kind, compile_missing=True)
+        except OSError:
+            # e.g., a read-only lexicon folder; the builder reads the source
+            pass
+    return builder(features_to_keys, path_to_lexicon)
+
+
+def build_featurizers(
+    feature_names: Optional[Sequence[str]] = None,
+    path_to_liwc: str = config.LIWC_PATH,
+    path_to_emolex: str = config.EMOLEX_PATH,
+    lazy: bool = False,
+    compile_lexicons: bool = True,
+) -> List[featurizers.Featurizer]:
+    """One featurizer per resource group computing the requested features
+
+    Only the lexicons needed for the requested features are loaded, and with
+    `lazy`, only once a featurizer first computes something (see
+    `featurizers.LazyFeaturizer`). With `compile_lexicons`, a lexicon without
+    a compiled artifact is compiled before its featurizer is built.
+    """
+    feature_names = feature_names if feature_names is not None else DEFAULT_FEATURES
+    lexicon_paths = {LIWC_RESOURCE: path_to_liwc, EMOLEX_RESOURCE: path_to_emolex}
+    lexicon_kinds = {
+        LIWC_RESOURCE: lexicon.LIWC_KIND,
+        EMOLEX_RESOURCE: lexicon.EMOLEX_KIND,
+    }
+    featurizer_objs = []
+    for resource, features_to_keys in plan(feature_names).items():
+        builder, feature_dtype = RESOURCES[resource]
+        build = functools.partial(
+            _compile_and_build,
+            builder,
+            features_to_keys,
+            lexicon_paths.get(resource),
+            lexicon_kinds.get(resource) if compile_lexicons else None,
+        )
+        if lazy:
+            featurizer_objs.append(
+                featurizers.LazyFeaturizer(list(features_to_keys), feature_dtype, build)
+            )
+        else:
+            featurizer_objs.append(build())
+    return featurizer_objs
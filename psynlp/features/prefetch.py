@@ -0,0 +1,108 @@
+"""Reads upcoming transcripts in the background while the current one is parsed
+
+Opening and reading files on a network volume stalls the CPU between
+sessions. A `Prefetcher` hands back the contents of the files in order while
+a small pool of threads reads the next ones:
+
+    for path, text, error in Prefetcher(paths, depth=8):
+        ...
+
+At most `depth` files are read ahead of the one being processed, and reading
+ahead stops once the files read but not yet handed back would exceed
+`max_bytes` (by their size on disk), so a run over many large transcripts
+keeps a bounded amount of text in memory. The file being waited on is always
+read, even if it alone exceeds the cap.
+"""
+
+import collections
+import concurrent.futures
+import os
+from typing import Callable
+from typing import Deque
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def read_text(path: str) -> str:
+    with open(path, mode="r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class Prefetcher(object):
+    """Iterates (path, text, error) over files, reading ahead in threads
+
+    Args:
+        paths: Files to read, in the order they are handed back
+        depth: Maximum number of files read ahead of the current one
+        max_bytes: Cap on the total size of the files read ahead
+        num_threads: Number of reader threads
+        read_fn: Reads one file; called in the reader threads
+
+    The error is the exception raised while reading the file (and the text is
+    None then), so one unreadable file doesn't stop the iteration.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        depth: int = 4,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        num_threads: int = 4,
+        read_fn: Callable[[str], str] = read_text,
+    ):
+        if depth < 1:
+            raise ValueError(f"depth must be at least 1, got {depth}")
+        self.paths = paths
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.num_threads = max(1, min(num_threads, depth))
+        self.read_fn = read_fn
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __iter__(
+        self,
+    ) -> Iterator[Tuple[str, Optional[str], Optional[BaseException]]]:
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.num_threads, thread_name_prefix="prefetch"
+        )
+        # (path, pending read, size on disk) in the order of `paths`
+        in_flight: Deque[Tuple[str, concurrent.futures.Future, int]] = (
+            collections.deque()
+        )
+        buffered_bytes = 0
+        next_index = 0
+        try:
+            while next_index < len(self.paths) or in_flight:
+                while next_index < len(self.paths) and len(in_flight) < self.depth:
+                    path = self.paths[next_index]
+                    size = _file_size(path)
+                    if in_flight and buffered_bytes + size > self.max_bytes:
+                        break
+                    in_flight.append((path, executor.submit(self.read_fn, path), size))
+                    buffered_bytes += size
+                    next_index += 1
+                path, future, size = in_flight.popleft()
+                try:
+                    text, error = future.result(), None
+                except Exception as e:
+                    text, error = None, e
+                buffered_bytes -= size
+                yield path, text, error
+        finally:
+            # If iteration stops early, don't bother with reads not yet started
+            for _, future, _ in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
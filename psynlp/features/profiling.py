@@ -0,0 +1,154 @@
+"""Optional timing and counter instrumentation of the pipeline
+
+A `Profiler` records the wall-clock and CPU time spent in each named stage
+(e.g., "read" or "featurize/hedging"), how often the stage ran, and any
+counters attached to it (e.g., the number of lines featurized):
+
+    profiler = Profiler()
+    with profiler.stage("read"):
+        ...
+    profiler.count("read", "bytes", num_bytes)
+    print(profiler.summary_table())
+
+Code that accepts a profiler defaults to `NULL_PROFILER`, which is disabled:
+its `stage` hands back a shared no-op context manager and `count` returns
+immediately, so instrumentation costs next to nothing when it's turned off.
+"""
+
+import json
+import time
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+
+
+class StageStats(object):
+    __slots__ = ("calls", "wall", "cpu", "counters")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.counters: Dict[str, int] = {}
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "wall": self.wall,
+            "cpu": self.cpu,
+            "counters": dict(self.counters),
+        }
+
+
+class _Stage(object):
+    """Context manager timing one run of a stage"""
+
+    __slots__ = ("stats", "wall_start", "cpu_start")
+
+    def __init__(self, stats: StageStats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.wall += time.perf_counter() - self.wall_start
+        self.stats.cpu += time.process_time() - self.cpu_start
+        self.stats.calls += 1
+
+
+class _NullStage(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler(object):
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        # Stages in the order they first ran
+        self.stages: Dict[str, StageStats] = {}
+
+    def _stats(self, name: str) -> StageStats:
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    def stage(self, name: str):
+        """Context manager adding the time spent in its block to the stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self._stats(name))
+
+    def count(self, name: str, counter: str, n: int = 1):
+        """Add n to one of the stage's counters"""
+        if not self.enabled:
+            return
+        counters = self._stats(name).counters
+        counters[counter] = counters.get(counter, 0) + int(n)
+
+    def merge(self, other: "Profiler"):
+        """Add the stats of another profiler (e.g., of a worker process)"""
+        for name, other_stats in other.stages.items():
+            stats = self._stats(name)
+            stats.calls += other_stats.calls
+            stats.wall += other_stats.wall
+            stats.cpu += other_stats.cpu
+            for counter, n in other_stats.counters.items():
+                stats.counters[counter] = stats.counters.get(counter, 0) + n
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {name: stats.to_dict() for name, stats in self.stages.items()}
+
+    @classmethod
+    def from_dict(cls, stages: Dict[str, Dict]) -> "Profiler":
+        profiler = cls()
+        for name, stats_dict in stages.items():
+            stats = profiler._stats(name)
+            stats.calls = stats_dict["calls"]
+            stats.wall = stats_dict["wall"]
+            stats.cpu = stats_dict["cpu"]
+            stats.counters = dict(stats_dict["counters"])
+        return profiler
+
+    def to_json(self, fpath: str, meta: Optional[Dict] = None):
+        with open(fpath, mode="w") as f:
+            json.dump({"meta": meta or {}, "stages": self.to_dict()}, f, indent=2)
+
+    def summary_table(self, names: Optional[Iterable[str]] = None) -> str:
+        """One row per stage with its calls, times and counters
+
+        Times of stages run in worker processes are summed over the workers,
+        so they can add up to more than the run's elapsed time.
+        """
+        names = list(names) if names is not None else list(self.stages)
+        total_wall = sum(self.stages[name].wall for name in names) or 1.0
+        width = max([len("stage")] + [len(name) for name in names])
+        rows = [
+            f"{'stage':<{width}} {'calls':>8} {'wall s':>10} {'cpu s':>10}"
+            f" {'wall %':>7}  counters"
+        ]
+        for name in names:
+            stats = self.stages[name]
+            counters = ", ".join(
+                f"{counter}={n}" for counter, n in sorted(stats.counters.items())
+            )
+            rows.append(
+                f"{name:<{width}} {stats.calls:>8} {stats.wall:>10.3f}"
+                f" {stats.cpu:>10.3f} {100 * stats.wall / total_wall:>6.1f}%"
+                f"  {counters}"
+            )
+        return "\n".join(rows)
+
+
+NULL_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,158 @@
+"""Therapist responsiveness to the patient's preceding language
+
+For each therapist turn of a featurized `Transcript` (after
+`merge_repeat_speaker_lines`, so speakers mostly alternate), every selected
+feature is related to the patient's turn(s) before it:
+
+    <feature>_patient_lag      the feature of the preceding patient turn
+    <feature>_delta            therapist value minus the lagged patient value
+    <feature>_match            style matching of the per-word rates r_t and r_p,
+                               1 - |r_t - r_p| / (r_t + r_p + 0.0001)
+    <feature>_patient_window   mean over the last `window` patient turns
+    <feature>_window_corr      Pearson correlation of the therapist values and
+                               their lagged patient values over the last
+                               `window` therapist turns
+
+All columns are computed with cumulative sums over the whole transcript;
+lines that aren't therapist turns (or have no preceding patient turn) get NaN.
+"""
+
+import csv
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from features import config
+from features import featurizers
+
+MEASURES = ("patient_lag", "delta", "match", "patient_window", "window_corr")
+# Keeps the match defined when neither speaker used the feature, as in the
+# language style matching literature
+_MATCH_EPSILON = 0.0001
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums over a trailing window (including the current row) down the rows"""
+    cumsums = np.concatenate([np.zeros((1, *values.shape[1:])), np.cumsum(values, 0)])
+    ends = np.arange(1, len(values) + 1)
+    return cumsums[ends] - cumsums[np.maximum(ends - window, 0)]
+
+
+def _preceding_index(is_speaker: np.ndarray) -> np.ndarray:
+    """Index of the last line before each line whose flag is set (-1 if none)"""
+    indices = np.where(is_speaker, np.arange(len(is_speaker)), -1)
+    last_index = np.maximum.accumulate(indices) if len(indices) else indices
+    return np.concatenate([[-1], last_index[:-1]]).astype(np.int64)
+
+
+def compute_responsiveness(
+    transcript: featurizers.Transcript,
+    feature_names: Optional[Sequence[str]] = None,
+    window: int = 5,
+    therapist: str = config.THERAPIST_SPEAKER,
+    patient: str = config.PATIENT_SPEAKER,
+) -> Tuple[List[str], np.ndarray]:
+    """Responsiveness measures of every therapist turn
+
+    Args:
+        transcript: A featurized transcript
+        feature_names: Features to relate; by default all count features
+        window: Number of turns in the sliding windows
+        therapist: Speaker code of the therapist
+        patient: Speaker code of the patient
+
+    Returns:
+        The column names (`<feature>_<measure>` for every feature and measure
+        in `MEASURES`) and a (lines x columns) array of the measures
+    """
+    if transcript.feature_matrix is None:
+        raise ValueError("Transcript has no features; call calculate_features")
+    schema = transcript.schema
+    if feature_names is None:
+        feature_names = [name for name, dtype in schema.columns() if dtype is int]
+    transcript.compute_pending_features(feature_names)
+    columns = [f"{name}_{measure}" for name in feature_names for measure in MEASURES]
+    num_lines = len(transcript.lines)
+    num_features = len(feature_names)
+    result = np.full((num_lines, num_features, len(MEASURES)), np.nan)
+
+    speaker_codes = {speaker: i for i, speaker in enumerate(transcript.speakers)}
+    is_therapist = transcript.speaker_codes == speaker_codes.get(therapist, -1)
+    is_patient = transcript.speaker_codes == speaker_codes.get(patient, -1)
+    prev_patient = _preceding_index(is_patient)
+    responding = np.flatnonzero(is_therapist & (prev_patient >= 0))
+    if len(responding) == 0:
+        return columns, result.reshape(num_lines, -1)
+
+    values = transcript.feature_matrix[:, [schema.index[n] for n in feature_names]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = values / transcript.word_counts[:, None]
+    therapist_values = values[responding]
+    lagged = values[prev_patient[responding]]
+    therapist_rates = rates[responding]
+    lagged_rates = rates[prev_patient[responding]]
+
+    # Mean over the last `window` patient turns up to the lagged one
+    patient_rows = np.flatnonzero(is_patient)
+    patient_values = values[patient_rows]
+    patient_known = ~np.isnan(patient_values)
+    window_sums = _window_sums(np.where(patient_known, patient_values, 0.0), window)
+    window_counts = _window_sums(patient_known.astype(np.float64), window)
+    # Position of each therapist turn's lagged patient turn among patient turns
+    patient_pos = np.searchsorted(patient_rows, prev_patient[responding])
+
+    # Correlation over the last `window` (therapist, lagged patient) pairs
+    paired = ~np.isnan(therapist_values) & ~np.isnan(lagged)
+    x = np.where(paired, therapist_values, 0.0)
+    y = np.where(paired, lagged, 0.0)
+    n = _window_sums(paired.astype(np.float64), window)
+    sum_x, sum_y = _window_sums(x, window), _window_sums(y, window)
+    sum_xx, sum_yy = _window_sums(x * x, window), _window_sums(y * y, window)
+    sum_xy = _window_sums(x * y, window)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[responding, :, 0] = lagged
+        result[responding, :, 1] = therapist_values - lagged
+        result[responding, :, 2] = 1 - np.abs(therapist_rates - lagged_rates) / (
+            therapist_rates + lagged_rates + _MATCH_EPSILON
+        )
+        result[responding, :, 3] = (window_sums / window_counts)[patient_pos]
+        cov = n * sum_xy - sum_x * sum_y
+        var_x = n * sum_xx - sum_x * sum_x
+        var_y = n * sum_yy - sum_y * sum_y
+        corr = cov / np.sqrt(var_x * var_y)
+    # Correlations need at least two pairs and some variance in both
+    corr[(n < 2) | ~(var_x > 0) | ~(var_y > 0)] = np.nan
+    result[responding, :, 4] = np.clip(corr, -1.0, 1.0)
+    return columns, result.reshape(num_lines, -1)
+
+
+def write_tsv(
+    out,
+    transcripts: Sequence[featurizers.Transcript],
+    use_header: bool = True,
+    **kwargs,
+):
+    """Write the responsiveness measures of the therapist turns to a text handle
+
+    One row per therapist turn with a preceding patient turn, with the session
+    and line IDs followed by the measures; missing values are left empty.
+    Keyword arguments are passed on to `compute_responsiveness`.
+    """
+    writer = csv.writer(out, delimiter="\t", lineterminator="\n")
+    for transcript in transcripts:
+        columns, measures = compute_responsiveness(transcript, **kwargs)
+        if use_header:
+            writer.writerow(["session_id", "line_id", *columns])
+            use_header = False
+        rows = np.flatnonzero(~np.isnan(measures).all(axis=1))
+        formatted = measures.astype(str)
+        formatted[np.isnan(measures)] = ""
+        session_id = str(transcript.session_id)
+        for row in rows:
+            writer.writerow(
+                [session_id, transcript.lines[row].line_id, *formatted[row].tolist()]
+            )
@@ -0,0 +1,303 @@
+"""Splitting a run over several nodes and merging the results
+
+Each node processes one shard of the metadata, e.g., on node 3 of 8,
+
+    python parse.py --shard 2 --num_shards 8 --out transcripts.tsv
+
+Every node computes the same partition (see `assign_shards`), so the nodes
+don't need to coordinate. They only need the same metadata and transcript
+files. A shard writes its outputs with a `.shard-<i>-of-<n>` suffix (see
+`shard_path`) along with a manifest listing the transcripts it wrote. Once
+all shards are done, their outputs are combined in metadata order with
+
+    python shard.py transcripts.shard-*-of-8.tsv.manifest.json \
+        --out transcripts.tsv --columnar_out columnar/
+
+Merging streams the shard outputs one transcript at a time, so it never holds
+more than one transcript (or one column slice) in memory.
+"""
+
+import argparse
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import os
+import sys
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+sys.path.append("../../psynlp")
+
+import numpy as np
+
+from features import columnar
+from features import featurizers
+from features import utils
+
+FORMAT_VERSION = 1
+_MANIFEST_SUFFIX = ".manifest.json"
+
+
+def stable_hash(key: str) -> int:
+    """Hash of a string that is the same in every process and on every node"""
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+def assign_shards(
+    keys: Sequence[str], num_shards: int, sizes: Optional[Sequence[int]] = None
+) -> List[int]:
+    """Deterministic shard (0 to num_shards - 1) of every item
+
+    Without sizes, items are assigned by a hash of their key. With sizes
+    (e.g., of the transcript files), the largest items are assigned first,
+    each to the shard with the smallest total size so far, so the shards get
+    about the same amount of work. Ties are broken by the hash of the key and
+    then the shard number, so the result only depends on the keys and sizes.
+    """
+    if num_shards < 1:
+        raise ValueError(f"num_shards must be at least 1, got {num_shards}")
+    if sizes is None:
+        return [stable_hash(key) % num_shards for key in keys]
+    order = sorted(range(len(keys)), key=lambda i: (-sizes[i], stable_hash(keys[i]), i))
+    # (total size, shard) of every shard
+    loads = [(0, shard) for shard in range(num_shards)]
+    shards = [0] * len(keys)
+    for i in order:
+        load, shard = heapq.heappop(loads)
+        shards[i] = shard
+        heapq.heappush(loads, (load + sizes[i], shard))
+    return shards
+
+
+def shard_path(path: str, shard: int, num_shards: int) -> str:
+    """Output path of a shard, e.g., transcripts.shard-2-of-8.tsv.gz"""
+    width = len(str(num_shards - 1))
+    suffix = f".shard-{shard:0{width}d}-of-{num_shards:0{width}d}"
+    directory, name = os.path.split(path.rstrip(os.sep))
+    stem, dot, extensions = name.partition(".")
+    return os.path.join(directory, stem + suffix + dot + extensions)
+
+
+def manifest_path(out: str) -> str:
+    return out + _MANIFEST_SUFFIX
+
+
+def tsv_row_count(transcript: featurizers.Transcript) -> int:
+    """Number of rows `Transcript.to_tsv` writes for a transcript"""
+    if transcript.feature_matrix is not None:
+        return len(transcript.lines) * len(transcript.schema)
+    return sum(len(line.features) for line in transcript.lines)
+
+
+class ShardManifest(object):
+    """Records which transcripts a shard wrote, in the order it wrote them
+
+    Args:
+        shard: Number of the shard
+        num_shards: Total number of shards
+        num_items: Number of rows of the full metadata
+        assigned: Metadata rows assigned to this shard
+        tsv: Path to the shard's .tsv output
+        columnar: Path to the shard's columnar output, if any
+    """
+
+    def __init__(
+        self,
+        shard: int,
+        num_shards: int,
+        num_items: int,
+        assigned: Sequence[int],
+        tsv: str,
+        columnar: Optional[str] = None,
+    ):
+        self.shard = shard
+        self.num_shards = num_shards
+        self.num_items = num_items
+        self.assigned = list(assigned)
+        self.tsv = tsv
+        self.columnar = columnar
+        # (metadata row, session id, number of lines, number of .tsv rows)
+        self.transcripts: List[Dict] = []
+
+    def add(self, index: int, transcript: featurizers.Transcript):
+        self.transcripts.append(
+            {
+                "index": index,
+                "session_id": str(transcript.session_id),
+                "lines": len(transcript.lines),
+                "tsv_rows": tsv_row_count(transcript),
+            }
+        )
+
+    def write(self, fpath: str):
+        """Write the manifest; output paths are stored relative to it"""
+        base_dir = os.path.dirname(os.path.abspath(fpath))
+
+        def relative(path):
+            return os.path.relpath(path, base_dir) if path is not None else None
+
+        with open(fpath, mode="w") as f:
+            json.dump(
+                {
+                    "format_version": FORMAT_VERSION,
+                    "shard": self.shard,
+                    "num_shards": self.num_shards,
+                    "num_items": self.num_items,
+                    "assigned": self.assigned,
+                    "tsv": relative(self.tsv),
+                    "columnar": relative(self.columnar),
+                    "transcripts": self.transcripts,
+                },
+                f,
+            )
+
+    @classmethod
+    def read(cls, fpath: str) -> "ShardManifest":
+        with open(fpath, mode="r") as f:
+            data = json.load(f)
+        if data["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"{fpath} has format version {data['format_version']}, "
+                f"expected {FORMAT_VERSION}"
+            )
+        base_dir = os.path.dirname(os.path.abspath(fpath))
+
+        def absolute(path):
+            return os.path.join(base_dir, path) if path is not None else None
+
+        manifest = cls(
+            data["shard"],
+            data["num_shards"],
+            data["num_items"],
+            data["assigned"],
+            absolute(data["tsv"]),
+            absolute(data["columnar"]),
+        )
+        manifest.transcripts = data["transcripts"]
+        return manifest
+
+
+def check_manifests(manifests: Sequence[ShardManifest]):
+    """Make sure the manifests are all shards of one complete partition
+
+    Raises:
+        ValueError: If a shard is missing or repeated, or if the shards
+            disagree on the partition (e.g., because they were run on
+            different metadata)
+    """
+    if not manifests:
+        raise ValueError("No shards to merge")
+    num_shards = manifests[0].num_shards
+    num_items = manifests[0].num_items
+    shards = sorted(manifest.shard for manifest in manifests)
+    if shards != list(range(num_shards)) or any(
+        manifest.num_shards != num_shards for manifest in manifests
+    ):
+        raise ValueError(f"Expected shards 0 to {num_shards - 1}, got {shards}")
+    assigned = sorted(
+        itertools.chain.from_iterable(manifest.assigned for manifest in manifests)
+    )
+    if any(
+        manifest.num_items != num_items for manifest in manifests
+    ) or assigned != list(range(num_items)):
+        raise ValueError(
+            "The shards don't partition the same metadata; were they all run"
+            " with the same metadata and --num_shards?"
+        )
+
+
+def _merge_order(manifests: Sequence[ShardManifest]) -> List[tuple]:
+    """(metadata row, position of its shard, entry) of every written transcript"""
+    return sorted(
+        (
+            (entry["index"], position, entry)
+            for position, manifest in enumerate(manifests)
+            for entry in manifest.transcripts
+        ),
+        key=lambda item: item[0],
+    )
+
+
+def _open_text(path: str) -> io.TextIOBase:
+    # Rows end in "\n" only; anything else (e.g., "\r") is part of the text
+    if path.endswith(".gz"):
+        return gzip.open(path, mode="rt", encoding="utf-8", newline="\n")
+    return open(path, mode="r", encoding="utf-8", newline="\n")
+
+
+def merge_tsv(manifests: Sequence[ShardManifest], out: str):
+    """Concatenate the shards' .tsv outputs in metadata order"""
+    readers = [_open_text(manifest.tsv) for manifest in manifests]
+    try:
+        headers = [reader.readline() for reader in readers]
+        with utils.open_output(out) as f:
+            f.write(headers[0])
+            for _, position, entry in _merge_order(manifests):
+                f.writelines(itertools.islice(readers[position], entry["tsv_rows"]))
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def merge_columnar(manifests: Sequence[ShardManifest], out_dir: str):
+    """Concatenate the shards' columnar outputs in metadata order"""
+    if any(manifest.columnar is None for manifest in manifests):
+        raise ValueError("Not every shard wrote columnar output")
+    # First row of every transcript in its shard's output
+    first_rows = []
+    for manifest in manifests:
+        num_lines = [entry["lines"] for entry in manifest.transcripts]
+        first_rows.append(
+            {
+                entry["index"]: int(start)
+                for entry, start in zip(
+                    manifest.transcripts, np.cumsum([0] + num_lines)
+                )
+            }
+        )
+    columnar.concatenate(
+        [manifest.columnar for manifest in manifests],
+        [
+            (position, first_rows[position][index], entry["lines"])
+            for index, position, entry in _merge_order(manifests)
+        ],
+        out_dir,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge the outputs of sharded parse.py runs in metadata order"
+    )
+    parser.add_argument(
+        "manifests", nargs="+", help="Manifest (.manifest.json) of every shard"
+    )
+    parser.add_argument(
+        "--out",
+        type=str,
+        default="transcripts.tsv",
+        help="Where to write the merged .tsv (gzip-compressed if it ends in .gz)",
+    )
+    parser.add_argument(
+        "--columnar_out",
+        type=str,
+        default=None,
+        help="If given, also merge the shards' columnar outputs into this directory",
+    )
+    args = parser.parse_args()
+
+    manifests = sorted(
+        (ShardManifest.read(fpath) for fpath in args.manifests),
+        key=lambda manifest: manifest.shard,
+    )
+    check_manifests(manifests)
+    merge_tsv(manifests, args.out)
+    print(f"Merged {len(manifests)} shards into {args.out}")
+    if args.columnar_out is not None:
+        merge_columnar(manifests, args.columnar_out)
+        print(f"Merged {len(manifests)} columnar shards into {args.columnar_out}")
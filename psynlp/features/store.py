@@ -0,0 +1,370 @@
+"""Tokenized corpus store for featurizing without re-parsing
+
+Parsing the raw transcripts (matching the line pattern, cleaning the text
+and postprocessing the lines) only needs to happen once. A store holds the
+postprocessed corpus as memory-mappable arrays, so that trying a new lexicon
+or featurizer only reads the arrays it needs:
+
+    <store_dir>/
+        meta.json                   counts, speakers and parser settings
+        tokens.npy                  int32 vocabulary id of every token
+        pieces.npy                  int32 vocabulary id of every word piece
+        vocab.*                     the vocabulary (tokens and word pieces), a
+                                    string column
+        lines/token_offsets.npy     tokens of line i are
+                                    tokens[token_offsets[i]:token_offsets[i + 1]]
+        lines/piece_offsets.npy     word pieces of line i, likewise
+        lines/speaker_codes.npy     int32 index into meta["speakers"]
+        lines/start_time.npy        float64, NaN when unknown
+        lines/end_time.npy          float64, NaN when unknown
+        lines/line_id.*             string column
+        sessions/line_offsets.npy   lines of session s are
+                                    line_offsets[s]:line_offsets[s + 1]
+        sessions/session_num.npy    int64, -1 when unknown
+        sessions/session_id.*       string columns
+        sessions/fpath.*
+
+String columns are stored as in `columnar`. Postprocessed text is the tokens
+joined by single spaces, so it is rebuilt exactly from the token ids. The
+word pieces (see `Line.word_pieces`) are stored too, so lexicon featurizers
+count the stored ids (mapped once per store to the ids of its
+`vocab.Vocabulary`) without splitting or interning any text.
+
+Write a store with `StoreWriter` (or `parse.py --store_out`), then featurize
+it with `CorpusStore.featurize` (or `parse.py --from_store`).
+"""
+
+import json
+import os
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+import numpy as np
+
+from features import columnar
+from features import featurizers
+from features import profiling
+from features import vocab
+
+FORMAT_VERSION = 2
+
+
+class StoreWriter(object):
+    """Writes postprocessed transcripts, one after another, to a store
+
+    Args:
+        store_dir: Directory to write the store to
+        parser_settings: How the transcripts were parsed, saved along with
+            the store (e.g., `parse.PARSER_SETTINGS`)
+    """
+
+    def __init__(self, store_dir: str, parser_settings: Optional[Dict] = None):
+        self.store_dir = store_dir
+        self.parser_settings = parser_settings or {}
+        for sub_dir in ("lines", "sessions"):
+            os.makedirs(os.path.join(store_dir, sub_dir), exist_ok=True)
+        self.vocab: Dict[str, int] = {}
+        self.speakers: Dict[str, int] = {}
+        self.num_lines = 0
+        self.num_tokens = 0
+        self.num_sessions = 0
+        self._tokens = columnar.NpyAppender(
+            os.path.join(store_dir, "tokens.npy"), np.int32
+        )
+        self._pieces = columnar.NpyAppender(
+            os.path.join(store_dir, "pieces.npy"), np.int32
+        )
+        self.num_pieces = 0
+        self._lines = {
+            "token_offsets": columnar.NpyAppender(
+                os.path.join(store_dir, "lines", "token_offsets.npy"), np.int64
+            ),
+            "piece_offsets": columnar.NpyAppender(
+                os.path.join(store_dir, "lines", "piece_offsets.npy"), np.int64
+            ),
+            "speaker_codes": columnar.NpyAppender(
+                os.path.join(store_dir, "lines", "speaker_codes.npy"), np.int32
+            ),
+            "start_time": columnar.NpyAppender(
+                os.path.join(store_dir, "lines", "start_time.npy"), np.float64
+            ),
+            "end_time": columnar.NpyAppender(
+                os.path.join(store_dir, "lines", "end_time.npy"), np.float64
+            ),
+        }
+        self._line_ids = columnar.StringColumnAppender(
+            os.path.join(store_dir, "lines", "line_id")
+        )
+        self._sessions = {
+            "line_offsets": columnar.NpyAppender(
+                os.path.join(store_dir, "sessions", "line_offsets.npy"), np.int64
+            ),
+            "session_num": columnar.NpyAppender(
+                os.path.join(store_dir, "sessions", "session_num.npy"), np.int64
+            ),
+        }
+        self._session_strings = {
+            name: columnar.StringColumnAppender(
+                os.path.join(store_dir, "sessions", name)
+            )
+            for name in ("session_id", "fpath")
+        }
+        self._lines["token_offsets"].append([0])
+        self._lines["piece_offsets"].append([0])
+        self._sessions["line_offsets"].append([0])
+
+    def write_transcript(self, transcript: featurizers.Transcript):
+        """Add a postprocessed transcript
+
+        Raises:
+            ValueError: If the text of a line isn't its tokens joined by
+                single spaces (as `utils.preprocess_text` leaves it), since it
+                couldn't be rebuilt from the tokens
+        """
+        vocab = self.vocab
+        token_ids = []
+        token_ends = []
+        piece_ids = []
+        piece_ends = []
+        for line in transcript.lines:
+            tokens = line.tokens
+            if " ".join(tokens) != line.text:
+                raise ValueError(
+                    f"Line {line.line_id} of session {transcript.session_id} isn't"
+                    " whitespace-normalized, so it can't be stored as tokens"
+                )
+            token_ids.extend([vocab.setdefault(token, len(vocab)) for token in tokens])
+            token_ends.append(self.num_tokens + len(token_ids))
+            piece_ids.extend(
+                [vocab.setdefault(piece, len(vocab)) for piece in line.word_pieces]
+            )
+            piece_ends.append(self.num_pieces + len(piece_ids))
+        lines = transcript.lines
+        self._tokens.append(token_ids)
+        self._pieces.append(piece_ids)
+        self._lines["token_offsets"].append(token_ends)
+        self._lines["piece_offsets"].append(piece_ends)
+        self._lines["speaker_codes"].append(
+            [
+                self.speakers.setdefault(str(line.speaker), len(self.speakers))
+                for line in lines
+            ]
+        )
+        for name in ("start_time", "end_time"):
+            self._lines[name].append(
+                [
+                    np.nan if getattr(line, name) is None else getattr(line, name)
+                    for line in lines
+                ]
+            )
+        self._line_ids.append([line.line_id for line in lines])
+        self.num_tokens += len(token_ids)
+        self.num_pieces += len(piece_ids)
+        self.num_lines += len(lines)
+        self.num_sessions += 1
+        self._sessions["line_offsets"].append([self.num_lines])
+        self._sessions["session_num"].append(
+            [transcript.session_num if transcript.session_num is not None else -1]
+        )
+        self._session_strings["session_id"].append([str(transcript.session_id)])
+        self._session_strings["fpath"].append([transcript.fpath or ""])
+
+    def close(self):
+        appenders = [
+            self._tokens,
+            self._pieces,
+            *self._lines.values(),
+            self._line_ids,
+            *self._sessions.values(),
+            *self._session_strings.values(),
+        ]
+        for appender in appenders:
+            appender.close()
+        vocab_column = columnar.StringColumnAppender(
+            os.path.join(self.store_dir, "vocab")
+        )
+        vocab_column.append(self.vocab)
+        vocab_column.close()
+        meta = {
+            "format_version": FORMAT_VERSION,
+            "num_sessions": self.num_sessions,
+            "num_lines": self.num_lines,
+            "num_tokens": self.num_tokens,
+            "num_pieces": self.num_pieces,
+            "vocab_size": len(self.vocab),
+            "speakers": list(self.speakers),
+            "parser_settings": self.parser_settings,
+        }
+        with open(os.path.join(self.store_dir, "meta.json"), mode="w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CorpusStore(object):
+    """Read-only view of a store, with every array memory-mapped
+
+    Sessions are rebuilt as postprocessed `Transcript`s on demand, touching
+    only the part of each array (and string column) that holds them.
+
+    Args:
+        store_dir: Directory of the store
+        vocabulary: Vocabulary the stored tokens and word pieces are mapped
+            to for featurizing; a new one by default
+    """
+
+    def __init__(self, store_dir: str, vocabulary: Optional[vocab.Vocabulary] = None):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json"), mode="r") as f:
+            self.meta = json.load(f)
+        if self.meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"{store_dir} has format version {self.meta['format_version']}, "
+                f"expected {FORMAT_VERSION}"
+            )
+        self.speakers: List[str] = self.meta["speakers"]
+        self.tokens = self._load("tokens.npy")
+        self.pieces = self._load("pieces.npy")
+        self.token_offsets = self._load("lines", "token_offsets.npy")
+        self.piece_offsets = self._load("lines", "piece_offsets.npy")
+        self.speaker_codes = self._load("lines", "speaker_codes.npy")
+        self.start_times = self._load("lines", "start_time.npy")
+        self.end_times = self._load("lines", "end_time.npy")
+        self.line_offsets = self._load("sessions", "line_offsets.npy")
+        self.session_nums = self._load("sessions", "session_num.npy")
+        self.vocabulary = vocabulary if vocabulary is not None else vocab.Vocabulary()
+        self._vocab: Optional[List[str]] = None
+        self._vocab_ids: Optional[np.ndarray] = None
+        self._session_ids: Optional[List[str]] = None
+
+    def _load(self, *path: str) -> np.ndarray:
+        return np.load(os.path.join(self.store_dir, *path), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.meta["num_sessions"]
+
+    @property
+    def vocab(self) -> List[str]:
+        """Token of every vocabulary id, decoded on first use"""
+        if self._vocab is None:
+            self._vocab = columnar.read_strings(self.store_dir, "vocab", table="")
+        return self._vocab
+
+    @property
+    def vocab_ids(self) -> np.ndarray:
+        """`self.vocabulary` id of every (lowercased) store vocabulary entry
+
+        Computed once per store, so that featurizing maps stored ids with a
+        gather rather than interning strings.
+        """
+        if self._vocab_ids is None:
+            self._vocab_ids, _ = self.vocabulary.encode(
+                [[entry.lower() for entry in self.vocab]]
+            )
+        return self._vocab_ids
+
+    @property
+    def session_ids(self) -> List[str]:
+        """ID of every session (e.g., to list the sessions of the store)"""
+        if self._session_ids is None:
+            self._session_ids = columnar.read_strings(
+                self.store_dir, "session_id", table="sessions"
+            )
+        return self._session_ids
+
+    def _session_string(self, name: str, session: int) -> str:
+        (value,) = columnar.read_strings(
+            self.store_dir, name, table="sessions", start=session, stop=session + 1
+        )
+        return value
+
+    def _lines_of(self, session: int) -> List[featurizers.Line]:
+        first, last = self.line_offsets[session : session + 2].tolist()
+        line_ids = columnar.read_strings(
+            self.store_dir, "line_id", table="lines", start=first, stop=last
+        )
+        token_offsets = self.token_offsets[first : last + 1]
+        vocab = self.vocab
+        tokens = [
+            vocab[token_id]
+            for token_id in self.tokens[token_offsets[0] : token_offsets[-1]].tolist()
+        ]
+        token_offsets = (token_offsets - token_offsets[0]).tolist()
+        speaker_codes = self.speaker_codes[first:last].tolist()
+        start_times = self.start_times[first:last].tolist()
+        end_times = self.end_times[first:last].tolist()
+        lines = []
+        for i in range(last - first):
+            lines.append(
+                featurizers.Line.from_tokens(
+                    tokens[token_offsets[i] : token_offsets[i + 1]],
+                    line_id=line_ids[i],
+                    speaker=self.speakers[speaker_codes[i]],
+                    start_time=_none_if_nan(start_times[i]),
+                    end_time=_none_if_nan(end_times[i]),
+                )
+            )
+        return lines
+
+    def transcript(self, session: int) -> featurizers.Transcript:
+        """The postprocessed (but not featurized) transcript of a session"""
+        session_num = int(self.session_nums[session])
+        return featurizers.Transcript(
+            lines=self._lines_of(session),
+            session_id=self._session_string("session_id", session),
+            session_num=session_num if session_num >= 0 else None,
+            fpath=self._session_string("fpath", session) or None,
+        )
+
+    def line_ids(
+        self, session: int, lines: Sequence[featurizers.Line]
+    ) -> "vocab.LineIds":
+        """Vocabulary ids of the lines of a session, read from the store"""
+        # (The annotation is a string since `vocab` is also a property here)
+        first, last = self.line_offsets[session : session + 2].tolist()
+        vocab_ids = self.vocab_ids
+        views = []
+        for ids, offsets in (
+            (self.tokens, self.token_offsets),
+            (self.pieces, self.piece_offsets),
+        ):
+            offsets = np.asarray(offsets[first : last + 1])
+            views.append(
+                (vocab_ids[ids[offsets[0] : offsets[-1]]], offsets - offsets[0])
+            )
+        tokens, pieces = views
+        return vocab.LineIds(lines, self.vocabulary, tokens=tokens, pieces=pieces)
+
+    def __iter__(self) -> Iterator[featurizers.Transcript]:
+        for session in range(len(self)):
+            yield self.transcript(session)
+
+    def featurize(
+        self,
+        featurizer_objs: Iterable[featurizers.Featurizer],
+        sessions: Optional[Sequence[int]] = None,
+        profiler: profiling.Profiler = profiling.NULL_PROFILER,
+    ) -> Iterator[featurizers.Transcript]:
+        """Featurize the stored sessions (all by default) one at a time"""
+        featurizer_objs = list(featurizer_objs)
+        schema = featurizers.FeatureSchema.from_featurizers(featurizer_objs)
+        for session in sessions if sessions is not None else range(len(self)):
+            with profiler.stage("store/read"):
+                transcript = self.transcript(session)
+                line_ids = self.line_ids(session, transcript.lines)
+            transcript.calculate_features(
+                featurizer_objs, schema=schema, profiler=profiler, line_ids=line_ids
+            )
+            yield transcript
+
+
+def _none_if_nan(value: float) -> Optional[float]:
+    return None if value != value else value
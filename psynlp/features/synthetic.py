@@ -0,0 +1,221 @@
+"""Seeded generators for synthetic transcripts and lexicons
+
+The clinical transcripts can't be shared and LIWC is proprietary, so tests and
+benchmarks run on stand-ins generated here: sessions in the
+`P [TIME: mm:ss]: ...` format (including the blank turns, bracketed
+annotations, repeat speakers and unparseable lines real transcripts have), a
+LIWC-style .dic file and an NRC EmoLex-style word-level file. The same seed
+always produces the same files.
+"""
+
+import os
+import random
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+CATEGORY_WORDS = {
+    "i": ["i", "me", "my", "mine", "myself", "i'm", "i've"],
+    "we": ["we", "us", "our", "ours", "ourselves", "we're"],
+    "you": ["you", "your", "yours", "yourself", "you're", "y'all"],
+    "shehe": ["she", "he", "her", "him", "his", "hers"],
+    "they": ["they", "them", "their", "theirs", "they're"],
+    "ipron": ["it", "that", "this", "something", "anything", "what"],
+    "past": ["was", "were", "had", "did", "went", "felt", "said", "tried"],
+    "present": ["is", "are", "am", "do", "feel", "go", "say", "try", "know"],
+    "future": ["will", "gonna", "shall", "might", "tomorrow"],
+    "posemo": ["good", "great", "nice", "love", "okay", "better", "calm"],
+    "negemo": ["bad", "hate", "hurt", "upset", "angry", "worse", "awful"],
+}
+# Wildcard entries ("happ*" matches "happy", "happier", ...)
+CATEGORY_PREFIXES = {
+    "posemo": ["happ", "hope", "relax"],
+    "negemo": ["sad", "worr", "anxi", "stress"],
+    "past": ["remember"],
+}
+EMOTIONS = [
+    "anger",
+    "anticipation",
+    "disgust",
+    "fear",
+    "joy",
+    "negative",
+    "positive",
+    "sadness",
+    "surprise",
+    "trust",
+]
+# Phrases counted by the therapist tactic featurizers
+TACTIC_PHRASES = [
+    "does that make sense",
+    "it sounds like",
+    "i hear you",
+    "i guess",
+    "maybe",
+    "kind of",
+    "always",
+    "never",
+    "completely",
+]
+ANNOTATIONS = ["[LAUGHTER]", "[inaudible]", "[crosstalk]", "[pause]", "[sighs]"]
+PUNCTUATION = [".", ".", ".", "?", "!", ",", "..."]
+
+
+def filler_words(num_words: int) -> List[str]:
+    """Made-up words that aren't in any of the category word lists"""
+    return [f"w{i:05d}" for i in range(num_words)]
+
+
+def write_liwc_dic(path: str, seed: int = 0, num_filler_words: int = 4000) -> str:
+    """Write a LIWC-style .dic file
+
+    The categories of `CATEGORY_WORDS` (plus `pronoun` and `ppron`, which
+    contain the pronoun categories) are assigned to their words and wildcard
+    prefixes; the filler words are spread randomly over the categories so the
+    lexicon is about as large as a real one.
+    """
+    rng = random.Random(seed)
+    categories = ["pronoun", "ppron", *CATEGORY_WORDS]
+    category_ids = {category: i + 1 for i, category in enumerate(categories)}
+    entries: Dict[str, List[str]] = {}
+    for category, words in CATEGORY_WORDS.items():
+        for word in words:
+            entries.setdefault(word, []).append(category)
+    for category, prefixes in CATEGORY_PREFIXES.items():
+        for prefix in prefixes:
+            entries.setdefault(prefix + "*", []).append(category)
+    for category in ("i", "we", "you", "shehe", "they"):
+        for word in CATEGORY_WORDS[category]:
+            entries[word] = ["pronoun", "ppron", *entries[word]]
+    for word in CATEGORY_WORDS["ipron"]:
+        entries[word] = ["pronoun", *entries[word]]
+    for word in filler_words(num_filler_words):
+        num_categories = rng.choice([1, 1, 1, 2, 3])
+        entries[word] = rng.sample(categories[2:], num_categories)
+
+    with open(path, mode="w") as f:
+        f.write("%\n")
+        for category in categories:
+            f.write(f"{category_ids[category]}\t{category}\n")
+        f.write("%\n")
+        for pattern in sorted(entries):
+            cat_ids = "\t".join(str(category_ids[cat]) for cat in entries[pattern])
+            f.write(f"{pattern}\t{cat_ids}\n")
+    return path
+
+
+def write_emolex(path: str, seed: int = 0, num_words: int = 14000) -> str:
+    """Write an NRC EmoLex-style file ("word<TAB>emotion<TAB>0/1" per line)"""
+    rng = random.Random(seed)
+    positive = set(CATEGORY_WORDS["posemo"])
+    negative = set(CATEGORY_WORDS["negemo"])
+    words = sorted({*positive, *negative, *filler_words(num_words)})
+    with open(path, mode="w", encoding="utf-8") as f:
+        for word in words:
+            for emo in EMOTIONS:
+                if emo == "positive" and word in positive:
+                    conveys_emo = 1
+                elif emo == "negative" and word in negative:
+                    conveys_emo = 1
+                elif word in positive or word in negative:
+                    conveys_emo = 0
+                else:
+                    conveys_emo = int(rng.random() < 0.08)
+                f.write(f"{word}\t{emo}\t{conveys_emo}\n")
+    return path
+
+
+class SessionGenerator(object):
+    """Generates the text of synthetic therapy sessions"""
+
+    def __init__(self, seed: int = 0, num_filler_words: int = 4000):
+        self.rng = random.Random(seed)
+        vocab = [word for words in CATEGORY_WORDS.values() for word in words]
+        vocab += [
+            prefix + suffix
+            for prefixes in CATEGORY_PREFIXES.values()
+            for prefix in prefixes
+            for suffix in ("y", "ing")
+        ]
+        vocab += filler_words(num_filler_words)
+        self.rng.shuffle(vocab)
+        self.vocab = vocab
+        # Zipf-like word frequencies, as in natural language
+        self.cum_weights = []
+        total = 0.0
+        for rank in range(len(vocab)):
+            total += 1.0 / (rank + 1)
+            self.cum_weights.append(total)
+
+    def utterance(self, num_words: int) -> str:
+        rng = self.rng
+        words = rng.choices(self.vocab, cum_weights=self.cum_weights, k=num_words)
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(TACTIC_PHRASES))
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(ANNOTATIONS))
+        words[0] = words[0].capitalize()
+        return " ".join(words) + rng.choice(PUNCTUATION)
+
+    def session(self, num_turns: int) -> str:
+        """Text of one session with (about) `num_turns` talk turns"""
+        rng = self.rng
+        lines = ["Transcript of a synthetic session", ""]
+        speaker = "T"
+        time_in_secs = 0
+        for _ in range(num_turns):
+            # Speakers mostly alternate, but sometimes have consecutive turns
+            if rng.random() < 0.85:
+                speaker = "P" if speaker == "T" else "T"
+            num_words = max(1, int(rng.expovariate(1 / 14)))
+            if rng.random() < 0.03:
+                text = rng.choice(ANNOTATIONS)
+            else:
+                text = self.utterance(num_words)
+            minutes, seconds = divmod(time_in_secs, 60)
+            lines.append(f"{speaker} [TIME: {minutes:02d}:{seconds:02d}]: {text}")
+            if rng.random() < 0.02:
+                lines.append("")
+            time_in_secs += rng.randint(0, 2) + num_words // 3
+        return "\n".join(lines) + "\n"
+
+
+def write_corpus(
+    out_dir: str,
+    num_sessions: int,
+    turns_per_session: int = 400,
+    seed: int = 0,
+    generator: Optional[SessionGenerator] = None,
+) -> List[str]:
+    """Write synthetic session files named like the real transcripts
+
+    Returns:
+        The paths of the session files
+    """
+    generator = generator if generator is not None else SessionGenerator(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(num_sessions):
+        num_turns = max(
+            2, int(generator.rng.gauss(turns_per_session, turns_per_session / 4))
+        )
+        path = os.path.join(out_dir, f"S{i % 20 + 1}_{60000 + i:06d}_P1_03.02.01_A.TXT")
+        with open(path, mode="w", encoding="utf-8") as f:
+            f.write(generator.session(num_turns))
+        paths.append(path)
+    return paths
+
+
+def write_lexicons(out_dir: str, seed: int = 0) -> Tuple[str, str]:
+    """Write a synthetic LIWC .dic and EmoLex file
+
+    Returns:
+        The paths of the .dic and the EmoLex file
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    path_to_liwc = write_liwc_dic(os.path.join(out_dir, "synthetic.dic"), seed=seed)
+    path_to_emolex = write_emolex(
+        os.path.join(out_dir, "synthetic_emolex.txt"), seed=seed
+    )
+    return path_to_liwc, path_to_emolex
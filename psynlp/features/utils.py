@@ -1,9 +1,23 @@
+import gzip
+import io
 import math
 import re
 
+from typing import Dict
+from typing import Iterable
+from typing import List
 from typing import Optional
+from typing import Sequence
 from typing import Tuple
-from typing import Iterable
+
+from features import config
+
+# Annotator meta-comments, e.g., "[LAUGHTER]"
+_BRACKETED_PATTERN = re.compile(r"\[.*?\]")
+# Punctuation to remove (except single apostrophes, as in can't or don't)
+_PUNC_TABLE = str.maketrans("", "", '!"#$%&()*+,-./:;<=>?@[]^_`{|}~')
+# Multiline, so that "^" and "$" anchor each line when searching a whole text
+_LINE_PATTERN = re.compile(config.LINE_PATTERN, re.MULTILINE)
 
 def min_sec_fmt(minutes: float) -> str:
     minutes_rounded = math.floor(minutes)
@@ -20,17 +34,27 @@ def preprocess_text(text: str) -> str:
 
     # Remove any meta-comments added by annotators
     # e.g., "Haha [LAUGHTER] funny!" -> "Haha funny!"
-    cleaned = re.sub(r"\[.*?\]", "", cleaned)
+    cleaned = _BRACKETED_PATTERN.sub("", cleaned)
 
     # Remove any punctuations (except single apostrophes, as in can't or don't)
-    punc_table = str.maketrans("", "", '!"#$%&()*+,-./:;<=>?@[]^_`{|}~')
-    cleaned = cleaned.translate(punc_table)
+    cleaned = cleaned.translate(_PUNC_TABLE)
 
     # Get rid of any extraneous space in between words
     cleaned = " ".join([w for w in cleaned.split()])
     return cleaned
 
 
+def open_output(fpath: str, buffer_size: int = 1 << 20) -> io.TextIOBase:
+    """Open a text file for buffered writing, gzip-compressed if it ends in .gz"""
+    if fpath.endswith(".gz"):
+        return io.TextIOWrapper(
+            io.BufferedWriter(gzip.open(fpath, mode="wb"), buffer_size),
+            encoding="utf-8",
+            newline="",
+        )
+    return open(fpath, mode="w", encoding="utf-8", newline="", buffering=buffer_size)
+
+
 def generate_line_id(sess_id: str, line_num: int, line_id_len: int) -> str:
     return sess_id + "_" + str(line_num).zfill(line_id_len)
 
@@ -74,21 +98,109 @@ def extract_metadata_from_line(
             line_content: String of text with person's name and
                 timestamp extracted/removed
         """
-        # Our pattern is e.g., "P [TIME: 20:15]: I'm sad"
+        # The pattern (see `config.LINE_PATTERN`) is e.g., "P [TIME: 20:15]: I'm sad"
         # which means the patient said "I'm sad" 20'15" into the conversation.
-        pattern = r"([A-Za-z]+)\s\[TIME: ([0-9]+):([0-9]+)\]:(.*)"  # Edit as needed
-        pattern_match = re.search(pattern, line)
+        pattern_match = _LINE_PATTERN.search(line)
         if pattern_match is None:
             if verbose:
                 print(f"Could not parse this line:\n\t'{line}'\n")
             return None
-        person: str = pattern_match.group(1)
-        time_in_secs: float = int(pattern_match.group(2)) * 60.0 + int(
-            pattern_match.group(3)
-        )
-        time_in_mins: float = time_in_secs / 60.0
-        line_content: str = pattern_match.group(4)
-        return person, time_in_mins, line_content
+        return _turn_from_match(pattern_match)
+
+
+def _turn_from_match(pattern_match: re.Match) -> Tuple[str, float, str]:
+    person: str = pattern_match.group("speaker")
+    time_in_secs: float = int(pattern_match.group("minutes")) * 60.0 + int(
+        pattern_match.group("seconds")
+    )
+    time_in_mins: float = time_in_secs / 60.0
+    line_content: str = pattern_match.group("text")
+    return person, time_in_mins, line_content
+
+
+def preprocess_texts(texts: Sequence[str]) -> List[str]:
+    """`preprocess_text` applied to many texts, none containing a line break
+
+    The texts are cleaned as one newline-joined string, which saves a regex
+    and translate call per text.
+    """
+    if not texts:
+        return []
+    cleaned = _BRACKETED_PATTERN.sub("", "\n".join(texts).lower())
+    cleaned = cleaned.translate(_PUNC_TABLE)
+    return [" ".join(text.split()) for text in cleaned.split("\n")]
+
+
+def parse_transcript_text(
+    text: str, pattern: Optional[re.Pattern] = None
+) -> Tuple[List[str], List[float], List[str]]:
+    """Extract every talk turn from the full text of a transcript
+
+    This gives the same result as calling `extract_metadata_from_line` and
+    `preprocess_text` on each line of the text, but searches the whole text at
+    once.
+
+    Args:
+        text: Transcript contents, with line breaks normalized to "\\n" (as
+            when reading a file in text mode)
+        pattern: Compiled line pattern with the named groups of
+            `config.LINE_PATTERN` (the default). "^" and "$" anchor each line,
+            as when matching line by line
+
+    Returns:
+        speakers: Speaker of each turn
+        start_times: Time stamp of each turn in minutes
+        texts: Cleaned text of each turn
+    """
+    pattern = pattern if pattern is not None else _LINE_PATTERN
+    if r"\A" in pattern.pattern or r"\Z" in pattern.pattern:
+        # Anchored to the start or end of the text, which here is each line
+        return _parse_transcript_lines(text, pattern)
+    if not pattern.flags & re.MULTILINE:
+        pattern = re.compile(pattern.pattern, pattern.flags | re.MULTILINE)
+    turns = []
+    line_end = -1
+    for pattern_match in pattern.finditer(text):
+        if "\n" in pattern_match.group(0):
+            # The pattern matched across lines, so match each line on its own
+            return _parse_transcript_lines(text, pattern)
+        if pattern_match.start() <= line_end:
+            # Only the first turn on each line counts
+            continue
+        turns.append(_turn_from_match(pattern_match))
+        line_end = text.find("\n", pattern_match.end())
+        if line_end == -1:
+            break
+    speakers = [person for person, _, _ in turns]
+    start_times = [time_in_mins for _, time_in_mins, _ in turns]
+    texts = preprocess_texts([line_content for _, _, line_content in turns])
+    return speakers, start_times, texts
+
+
+def _parse_transcript_lines(
+    text: str, pattern: re.Pattern
+) -> Tuple[List[str], List[float], List[str]]:
+    """Line-by-line version of `parse_transcript_text`"""
+    speakers = []
+    start_times = []
+    texts = []
+    for line in io.StringIO(text):
+        pattern_match = pattern.search(line)
+        if pattern_match is None:
+            continue
+        person, time_in_mins, line_content = _turn_from_match(pattern_match)
+        speakers.append(person)
+        start_times.append(time_in_mins)
+        texts.append(preprocess_text(line_content))
+    return speakers, start_times, texts
+
+
+def read_transcript(
+    path_to_transcript: str,
+) -> Tuple[List[str], List[float], List[str]]:
+    """Read a transcript file in one go; see `parse_transcript_text`"""
+    with open(path_to_transcript, mode="r", encoding="utf-8") as f:
+        return parse_transcript_text(f.read())
     
     
 # Currently O(T * N) where T is the number in the set, N is length of line
@@ -103,3 +215,126 @@ def count_terms_in_line(text: str, terms: Iterable[str]):
         )
     return num_occur_terms_in_line
 
+
+# Splits text into maximal runs of word and non-word characters, e.g.,
+# "don't stop" -> ["don", "'", "t", " ", "stop"]
+_PIECE_PATTERN = re.compile(r"\w+|\W+")
+_WORD_EDGES_PATTERN = re.compile(r"\w(.*\w)?", re.DOTALL)
+
+
+def split_word_pieces(text: str) -> List[str]:
+    """Split text into alternating runs of word and non-word characters
+
+    Joining the pieces gives back the original text. Since every run is
+    maximal, a word piece always starts and ends on a word boundary.
+    """
+    return _PIECE_PATTERN.findall(text)
+
+
+def matches_whole_pieces(term: str) -> bool:
+    """Whether a term starts and ends with a word character
+
+    Only such terms match text exactly where their pieces match a run of the
+    text's pieces; others need a regular expression.
+    """
+    return _WORD_EDGES_PATTERN.fullmatch(term) is not None
+
+
+def overlaps_itself(pieces: Sequence[str]) -> bool:
+    """Whether a proper suffix of a term's pieces is also a prefix of them
+
+    Occurrences of such a term can overlap (e.g., "no no" in "no no no"), and
+    only non-overlapping ones are counted.
+    """
+    n = len(pieces)
+    return any(pieces[k:] == pieces[: n - k] for k in range(1, n))
+
+
+class PhraseMatcher(object):
+    """Counts occurrences of a fixed set of single- and multi-word terms
+
+    The terms are compiled once into a trie over word pieces (see
+    `split_word_pieces`), so a line is scanned in a single pass no matter how
+    many terms there are. Counts are the same as `count_terms_in_line`:
+    matching is case-insensitive and on word boundaries, every term is counted
+    independently (so "it sounds like" also counts "sounds like"), and repeat
+    occurrences of the same term never overlap.
+
+    Terms can be assigned to groups (e.g., one per feature), which are then
+    counted separately in the same pass with `count_groups`.
+    """
+
+    def __init__(self, terms: Iterable[str], groups: Optional[Iterable[int]] = None):
+        """
+        Args:
+            terms: Terms to count
+            groups: Group of each term, numbered from 0; all terms are in
+                group 0 by default
+        """
+        self.terms: List[str] = list(terms)
+        self.groups: List[int] = (
+            list(groups) if groups is not None else [0] * len(self.terms)
+        )
+        self.num_groups = max(self.groups, default=-1) + 1
+        self._trie: Dict = {}
+        # Terms that don't start and end with a word character can't be
+        # expressed as a sequence of whole pieces, so count them the old way
+        self._irregular_patterns = []
+        for term_id, (term, group) in enumerate(zip(self.terms, self.groups)):
+            term = term.lower()
+            if not matches_whole_pieces(term):
+                self._irregular_patterns.append(
+                    (re.compile(r"\b%s\b" % re.escape(term), re.IGNORECASE), group)
+                )
+                continue
+            pieces = split_word_pieces(term)
+            node = self._trie
+            for piece in pieces:
+                node = node.setdefault(piece, {})
+            # The `None` key marks the end of one or more terms and holds
+            # ((group, number of terms) pairs, (term id, group) pairs of terms
+            # that can overlap themselves)
+            group_counts, overlapping = node.get(None, ((), ()))
+            if overlaps_itself(pieces):
+                overlapping += ((term_id, group),)
+            else:
+                group_counts = dict(group_counts)
+                group_counts[group] = group_counts.get(group, 0) + 1
+                group_counts = tuple(group_counts.items())
+            node[None] = (group_counts, overlapping)
+
+    def count(self, text: str) -> int:
+        return self.count_pieces(split_word_pieces(text.lower()))
+
+    def count_pieces(self, pieces: Sequence[str]) -> int:
+        """Count term occurrences in already lowercased, split text"""
+        return sum(self.count_groups(pieces))
+
+    def count_groups(self, pieces: Sequence[str]) -> List[int]:
+        """Count term occurrences of each group in lowercased, split text"""
+        counts = [0] * self.num_groups
+        last_end: Dict[int, int] = {}
+        num_pieces = len(pieces)
+        root = self._trie
+        for start, piece in enumerate(pieces):
+            node = root.get(piece)
+            end = start + 1
+            while node is not None:
+                terminal = node.get(None)
+                if terminal is not None:
+                    group_counts, overlapping = terminal
+                    for group, n_terms in group_counts:
+                        counts[group] += n_terms
+                    for term_id, group in overlapping:
+                        if last_end.get(term_id, 0) <= start:
+                            last_end[term_id] = end
+                            counts[group] += 1
+                if end == num_pieces:
+                    break
+                node = node.get(pieces[end])
+                end += 1
+        if self._irregular_patterns:
+            text = "".join(pieces)
+            for pattern, group in self._irregular_patterns:
+                counts[group] += sum(1 for _ in pattern.finditer(text))
+        return counts
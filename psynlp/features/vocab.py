@@ -0,0 +1,359 @@
+"""Counting lexicon hits over integer ids of an interned vocabulary
+
+LIWC categories, EmoLex emotions and the tactic phrase lists all count the
+tokens (or word pieces) of a line that fall in some set. Rather than looking
+every token up in each lexicon, the tokens of a transcript are interned once
+into a `Vocabulary`, giving integer id arrays (`LineIds`). Each lexicon is
+compiled into a table over the vocabulary (`LexiconTable`), mapping every
+vocabulary id to the columns it counts towards, so the counts of all lines
+come from NumPy gathers and a `bincount` over the id arrays. Multi-word
+phrases are matched with a table of n-grams of ids (`PhraseTable`).
+
+A lexicon only looks up each distinct string once, when the vocabulary first
+contains it, and the ids of a transcript are shared by every featurizer (see
+`Featurizer.featurize_ids`), so the per-token cost is one dict lookup for
+interning plus array operations.
+
+A vocabulary (and every table compiled against it) only grows, so runs over
+many transcripts create their own, e.g., one per `parse.parse_transcripts`
+call or worker process, `store.CorpusStore` or `online.OnlineTranscript`.
+The process-wide `VOCABULARY` is only the default for featurizing a few
+lines or transcripts at a time, and can be emptied with `clear`.
+"""
+
+import itertools
+import weakref
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import TypeVar
+
+import numpy as np
+
+from features import utils
+
+T = TypeVar("T")
+
+# Multiplier of the polynomial hash used to screen n-grams of ids
+_HASH_BASE = 0x9E3779B97F4A7C15
+
+
+def _hash_powers(n: int) -> np.ndarray:
+    return np.array([pow(_HASH_BASE, j, 2**64) for j in range(n)], dtype=np.uint64)
+
+
+def _ngram_hashes(windows: np.ndarray, powers: np.ndarray) -> np.ndarray:
+    """Hash (mod 2**64) of every row of a (windows x n) array of ids"""
+    return (windows.astype(np.uint64) * powers).sum(axis=1, dtype=np.uint64)
+
+
+def _is_in_sorted(values: np.ndarray, sorted_values: np.ndarray) -> np.ndarray:
+    positions = np.searchsorted(sorted_values, values)
+    positions[positions == len(sorted_values)] = 0
+    return sorted_values[positions] == values
+
+
+class _Interner(dict):
+    """Maps strings to ids, giving the next id to every new string"""
+
+    def __init__(self, strings: List[str]):
+        super().__init__()
+        self.strings = strings
+
+    def __missing__(self, string: str) -> int:
+        string_id = self[string] = len(self.strings)
+        self.strings.append(string)
+        return string_id
+
+
+class Vocabulary(object):
+    """Interned strings; ids are dense and never change once given out
+
+    The vocabulary also keeps the tables compiled against it (see `table`),
+    so that they are dropped along with their owners.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids = _Interner(self.strings)
+        self._tables = weakref.WeakKeyDictionary()
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def clear(self):
+        """Forget every string and compiled table
+
+        Ids given out before are no longer valid, so only clear a vocabulary
+        between runs.
+        """
+        self.strings.clear()
+        self._ids.clear()
+        self._tables = weakref.WeakKeyDictionary()
+
+    def id(self, string: str) -> int:
+        return self._ids[string]
+
+    def encode(
+        self, sequences: Sequence[Sequence[str]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids of many sequences of strings, concatenated
+
+        Returns:
+            The int32 ids, and the int64 offsets such that the ids of
+            sequence i are `ids[offsets[i]:offsets[i + 1]]`
+        """
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum(
+            np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences)),
+            out=offsets[1:],
+        )
+        ids = np.fromiter(
+            map(self._ids.__getitem__, itertools.chain.from_iterable(sequences)),
+            dtype=np.int32,
+            count=int(offsets[-1]),
+        )
+        return ids, offsets
+
+    def table(self, owner: object, build: Callable[["Vocabulary"], T]) -> T:
+        """The table `owner` (e.g., a featurizer) compiled against this vocabulary
+
+        The table is built with `build(vocabulary)` the first time.
+        """
+        table = self._tables.get(owner)
+        if table is None:
+            table = self._tables[owner] = build(self)
+        return table
+
+
+# Vocabulary shared by all featurizers of the process
+VOCABULARY = Vocabulary()
+
+
+class LineIds(object):
+    """Ids of the lowercased tokens and word pieces of some lines
+
+    Each view is encoded the first time a featurizer asks for it, unless its
+    ids and offsets are given (e.g., as read from a `store.CorpusStore`).
+    """
+
+    def __init__(
+        self,
+        lines: Sequence,
+        vocabulary: Vocabulary = VOCABULARY,
+        tokens: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        pieces: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ):
+        self.lines = lines
+        self.vocabulary = vocabulary
+        self._tokens = tokens
+        self._pieces = pieces
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    @property
+    def tokens(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and offsets of every line's `lower_tokens`"""
+        if self._tokens is None:
+            self._tokens = self.vocabulary.encode(
+                [line.lower_tokens for line in self.lines]
+            )
+        return self._tokens
+
+    @property
+    def pieces(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and offsets of every line's `word_pieces`"""
+        if self._pieces is None:
+            self._pieces = self.vocabulary.encode(
+                [line.word_pieces for line in self.lines]
+            )
+        return self._pieces
+
+
+class LexiconTable(object):
+    """Columns each vocabulary entry counts towards, as a sparse table
+
+    Args:
+        lookup: Columns a string counts towards (a column may be repeated to
+            count it more than once); called once per vocabulary entry
+        num_cols: Number of columns
+        vocabulary: Vocabulary whose ids are looked up
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[str], Iterable[int]],
+        num_cols: int,
+        vocabulary: Vocabulary = VOCABULARY,
+    ):
+        self.lookup = lookup
+        self.num_cols = num_cols
+        self.vocabulary = vocabulary
+        # The columns of id i are indices[indptr[i]:indptr[i + 1]]
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int64)
+
+    def _compile_new_entries(self):
+        strings = self.vocabulary.strings
+        num_compiled = len(self._indptr) - 1
+        if num_compiled == len(strings):
+            return
+        cols = [list(self.lookup(string)) for string in strings[num_compiled:]]
+        lengths = np.fromiter(map(len, cols), dtype=np.int64, count=len(cols))
+        self._indptr = np.concatenate(
+            [self._indptr, self._indptr[-1] + np.cumsum(lengths)]
+        )
+        self._indices = np.concatenate(
+            [
+                self._indices,
+                np.fromiter(
+                    itertools.chain.from_iterable(cols),
+                    dtype=np.int64,
+                    count=int(lengths.sum()),
+                ),
+            ]
+        )
+
+    def count(self, ids: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """(lines x columns) counts, given ids and offsets as from `encode`"""
+        self._compile_new_entries()
+        num_lines = len(offsets) - 1
+        starts = self._indptr[ids]
+        lengths = self._indptr[ids + 1] - starts
+        hits = np.flatnonzero(lengths)
+        starts = starts[hits]
+        lengths = lengths[hits]
+        # Position of every (hit, column) pair in `indices`
+        hit_ends = np.cumsum(lengths)
+        positions = np.repeat(starts - hit_ends + lengths, lengths) + np.arange(
+            hit_ends[-1] if len(hit_ends) else 0
+        )
+        line_of_hit = np.searchsorted(offsets, hits, side="right") - 1
+        cells = (
+            np.repeat(line_of_hit, lengths) * self.num_cols + self._indices[positions]
+        )
+        counts = np.bincount(cells, minlength=num_lines * self.num_cols)
+        return counts.reshape(num_lines, self.num_cols).astype(np.float64)
+
+
+class PhraseTable(object):
+    """Counts the same terms as a `utils.PhraseMatcher`, over piece ids
+
+    Single-piece terms are counted with a `LexiconTable`. Longer terms are
+    looked up as n-grams of piece ids, starting only at pieces that begin
+    some term. Counts match `PhraseMatcher.count_groups` exactly, including
+    for terms that can overlap themselves and for terms that aren't made of
+    whole pieces (which are counted by a `PhraseMatcher`).
+    """
+
+    def __init__(
+        self,
+        terms: Iterable[str],
+        groups: Optional[Iterable[int]] = None,
+        num_groups: Optional[int] = None,
+        vocabulary: Vocabulary = VOCABULARY,
+    ):
+        terms = list(terms)
+        groups = list(groups) if groups is not None else [0] * len(terms)
+        self.num_groups = (
+            num_groups if num_groups is not None else max(groups, default=-1) + 1
+        )
+        self.vocabulary = vocabulary
+        word_groups: Dict[str, List[int]] = {}
+        # Number of pieces -> piece ids -> (groups of the terms, one entry per
+        # term, (term id, group) of terms that can overlap themselves)
+        self._ngrams: Dict[int, Dict[Tuple[int, ...], Tuple[List, List]]] = {}
+        irregular_terms = []
+        irregular_groups = []
+        for term_id, (term, group) in enumerate(zip(terms, groups)):
+            term = term.lower()
+            if not utils.matches_whole_pieces(term):
+                irregular_terms.append(term)
+                irregular_groups.append(group)
+                continue
+            pieces = utils.split_word_pieces(term)
+            if len(pieces) == 1:
+                word_groups.setdefault(term, []).append(group)
+                continue
+            key = tuple(vocabulary.id(piece) for piece in pieces)
+            group_list, overlapping = self._ngrams.setdefault(
+                len(pieces), {}
+            ).setdefault(key, ([], []))
+            if utils.overlaps_itself(pieces):
+                overlapping.append((term_id, group))
+            else:
+                group_list.append(group)
+        self._words = LexiconTable(
+            lambda piece: word_groups.get(piece, ()), self.num_groups, vocabulary
+        )
+        # Whether each id (up to the largest that starts a term) starts a term
+        first_ids = [key[0] for ngrams in self._ngrams.values() for key in ngrams]
+        self._starts_term = np.zeros(max(first_ids, default=-1) + 2, dtype=bool)
+        self._starts_term[first_ids] = True
+        self._powers = {n: _hash_powers(n) for n in self._ngrams}
+        self._hashes = {
+            n: np.unique(
+                _ngram_hashes(np.array(list(ngrams), dtype=np.int64), self._powers[n])
+            )
+            for n, ngrams in self._ngrams.items()
+        }
+        self._irregular = (
+            utils.PhraseMatcher(irregular_terms, irregular_groups)
+            if irregular_terms
+            else None
+        )
+
+    def count(self, line_ids: LineIds) -> np.ndarray:
+        """(lines x groups) counts of the terms in each line"""
+        ids, offsets = line_ids.pieces
+        counts = self._words.count(ids, offsets)
+        if self._ngrams:
+            self._count_ngrams(ids, offsets, counts)
+        if self._irregular is not None:
+            count_groups = self._irregular.count_groups
+            for i, line in enumerate(line_ids.lines):
+                group_counts = count_groups(line.word_pieces)
+                counts[i, : len(group_counts)] += group_counts
+        return counts
+
+    def _count_ngrams(self, ids: np.ndarray, offsets: np.ndarray, counts: np.ndarray):
+        no_term = len(self._starts_term) - 1
+        starts = np.flatnonzero(self._starts_term[np.minimum(ids, no_term)])
+        line_of_start = np.searchsorted(offsets, starts, side="right") - 1
+        line_ends = offsets[line_of_start + 1]
+        hit_lines = []
+        hit_groups = []
+        # End of the last counted occurrence of each self-overlapping term;
+        # starts are visited in order and n-grams never span two lines
+        last_end: Dict[int, int] = {}
+        for n, ngrams in self._ngrams.items():
+            fits = np.flatnonzero(starts + n <= line_ends)
+            windows = ids[starts[fits, None] + np.arange(n)]
+            # Only n-grams whose hash is that of a term can be one
+            candidates = np.flatnonzero(
+                _is_in_sorted(_ngram_hashes(windows, self._powers[n]), self._hashes[n])
+            )
+            for start, line, window in zip(
+                starts[fits[candidates]].tolist(),
+                line_of_start[fits[candidates]].tolist(),
+                windows[candidates].tolist(),
+            ):
+                entry = ngrams.get(tuple(window))
+                if entry is None:
+                    continue
+                group_list, overlapping = entry
+                for group in group_list:
+                    hit_lines.append(line)
+                    hit_groups.append(group)
+                for term_id, group in overlapping:
+                    if last_end.get(term_id, 0) <= start:
+                        last_end[term_id] = start + n
+                        hit_lines.append(line)
+                        hit_groups.append(group)
+        if hit_lines:
+            np.add.at(counts, (hit_lines, hit_groups), 1)
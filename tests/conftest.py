@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture
+def synthetic_liwc(tmp_path):
+    path_to_dic = tmp_path / "synthetic.dic"
+    path_to_dic.write_text(
+        "%\n1\tpronoun\n2\ti\n3\tpast\n%\n"
+        "i\t1\t2\nme\t1\t2\nwe*\t1\nwas\t3\nbecame\t3\n"
+    )
+    return str(path_to_dic)
+
+
+@pytest.fixture
+def synthetic_emolex(tmp_path):
+    path_to_emolex = tmp_path / "emolex.txt"
+    path_to_emolex.write_text(
+        "bad\tnegative\t1\nbad\tpositive\t0\n"
+        "good\tnegative\t0\ngood\tpositive\t1\n"
+    )
+    return str(path_to_emolex)
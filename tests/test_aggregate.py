@@ -0,0 +1,85 @@
+import sys
+
+sys.path.append("../psynlp")
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import aggregate
+from features import featurizers
+from features import parse
+from features import synthetic
+
+
+@pytest.fixture
+def featurized_transcripts(tmp_path):
+    featurizer_objs = [
+        featurizers.HedgingFeaturizer(),
+        featurizers.AbsolutistFeaturizer(),
+        featurizers.SecondsPerTalkTurnFeaturizer(),
+    ]
+    paths = synthetic.write_corpus(str(tmp_path), 3, turns_per_session=60)
+    return [parse.parse_transcript(path, featurizer_objs) for path in paths]
+
+
+def test_time_quintiles():
+    start_times = np.array([0.0, 1.0, 2.0, 8.0, 9.0])
+    end_times = np.array([1.0, 2.0, 8.0, 9.0, 10.0])
+    assert aggregate.time_quintiles(start_times, end_times).tolist() == [
+        0,
+        0,
+        1,
+        4,
+        4,
+    ]
+    # Without time stamps, lines are split by position
+    no_times = np.full(5, np.nan)
+    assert aggregate.time_quintiles(no_times, no_times).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_summary_matches_pandas(featurized_transcripts, tmp_path):
+    summary = aggregate.SummaryAccumulator(featurized_transcripts[0].schema)
+    for transcript in featurized_transcripts:
+        summary.add(transcript)
+
+    # The same summary computed from the long-format output
+    out = io.StringIO()
+    for transcript in featurized_transcripts:
+        transcript.to_tsv(out=out, use_header=out.tell() == 0)
+    out.seek(0)
+    long_df = pd.read_csv(out, sep="\t", na_values=["None"], dtype={"session_id": str})
+    wide_df = long_df.pivot_table(
+        index=["session_id", "line_id", "speaker"],
+        columns="feature_descr",
+        values="feature_value",
+    ).reset_index()
+    expected = wide_df.groupby(["session_id", "speaker"]).agg(
+        num_lines=("line_id", "count"),
+        hedging_sum=("hedging", "sum"),
+        seconds_per_talk_turn_mean=("seconds_per_talk_turn", "mean"),
+    )
+
+    actual = summary.to_dataframe("speaker").set_index(["session_id", "speaker"])
+    assert len(actual) == len(expected)
+    for column in expected.columns:
+        np.testing.assert_allclose(actual.loc[expected.index, column], expected[column])
+    np.testing.assert_allclose(
+        actual["hedging_per_word"], actual["hedging_sum"] / actual["num_words"]
+    )
+    assert "seconds_per_talk_turn_per_word" not in actual.columns
+
+    sessions = summary.to_dataframe("session")
+    quintiles = summary.to_dataframe("quintile")
+    assert len(sessions) == 3
+    assert sessions["num_lines"].sum() == quintiles["num_lines"].sum()
+    np.testing.assert_allclose(
+        sessions["absolutist_sum"].sum(), quintiles["absolutist_sum"].sum()
+    )
+    assert set(quintiles["quintile"]) == {0, 1, 2, 3, 4}
+
+    paths = summary.write(str(tmp_path / "summary"))
+    written = pd.read_csv(paths[0], sep="\t", dtype={"session_id": str})
+    np.testing.assert_allclose(written["hedging_sum"], sessions["hedging_sum"])
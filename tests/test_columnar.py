@@ -0,0 +1,72 @@
+import sys
+
+sys.path.append("../psynlp")
+
+import numpy as np
+import pytest
+
+from features import columnar
+from features import featurizers
+from features.featurizers import Line
+from features.featurizers import Transcript
+
+
+def _featurized_transcripts():
+    featurizer_objs = [
+        featurizers.AbsolutistFeaturizer(),
+        featurizers.WordsPerSecondFeaturizer(),
+    ]
+    transcripts = []
+    for session_id, texts in [("000001", ["all of it", "never", "ok"]), ("000002", [])]:
+        transcript = Transcript(
+            session_id=session_id,
+            lines=[
+                Line(speaker="PT"[i % 2], text=text, start_time=float(i))
+                for i, text in enumerate(texts)
+            ],
+        )
+        transcript.postprocess()
+        transcript.calculate_features(featurizer_objs)
+        transcripts.append(transcript)
+    return transcripts, featurizers.feature_schema(featurizer_objs)
+
+
+def test_columnar_round_trip(tmp_path):
+    transcripts, schema = _featurized_transcripts()
+    assert schema == [("absolutist", int), ("words_per_second", float)]
+    out_dir = str(tmp_path / "columnar")
+    with columnar.ColumnarWriter(out_dir, schema) as writer:
+        for transcript in transcripts:
+            writer.write_transcript(transcript)
+
+    assert columnar.read_meta(out_dir)["num_rows"] == 3
+    absolutist = columnar.read_feature(out_dir, "absolutist")
+    assert absolutist.dtype == np.int64
+    assert absolutist.tolist() == [1, 1, 0]
+    words_per_second = columnar.read_feature(out_dir, "words_per_second")
+    assert words_per_second[:2] == pytest.approx([3 / 60, 1 / 60])
+    assert np.isnan(words_per_second[2])
+    assert np.isnan(columnar.read_times(out_dir, "end_time")[2])
+    assert columnar.read_strings(out_dir, "line_id", table="text")[1] == "000001_000001"
+    assert columnar.read_strings(out_dir, "text", table="text") == [
+        "all of it",
+        "never",
+        "ok",
+    ]
+    assert columnar.read_strings(out_dir, "text", table="text", start=1, stop=3) == [
+        "never",
+        "ok",
+    ]
+    assert columnar.read_strings(out_dir, "text", table="text", start=2, stop=2) == []
+
+    df = columnar.to_dataframe(out_dir, features=["absolutist"], with_text=True)
+    assert list(df.columns) == [
+        "session_id",
+        "line_id",
+        "speaker",
+        "start_time",
+        "end_time",
+        "absolutist",
+        "text",
+    ]
+    assert df["speaker"].tolist() == ["P", "T", "P"]
@@ -0,0 +1,99 @@
+import os
+import sys
+
+sys.path.append("../psynlp")
+
+import numpy as np
+
+from features import lexicon
+from features import liwc
+from features import planner
+from features.featurizers import EmoLexFeaturizer
+
+
+def test_compiled_liwc_matches_text_lexicon(tmp_path):
+    path_to_dic = tmp_path / "wildcards.dic"
+    path_to_dic.write_text(
+        "%\n1\tfunct\n2\tpast\n3\taffect\n%\n"
+        "a*\t1\nab\t2\nabc*\t3\nhapp*\t3\nhappen\t2\nwent\t1\t2\n"
+    )
+    text_liwc = liwc.LIWC(str(path_to_dic), use_compiled=False)
+    lexicon.load_compiled(str(path_to_dic), compile_missing=True)
+    compiled_liwc = liwc.LIWC(str(path_to_dic))
+    assert compiled_liwc._compiled is not None
+    assert compiled_liwc.categories == text_liwc.categories
+    for token in ["a", "ab", "abcd", "b", "happy", "happen", "went", "wen", ""]:
+        assert sorted(compiled_liwc.search(token)) == sorted(text_liwc.search(token))
+
+
+def test_loaded_lexicon_searches_without_building_an_index(tmp_path):
+    path_to_dic = tmp_path / "wildcards.dic"
+    path_to_dic.write_text("%\n1\tfunct\n2\tpast\n%\nab*\t1\nabc\t2\nb\t2\nzz\t1\n")
+    compiled = lexicon.load_compiled(str(path_to_dic), compile_missing=True)
+    assert isinstance(compiled.words, np.memmap)
+    assert compiled.search("abc") == ["funct"]
+    assert compiled.search("b") == ["past"]
+    assert compiled.search("zz") == ["funct"]
+    assert compiled.search("a") == compiled.search("zzz") == []
+    # Only the decoded category lists are kept, not a dict over the words
+    assert [
+        name for name, value in vars(compiled).items() if isinstance(value, dict)
+    ] == ["_decoded"]
+
+
+def test_artifact_keyed_by_checksum(synthetic_liwc):
+    lexicon.load_compiled(synthetic_liwc, compile_missing=True)
+    assert lexicon.load_compiled(synthetic_liwc) is not None
+    with open(synthetic_liwc, "a") as f:
+        f.write("they\t1\n")
+    assert lexicon.load_compiled(synthetic_liwc) is None
+
+
+def test_compiled_emolex(synthetic_emolex):
+    compiled = lexicon.load_compiled(synthetic_emolex, compile_missing=True)
+    assert compiled.categories == ["negative", "positive"]
+    assert compiled.words_in_category("positive") == ["good"]
+    assert os.path.isdir(lexicon.artifact_path(synthetic_emolex))
+    featurizer = EmoLexFeaturizer("negative", "negative", synthetic_emolex)
+    assert featurizer.target_set == {"bad"}
+
+
+def test_liwc_search_cache(synthetic_liwc):
+    liwc_obj = liwc.LIWC(synthetic_liwc, cache_size=2)
+    liwc_obj.parse(["i", "i", "we", "weird", "i"])
+    info = liwc_obj.cache_info()
+    assert (info.hits, info.misses, info.size) == (1, 4, 2)
+    assert liwc_obj.search("weird") == ["pronoun"]
+
+
+def test_liwc_prewarm(synthetic_liwc):
+    liwc_obj = liwc.LIWC(synthetic_liwc, cache_size=None)
+    assert liwc_obj.prewarm() == 4
+    assert liwc_obj.search("me") == ["pronoun", "i"]
+    assert liwc_obj.cache_info().hits == 1
+
+
+def test_build_featurizers_compiles_missing_artifacts(synthetic_liwc, synthetic_emolex):
+    planner.build_featurizers(
+        ["i_pronouns"], path_to_liwc=synthetic_liwc, compile_lexicons=False
+    )
+    assert lexicon.load_compiled(synthetic_liwc) is None
+    featurizer_objs = planner.build_featurizers(
+        ["i_pronouns", "emolex_positive"],
+        path_to_liwc=synthetic_liwc,
+        path_to_emolex=synthetic_emolex,
+    )
+    assert lexicon.load_compiled(synthetic_liwc) is not None
+    assert lexicon.load_compiled(synthetic_emolex) is not None
+    assert featurizer_objs[0].liwc_obj._compiled is not None
+
+
+def test_file_checksum_only_rehashes_changed_files(tmp_path, monkeypatch):
+    path = tmp_path / "lexicon.txt"
+    path.write_text("good\tpositive\t1\n")
+    checksum = lexicon.file_checksum(str(path))
+    monkeypatch.setattr(lexicon.hashlib, "sha256", None)
+    assert lexicon.file_checksum(str(path)) == checksum
+    monkeypatch.undo()
+    path.write_text("good\tpositive\t1\nbad\tnegative\t1\n")
+    assert lexicon.file_checksum(str(path)) != checksum
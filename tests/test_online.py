@@ -0,0 +1,74 @@
+import sys
+
+sys.path.append("../psynlp")
+
+import numpy as np
+
+from features import aggregate
+from features import featurizers
+from features import online
+from features import parse
+from features import planner
+from features import synthetic
+
+
+def test_online_turns_match_batch_transcript(tmp_path):
+    path_to_liwc, path_to_emolex = synthetic.write_lexicons(str(tmp_path / "lex"))
+    (path,) = synthetic.write_corpus(str(tmp_path / "corpus"), 1, turns_per_session=120)
+    featurizer_objs = planner.build_featurizers(
+        list(planner.FEATURES),
+        path_to_liwc=path_to_liwc,
+        path_to_emolex=path_to_emolex,
+    )
+    expected = parse.parse_transcript(path, featurizer_objs)
+
+    transcript = online.OnlineTranscript(
+        expected.session_id, featurizer_objs, session_num=expected.session_num
+    )
+    lines = []
+    with open(path, mode="r", encoding="utf-8") as f:
+        for raw_line in f:
+            finished = transcript.add_raw_line(raw_line)
+            # A turn is only finished once the next speaker starts
+            assert len(finished) <= 1
+            lines += finished
+    assert transcript.num_lines == len(expected.lines) - 1
+    lines += transcript.close()
+
+    assert len(lines) == len(expected.lines)
+    for line, expected_line in zip(lines, expected.lines):
+        assert str(line) == str(expected_line)
+        assert dict(line.features) == dict(expected_line.features)
+
+    accumulator = aggregate.SummaryAccumulator(expected.schema)
+    accumulator.add(expected)
+    for level in online.LEVELS:
+        summary = transcript.summary(level)
+        expected_summary = accumulator.table(level)
+        assert list(summary) == list(expected_summary)
+        for column, values in summary.items():
+            if column in ("session_id", "speaker"):
+                assert list(values) == list(expected_summary[column])
+            else:
+                np.testing.assert_allclose(values, expected_summary[column])
+
+
+def test_online_merge_matches_batch_merge():
+    texts = ["  so ", "", " ", "i think", "  ", "always  ", "yes", "", "ok "]
+    speakers = ["T", "T", "T", "T", "T", "T", "P", "P", "T"]
+    batch = featurizers.Transcript(
+        session_id="060001",
+        lines=[
+            featurizers.Line(speaker=speaker, start_time=float(i), text=text)
+            for i, (speaker, text) in enumerate(zip(speakers, texts))
+        ],
+    )
+    batch.postprocess()
+    transcript = online.OnlineTranscript("060001", [featurizers.HedgingFeaturizer()])
+    lines = []
+    for i, (speaker, text) in enumerate(zip(speakers, texts)):
+        lines += transcript.add_line(speaker, float(i), text)
+    lines += transcript.close()
+    assert [str(line) for line in lines] == [str(line) for line in batch.lines]
+    assert [line.features["hedging"] for line in lines] == [1, 0, 0]
+    assert transcript.summary()["num_lines"].tolist() == [3]
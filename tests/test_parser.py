@@ -1,4 +1,8 @@
 import copy
+import csv
+import gzip
+import io
+import numpy as np
 import pytest
 import re
 import sys
@@ -43,6 +47,32 @@ def test_merge_repeat_speaker_lines():
     assert tmp_transcript.lines[2].text == "line three"
 
 
+def test_merge_three_repeat_speaker_lines():
+    tmp_transcript = Transcript(
+        lines=[
+            Line(speaker="P", text="one", start_time=0.0),
+            Line(speaker="P", text="two", start_time=1.0),
+            Line(speaker="P", text="three", start_time=2.0),
+            Line(speaker="T", text="four", start_time=3.0),
+        ]
+    )
+    tmp_transcript.merge_repeat_speaker_lines()
+    assert tmp_transcript.lines[0].text == "one two three"
+    assert tmp_transcript.lines[0].start_time == 0.0
+    assert tmp_transcript.lines[0].num_words == 3
+    assert len(tmp_transcript.lines) == 2
+
+
+def test_line_token_cache():
+    line = Line(text="Line Zero")
+    assert line.tokens == ["Line", "Zero"]
+    assert line.lower_tokens == ["line", "zero"]
+    assert line.lower_tokens is line.lower_tokens
+    line.text = "line one two"
+    assert line.num_words == 3
+    assert line.word_pieces == ["line", " ", "one", " ", "two"]
+
+
 def test_impute_end_times():
     tmp_transcript = copy.deepcopy(transcript)
     tmp_transcript.impute_end_times()
@@ -162,3 +192,241 @@ def test_min_sec_fmt_more_than_60_minutes():
 
 def test_min_sec_fmt_zero():
     assert min_sec_fmt(0.00) == "00:00"
+
+
+def test_phrase_matcher_single_and_multi_word_terms():
+    terms = ["it sounds like", "sounds like", "all", "i see"]
+    matcher = features.utils.PhraseMatcher(terms)
+    text = "It sounds like y'all see it all i seem to i see"
+    assert matcher.count(text) == 5
+
+
+def test_phrase_matcher_matches_count_terms_in_line():
+    terms = ["a a", "it seems", "seems", "ok!", "don't"]
+    matcher = features.utils.PhraseMatcher(terms)
+    for text in ["a a a a", "it seems it seems", "ok! ok!x don't dont", ""]:
+        assert matcher.count(text) == features.utils.count_terms_in_line(text, terms)
+
+
+def test_emolex_featurizer(synthetic_emolex):
+    featurizer = features.featurizers.EmoLexFeaturizer(
+        "negative", "negative", path_to_lexicon=synthetic_emolex
+    )
+    line = Line(text="bad bad good badly")
+    line.calculate_features([featurizer])
+    assert line.features["negative"] == 2
+
+
+def test_multi_liwc_featurizer(synthetic_liwc):
+    line = Line(text="I was me we were became you")
+    featurizer = features.featurizers.MultiLIWCFeaturizer(
+        {"i_pronouns": "i", "past_oriented": "past"}, path_to_lexicon=synthetic_liwc
+    )
+    line.calculate_features([featurizer])
+    assert line.features == {"i_pronouns": 2, "past_oriented": 2}
+    with pytest.raises(TypeError, match="use featurize_multi"):
+        featurizer.featurize(line)
+    single = features.featurizers.MultiLIWCFeaturizer(
+        {"i_pronouns": "i"}, path_to_lexicon=synthetic_liwc
+    )
+    assert single.featurize(line) == (2, "i_pronouns")
+
+
+def test_multi_liwc_featurizer_all_categories(synthetic_liwc):
+    line = Line(text="i was we were")
+    featurizer = features.featurizers.MultiLIWCFeaturizer(
+        path_to_lexicon=synthetic_liwc
+    )
+    assert featurizer.feature_descrs == ["liwc_pronoun", "liwc_i", "liwc_past"]
+    line.calculate_features([featurizer])
+    assert line.features == {"liwc_pronoun": 3, "liwc_i": 1, "liwc_past": 1}
+
+
+def _featurized_transcript():
+    tmp_transcript = copy.deepcopy(transcript)
+    tmp_transcript.postprocess()
+    tmp_transcript.calculate_features(
+        [
+            features.featurizers.AbsolutistFeaturizer(),
+            features.featurizers.SecondsPerTalkTurnFeaturizer(),
+        ]
+    )
+    return tmp_transcript
+
+
+def test_to_tsv_string():
+    rows = _featurized_transcript().to_tsv(use_header=True).splitlines()
+    assert rows[0].split("\t") == features.featurizers.TSV_HEADER
+    assert len(rows) == 1 + 4 * 2
+    assert rows[1].split("\t") == [
+        "012345",
+        "012345_000000",
+        "P",
+        "0.0",
+        "1.0",
+        "absolutist",
+        "0",
+        "line zero",
+    ]
+    # The last line has no end time, but every row still has all the columns
+    assert rows[-1].split("\t")[3:7] == ["5.0", "", "seconds_per_talk_turn", "None"]
+
+
+def test_to_tsv_streams_to_handle_and_csv_writer():
+    tmp_transcript = _featurized_transcript()
+    handle = io.StringIO()
+    tmp_transcript.to_tsv(out=handle, use_header=True)
+    csv_buffer = io.StringIO()
+    writer = csv.writer(csv_buffer, delimiter="\t", lineterminator="\n")
+    tmp_transcript.to_tsv(out=writer, use_header=True)
+    assert handle.getvalue() == csv_buffer.getvalue()
+    assert handle.getvalue() == tmp_transcript.to_tsv(use_header=True)
+
+
+def test_to_tsv_gzip_fpath(tmp_path):
+    tmp_transcript = _featurized_transcript()
+    fpath = str(tmp_path / "transcript.tsv.gz")
+    assert tmp_transcript.to_tsv(fpath=fpath) is None
+    with gzip.open(fpath, "rt", encoding="utf-8") as f:
+        assert f.read() == tmp_transcript.to_tsv(use_header=True)
+
+
+def test_transcript_arrays():
+    tmp_transcript = _featurized_transcript()
+    assert tmp_transcript.speakers == ["P", "T"]
+    assert tmp_transcript.speaker_codes.tolist() == [0, 1, 0, 1]
+    assert tmp_transcript.start_times.tolist() == [0.0, 1.0, 3.0, 5.0]
+    assert np.isnan(tmp_transcript.end_times[-1])
+    assert tmp_transcript.feature_matrix.shape == (4, 2)
+    assert tmp_transcript.schema.names == ["absolutist", "seconds_per_talk_turn"]
+    # Lines keep working as before, through views onto the feature matrix
+    last_line = tmp_transcript.lines[-1]
+    assert last_line.features == {"absolutist": 0, "seconds_per_talk_turn": None}
+    assert tmp_transcript.lines[0].features["seconds_per_talk_turn"] == 60.0
+    last_line.features["absolutist"] = 2
+    assert tmp_transcript.feature_matrix[-1, 0] == 2
+    with pytest.raises(AttributeError):
+        last_line.some_attribute = 1
+    copied = copy.deepcopy(tmp_transcript)
+    assert copied.lines[-1].features["absolutist"] == 2
+    assert copied.to_tsv() == tmp_transcript.to_tsv()
+
+
+def test_timing_measures():
+    measures = features.featurizers.timing_measures(
+        start_times=np.array([0.0, 1.0, 1.5, 2.0]),
+        end_times=np.array([1.0, 1.0, 2.5, np.nan]),
+        word_counts=np.array([30, 4, 0, 5]),
+    )
+    assert measures["seconds_per_talk_turn"][:3].tolist() == [60.0, 0.0, 60.0]
+    assert np.isnan(measures["seconds_per_talk_turn"][3])
+    # Lines without words or duration have no speaking rate
+    assert measures["words_per_second"][0] == 0.5
+    assert np.isnan(measures["words_per_second"][1:]).all()
+    assert np.isnan(measures["inter_turn_gap"][0])
+    assert measures["inter_turn_gap"][1:].tolist() == [0.0, 30.0, -30.0]
+    assert measures["overlap"][1:].tolist() == [0.0, 0.0, 30.0]
+
+
+def test_timing_featurizer_matches_per_line_values():
+    tmp_transcript = copy.deepcopy(transcript)
+    tmp_transcript.postprocess()
+    timing_featurizer = features.featurizers.TimingFeaturizer()
+    tmp_transcript.calculate_features([timing_featurizer])
+    for line in tmp_transcript.lines:
+        per_line = dict(
+            (feat_descr, feat_value)
+            for feat_value, feat_descr in timing_featurizer.featurize_multi(line)
+        )
+        assert (
+            line.features["seconds_per_talk_turn"] == per_line["seconds_per_talk_turn"]
+        )
+        assert line.features["words_per_second"] == per_line["words_per_second"]
+    assert tmp_transcript.lines[1].features["inter_turn_gap"] == 0.0
+    assert tmp_transcript.lines[-1].features["words_per_second"] is None
+    assert timing_featurizer.context_lines == 1
+    # Per-line measures don't need the previous line
+    assert features.featurizers.SecondsPerTalkTurnFeaturizer().context_lines == 0
+    assert features.featurizers.WordsPerSecondFeaturizer().context_lines == 0
+
+
+def test_featurize_batch_matches_per_line(synthetic_liwc, synthetic_emolex):
+    lines = [
+        Line(text="i was totally wrong it was bad"),
+        Line(text="we became good i guess"),
+        Line(text=""),
+    ]
+    featurizer_objs = [
+        features.featurizers.MultiLIWCFeaturizer(path_to_lexicon=synthetic_liwc),
+        features.featurizers.EmoLexFeaturizer(
+            "negative", "negative", path_to_lexicon=synthetic_emolex
+        ),
+        features.featurizers.HedgingFeaturizer(),
+        features.featurizers.AbsolutistFeaturizer(),
+    ]
+    for featurizer_obj in featurizer_objs:
+        batch = featurizer_obj.featurize_batch(lines)
+        assert batch.shape == (len(lines), len(featurizer_obj.feature_descrs))
+        for i, line in enumerate(lines):
+            per_line = dict(
+                (feat_descr, feat_value)
+                for feat_value, feat_descr in featurizer_obj.featurize_multi(line)
+            )
+            assert batch[i].tolist() == [
+                per_line[feat_descr] for feat_descr in featurizer_obj.feature_descrs
+            ]
+
+
+def _legacy_read_transcript(text):
+    # The line-by-line parsing that `utils.read_transcript` replaces
+    speakers, start_times, texts = [], [], []
+    for line in io.StringIO(text):
+        pattern_match = re.search(
+            r"([A-Za-z]+)\s\[TIME: ([0-9]+):([0-9]+)\]:(.*)", line
+        )
+        if pattern_match is None:
+            continue
+        speakers.append(pattern_match.group(1))
+        start_times.append(
+            (int(pattern_match.group(2)) * 60.0 + int(pattern_match.group(3))) / 60.0
+        )
+        texts.append(preprocess_text(pattern_match.group(4)))
+    return speakers, start_times, texts
+
+
+def test_read_transcript_matches_line_by_line(tmp_path):
+    text = (
+        "Header without a turn\n"
+        "P [TIME: 00:05]: Hi! [LAUGHS] How's it going?\n"
+        "\n"
+        "T [TIME: 01:10]: Fine,   thanks. [inaudible\n"
+        "T\n[TIME: 01:20]: not a turn\n"
+        "P\t[TIME: 2:03]: Tab [x] separated. T [TIME: 2:04]: same line\n"
+        "junk P [TIME: 10:00]: trailing [unclosed\r\n"
+        "T [TIME: 61:59]: last line without newline"
+    )
+    path = tmp_path / "S1_060504_P1_03.02.01_A.TXT"
+    path.write_bytes(text.encode("utf-8"))
+    normalized = text.replace("\r\n", "\n")
+    expected = _legacy_read_transcript(normalized)
+    assert len(expected[0]) == 5
+    assert features.utils.parse_transcript_text(normalized) == expected
+    assert features.utils.read_transcript(str(path)) == expected
+    # A pattern that can match across lines falls back to matching each line
+    pattern = re.compile(
+        r"(?P<speaker>[A-Za-z]+)\s\[TIME: (?P<minutes>[0-9]+):(?P<seconds>[0-9]+)\]:"
+        r"(?P<text>.*)"
+    )
+    assert features.utils.parse_transcript_text(normalized, pattern) == expected
+
+    # Anchored patterns anchor each line, as when matching line by line
+    for anchored in (
+        r"^(?P<speaker>[A-Za-z]+)[^\S\n]"
+        r"\[TIME: (?P<minutes>[0-9]+):(?P<seconds>[0-9]+)\]:(?P<text>.*)$",
+        r"\A(?P<speaker>[A-Za-z]+)[^\S\n]"
+        r"\[TIME: (?P<minutes>[0-9]+):(?P<seconds>[0-9]+)\]:(?P<text>.*)",
+    ):
+        pattern = re.compile(anchored)
+        line_by_line = features.utils._parse_transcript_lines(normalized, pattern)
+        assert len(line_by_line[0]) == 4
+        assert features.utils.parse_transcript_text(normalized, pattern) == line_by_line
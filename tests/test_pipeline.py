@@ -0,0 +1,210 @@
+import sys
+
+sys.path.append("../psynlp")
+
+import pytest
+
+from features import cache
+from features import featurizers
+from features import parse
+from features import profiling
+
+
+def build_test_featurizers():
+    return [
+        featurizers.HedgingFeaturizer(),
+        featurizers.AbsolutistFeaturizer(),
+        featurizers.SecondsPerTalkTurnFeaturizer(),
+        featurizers.WordsPerSecondFeaturizer(),
+    ]
+
+
+@pytest.fixture
+def transcript_paths(tmp_path):
+    paths = []
+    for session_num, n_lines in [(1, 3), (2, 40), (3, 7)]:
+        path = tmp_path / f"S{session_num}_0605{session_num:02d}_P1_03.02.01_A.TXT"
+        path.write_text(
+            "".join(
+                f"{'PT'[i % 2]} [TIME: {i:02d}:30]: I think it's always [LAUGH] fine.\n"
+                for i in range(n_lines)
+            )
+        )
+        paths.append(str(path))
+    return paths
+
+
+def test_parse_transcripts_parallel_matches_serial(transcript_paths):
+    serial = list(parse.parse_transcripts(transcript_paths, build_test_featurizers))
+    parallel = list(
+        parse.parse_transcripts(transcript_paths, build_test_featurizers, workers=2)
+    )
+    assert [i for i, _, _ in parallel] == [0, 1, 2]
+    for (_, expected, _), (_, actual, error) in zip(serial, parallel):
+        assert error is None
+        assert len(actual.lines) > 0
+        assert actual.to_tsv() == expected.to_tsv()
+
+
+def test_parse_transcripts_reports_failures(transcript_paths, tmp_path):
+    missing = str(tmp_path / "S9_060509_P1_03.02.01_A.TXT")
+    results = list(
+        parse.parse_transcripts(
+            [missing] + transcript_paths, build_test_featurizers, workers=2
+        )
+    )
+    assert results[0][1] is None
+    assert "FileNotFoundError" in results[0][2]
+    assert all(error is None for _, _, error in results[1:])
+
+
+def test_submission_order_is_largest_first_within_windows(tmp_path):
+    paths = []
+    for i, size in enumerate([1, 5, 3, 2, 9, 4, 7]):
+        path = tmp_path / f"{i}.TXT"
+        path.write_text("x" * size)
+        paths.append(str(path))
+    assert parse._submission_order(paths, 3) == [1, 2, 0, 4, 5, 3, 6]
+
+
+@pytest.mark.parametrize("prefetch_depth", [0, 2])
+def test_parse_transcripts_parallel_over_several_windows(tmp_path, prefetch_depth):
+    paths = []
+    for session_num in range(1, 12):
+        path = tmp_path / f"S{session_num}_0605{session_num:02d}_P1_03.02.01_A.TXT"
+        path.write_text(
+            "".join(
+                f"{'PT'[i % 2]} [TIME: {i:02d}:30]: I think it's always fine.\n"
+                for i in range((session_num * 7) % 11 + 1)
+            )
+        )
+        paths.append(str(path))
+    expected = list(parse.parse_transcripts(paths, build_test_featurizers))
+    actual = list(
+        parse.parse_transcripts(
+            paths, build_test_featurizers, workers=2, prefetch_depth=prefetch_depth
+        )
+    )
+    assert [i for i, _, _ in actual] == list(range(len(paths)))
+    assert [t.to_tsv() for _, t, _ in actual] == [t.to_tsv() for _, t, _ in expected]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_transcripts_with_prefetch(transcript_paths, tmp_path, workers):
+    missing = str(tmp_path / "S9_060509_P1_03.02.01_A.TXT")
+    paths = transcript_paths + [missing]
+    expected = list(parse.parse_transcripts(paths, build_test_featurizers))
+    profiler = profiling.Profiler()
+    actual = list(
+        parse.parse_transcripts(
+            paths,
+            build_test_featurizers,
+            workers=workers,
+            profiler=profiler,
+            prefetch_depth=2,
+            prefetch_max_bytes=1000,
+        )
+    )
+    assert [i for i, _, _ in actual] == [0, 1, 2, 3]
+    for (_, expected_transcript, _), (_, transcript, error) in zip(
+        expected[:-1], actual[:-1]
+    ):
+        assert error is None
+        assert transcript.to_tsv() == expected_transcript.to_tsv()
+    assert actual[-1][1] is None
+    assert "FileNotFoundError" in actual[-1][2]
+    assert profiler.stages["read"].counters["files"] == len(transcript_paths)
+
+
+def test_parse_transcripts_with_cache(transcript_paths, tmp_path):
+    transcript_cache = cache.TranscriptCache(str(tmp_path / "cache"))
+    first = list(
+        parse.parse_transcripts(
+            transcript_paths, build_test_featurizers, transcript_cache=transcript_cache
+        )
+    )
+    assert transcript_cache.stats().entries == 3
+    assert (transcript_cache.hits, transcript_cache.misses) == (0, 3)
+
+    with open(transcript_paths[1], "a") as f:
+        f.write("P [TIME: 59:00]: never\n")
+    second = list(
+        parse.parse_transcripts(
+            transcript_paths,
+            build_test_featurizers,
+            workers=2,
+            transcript_cache=transcript_cache,
+        )
+    )
+    assert (transcript_cache.hits, transcript_cache.misses) == (2, 4)
+    assert second[0][1].to_tsv() == first[0][1].to_tsv()
+    assert len(second[1][1].lines) == len(first[1][1].lines) + 1
+
+    keys = parse.cache_keys(transcript_paths, build_test_featurizers())
+    assert transcript_cache.prune(keys)[0] == 1
+    assert transcript_cache.stats().entries == 3
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        b"\x80\x04garbage",
+        b"",
+        # Stale entries, pickled before a class was removed or moved
+        b"cfeatures.featurizers\nRemovedTranscript\n.",
+        b"cfeatures.no_such_module\nTranscript\n.",
+    ],
+)
+def test_cache_treats_unreadable_entries_as_misses(tmp_path, contents):
+    transcript_cache = cache.TranscriptCache(str(tmp_path / "cache"))
+    key = "ab" * 32
+    transcript_cache.put(key, featurizers.Transcript(lines=[], session_id="060001"))
+    assert transcript_cache.get(key).session_id == "060001"
+    with open(transcript_cache._path(key), mode="wb") as f:
+        f.write(contents)
+    assert transcript_cache.get(key) is None
+    assert key not in transcript_cache
+    assert (transcript_cache.hits, transcript_cache.misses) == (1, 1)
+
+
+def test_cache_key_depends_on_featurizers(transcript_paths):
+    keys = parse.cache_keys(transcript_paths, build_test_featurizers())
+    other_keys = parse.cache_keys(
+        transcript_paths, [featurizers.HedgingFeaturizer("other_name")]
+    )
+    assert len(set(keys)) == 3
+    assert not set(keys) & set(other_keys)
+
+
+def test_profiler_records_stages_in_workers(transcript_paths):
+    serial_profiler = profiling.Profiler()
+    list(
+        parse.parse_transcripts(
+            transcript_paths, build_test_featurizers, profiler=serial_profiler
+        )
+    )
+    parallel_profiler = profiling.Profiler()
+    list(
+        parse.parse_transcripts(
+            transcript_paths,
+            build_test_featurizers,
+            workers=2,
+            profiler=parallel_profiler,
+        )
+    )
+    for profiler in (serial_profiler, parallel_profiler):
+        assert profiler.stages["read"].calls == 3
+        hedging = profiler.stages["featurize/hedging"]
+        assert hedging.calls == 3
+        assert hedging.counters["lines"] == 3 + 40 + 7
+        assert hedging.counters["lexicon_hits"] == hedging.counters["lines"]
+        assert (
+            "lexicon_hits" not in profiler.stages["featurize/words_per_second"].counters
+        )
+        assert "featurize/hedging" in profiler.summary_table()
+    assert parallel_profiler.to_dict().keys() == serial_profiler.to_dict().keys()
+
+
+def test_disabled_profiler_records_nothing(transcript_paths):
+    list(parse.parse_transcripts(transcript_paths, build_test_featurizers))
+    assert profiling.NULL_PROFILER.stages == {}
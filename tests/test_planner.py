@@ -0,0 +1,217 @@
+import os
+import subprocess
+import sys
+
+sys.path.append("../psynlp")
+
+import numpy as np
+import pytest
+
+from features import featurizers
+from features import parse
+from features import planner
+from features import synthetic
+
+
+def test_default_plan_matches_separate_featurizers(tmp_path):
+    path_to_liwc, path_to_emolex = synthetic.write_lexicons(str(tmp_path / "lex"))
+    (path,) = synthetic.write_corpus(str(tmp_path / "corpus"), 1, turns_per_session=80)
+
+    featurizer_objs = planner.build_featurizers(
+        path_to_liwc=path_to_liwc, path_to_emolex=path_to_emolex
+    )
+    assert [type(obj).__name__ for obj in featurizer_objs] == [
+        "MultiLIWCFeaturizer",
+        "MultiEmoLexFeaturizer",
+        "MultiTermFeaturizer",
+        "TimingFeaturizer",
+    ]
+    planned = parse.parse_transcript(path, featurizer_objs)
+    assert planned.schema.names == planner.DEFAULT_FEATURES
+
+    separate = parse.parse_transcript(
+        path,
+        [
+            featurizers.MultiLIWCFeaturizer(
+                {
+                    name: category
+                    for name, (resource, category) in planner.FEATURES.items()
+                    if resource == planner.LIWC_RESOURCE
+                },
+                path_to_lexicon=path_to_liwc,
+            ),
+            featurizers.EmoLexFeaturizer("negative", "negative", path_to_emolex),
+            featurizers.EmoLexFeaturizer("positive", "positive", path_to_emolex),
+            featurizers.CheckingForUnderstandingFeaturizer(),
+            featurizers.DemonstratingUnderstandingFeaturizer(),
+            featurizers.HedgingFeaturizer(),
+            featurizers.AbsolutistFeaturizer(),
+            featurizers.SecondsPerTalkTurnFeaturizer(),
+            featurizers.WordsPerSecondFeaturizer(),
+        ],
+    )
+    np.testing.assert_array_equal(planned.feature_matrix, separate.feature_matrix)
+    assert planned.to_tsv() == separate.to_tsv()
+
+
+def test_plan_only_loads_requested_resources(tmp_path):
+    # Neither lexicon exists, so building either engine would fail
+    featurizer_objs = planner.build_featurizers(
+        ["hedging", "overlap", "absolutist"],
+        path_to_liwc=str(tmp_path / "missing.dic"),
+        path_to_emolex=str(tmp_path / "missing.txt"),
+    )
+    assert [obj.feature_descrs for obj in featurizer_objs] == [
+        ["hedging", "absolutist"],
+        ["overlap"],
+    ]
+
+
+def test_plan_with_one_feature_per_engine(tmp_path):
+    (path,) = synthetic.write_corpus(str(tmp_path / "corpus"), 1, turns_per_session=20)
+    featurizer_objs = planner.build_featurizers(["hedging", "words_per_second"])
+    assert [obj.profile_name() for obj in featurizer_objs] == [
+        "MultiTermFeaturizer[hedging]",
+        "TimingFeaturizer[words_per_second]",
+    ]
+    transcript = parse.parse_transcript(path, featurizer_objs)
+    assert transcript.schema.names == ["hedging", "words_per_second"]
+
+
+def test_plan_prefixed_and_unknown_features():
+    assert planner.plan(["liwc_posemo", "emolex_joy", "i_pronouns"]) == {
+        planner.LIWC_RESOURCE: {"liwc_posemo": "posemo", "i_pronouns": "i"},
+        planner.EMOLEX_RESOURCE: {"emolex_joy": "joy"},
+    }
+    with pytest.raises(ValueError, match="Unknown feature 'sarcasm'"):
+        planner.plan(["sarcasm"])
+
+
+def test_multi_term_featurizer_counts_each_list():
+    featurizer = featurizers.MultiTermFeaturizer(
+        {"a": ["it sounds like", "sounds like"], "b": ["sounds like", "always"]}
+    )
+    line = featurizers.Line(text="it sounds like you always always sound like")
+    assert featurizer.featurize_multi(line) == [(2, "a"), (3, "b")]
+    assert featurizer.featurize_batch([line]).tolist() == [[2.0, 3.0]]
+    with pytest.raises(TypeError, match="use featurize_multi"):
+        featurizer.featurize(line)
+    single = featurizers.MultiTermFeaturizer({"b": ["sounds like", "always"]})
+    assert single.featurize(line) == (3, "b")
+
+
+def test_multi_emolex_featurizer_matches_single_emotion_featurizers(tmp_path):
+    path_to_emolex = tmp_path / "emolex.txt"
+    entries = [
+        ("happy", "joy", 1),
+        ("happy", "positive", 1),
+        ("Happy", "joy", 1),
+        ("well-being", "positive", 1),
+        ("well", "positive", 1),
+        ("don't", "negative", 1),
+        ("sad", "sadness", 1),
+        ("sad", "negative", 1),
+        ("sad", "joy", 0),
+    ]
+    path_to_emolex.write_text(
+        "".join(f"{word}\t{emo}\t{flag}\n" for word, emo, flag in entries)
+    )
+    lines = [
+        featurizers.Line(text="Happy happy, sad well-being; I don't feel well."),
+        featurizers.Line(text="nothing to see"),
+        featurizers.Line(text=""),
+    ]
+
+    featurizer = featurizers.MultiEmoLexFeaturizer(path_to_lexicon=str(path_to_emolex))
+    assert featurizer.feature_descrs == [
+        "emolex_joy",
+        "emolex_positive",
+        "emolex_negative",
+        "emolex_sadness",
+    ]
+    expected = np.column_stack(
+        [
+            featurizers.EmoLexFeaturizer(
+                descr, descr[len("emolex_") :], str(path_to_emolex)
+            ).featurize_batch(lines)
+            for descr in featurizer.feature_descrs
+        ]
+    )
+    np.testing.assert_array_equal(featurizer.featurize_batch(lines), expected)
+    assert expected[0].tolist() == [4, 5, 2, 1]
+    assert featurizer.featurize_multi(lines[0])[1] == (5, "emolex_positive")
+
+
+def test_multi_emolex_signature_does_not_depend_on_hash_seed(tmp_path):
+    _, path_to_emolex = synthetic.write_lexicons(str(tmp_path / "lex"))
+    with open(path_to_emolex, mode="a", encoding="utf-8") as f:
+        f.write("well-being\tpositive\t1\nself-doubt\tnegative\t1\n")
+    script = (
+        "import sys; sys.path.append(sys.argv[1]);"
+        " from features import featurizers;"
+        " print(featurizers.MultiEmoLexFeaturizer("
+        "path_to_lexicon=sys.argv[2]).signature())"
+    )
+    signatures = [
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                script,
+                os.path.abspath("../psynlp"),
+                path_to_emolex,
+            ],
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for seed in ("1", "2")
+    ]
+    assert signatures[0] == signatures[1]
+    # Phrase entries are part of the signature too
+    assert "well-being" in signatures[0]
+
+
+def test_lazy_transcript_only_builds_and_runs_what_is_read(tmp_path):
+    path_to_liwc, path_to_emolex = synthetic.write_lexicons(str(tmp_path / "lex"))
+    (path,) = synthetic.write_corpus(str(tmp_path / "corpus"), 1, turns_per_session=60)
+    expected = parse.parse_transcript(
+        path,
+        planner.build_featurizers(
+            path_to_liwc=path_to_liwc, path_to_emolex=path_to_emolex
+        ),
+    )
+
+    featurizer_objs = planner.build_featurizers(
+        path_to_liwc=path_to_liwc, path_to_emolex=path_to_emolex, lazy=True
+    )
+    transcript = parse.parse_transcript(path, featurizer_objs, lazy=True)
+    assert transcript.schema == expected.schema
+    assert not any(obj.is_built for obj in featurizer_objs)
+    assert transcript.pending_features == planner.DEFAULT_FEATURES
+
+    line = transcript.lines[3]
+    assert line.features["hedging"] == expected.lines[3].features["hedging"]
+    # Only the phrase lists were needed
+    assert [obj.is_built for obj in featurizer_objs] == [False, False, True, False]
+    assert "hedging" not in transcript.pending_features
+    assert "absolutist" not in transcript.pending_features
+
+    assert transcript.to_tsv() == expected.to_tsv()
+    assert transcript.pending_features == []
+    assert all(obj.is_built for obj in featurizer_objs)
+
+
+def test_registered_phrase_list_is_planned_with_the_tactics():
+    planner.register_phrase_list("validating", ["that makes sense", "of course"])
+    try:
+        with pytest.raises(ValueError):
+            planner.register_phrase_list("validating", ["sure"])
+        (featurizer_obj,) = planner.build_featurizers(["hedging", "validating"])
+        assert featurizer_obj.feature_descrs == ["hedging", "validating"]
+        line = featurizers.Line(text="of course i think that makes sense")
+        assert featurizer_obj.featurize_batch([line]).tolist() == [[1.0, 2.0]]
+    finally:
+        del planner.FEATURES["validating"]
+        del planner.PHRASE_LISTS["validating"]
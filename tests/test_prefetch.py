@@ -0,0 +1,53 @@
+import sys
+import threading
+
+sys.path.append("../psynlp")
+
+import pytest
+
+from features import prefetch
+
+
+@pytest.fixture
+def text_paths(tmp_path):
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i}.txt"
+        path.write_text("x" * 100 * (i + 1))
+        paths.append(str(path))
+    return paths
+
+
+def test_prefetcher_yields_texts_in_order(text_paths, tmp_path):
+    missing = str(tmp_path / "missing.txt")
+    results = list(prefetch.Prefetcher(text_paths + [missing], depth=3))
+    assert [path for path, _, _ in results] == text_paths + [missing]
+    for path, text, error in results[:-1]:
+        assert error is None
+        assert text == open(path).read()
+    assert results[-1][1] is None
+    assert isinstance(results[-1][2], FileNotFoundError)
+
+
+@pytest.mark.parametrize("depth,max_bytes", [(1, 10**6), (4, 10**6), (8, 1000)])
+def test_prefetcher_respects_depth_and_memory_cap(text_paths, depth, max_bytes):
+    lock = threading.Lock()
+    read = []
+    ahead = []
+
+    def read_fn(path):
+        with lock:
+            read.append(path)
+        return prefetch.read_text(path)
+
+    for path, _, _ in prefetch.Prefetcher(
+        text_paths, depth=depth, max_bytes=max_bytes, read_fn=read_fn
+    ):
+        # Reads submitted but not yet handed back, besides the current one
+        with lock:
+            pending = read[read.index(path) + 1 :]
+        ahead.append(pending)
+    for pending in ahead:
+        assert len(pending) <= depth - 1
+        assert sum(prefetch._file_size(p) for p in pending) <= max_bytes
+    assert read == text_paths
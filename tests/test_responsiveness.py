@@ -0,0 +1,78 @@
+import sys
+
+sys.path.append("../psynlp")
+
+import io
+
+import numpy as np
+
+from features import featurizers
+from features import parse
+from features import responsiveness
+from features import synthetic
+
+
+def _brute_force(transcript, name, window):
+    # Straightforward per-turn loop over the lines, for comparison
+    col = transcript.schema.index[name]
+    values = transcript.feature_matrix[:, col]
+    words = transcript.word_counts
+    speakers = [line.speaker for line in transcript.lines]
+    expected = {}
+    pairs = []
+    patient_turns = []
+    last_patient = None
+    for i, speaker in enumerate(speakers):
+        if speaker == "P":
+            last_patient = i
+            patient_turns.append(values[i])
+        elif speaker == "T" and last_patient is not None:
+            t, p = values[i], values[last_patient]
+            r_t, r_p = t / words[i], p / words[last_patient]
+            pairs.append((t, p))
+            xs, ys = zip(*pairs[-window:])
+            corr = np.nan
+            if len(xs) >= 2 and np.std(xs) > 0 and np.std(ys) > 0:
+                corr = np.corrcoef(xs, ys)[0, 1]
+            expected[i] = [
+                p,
+                t - p,
+                1 - abs(r_t - r_p) / (r_t + r_p + 0.0001),
+                np.mean(patient_turns[-window:]),
+                corr,
+            ]
+    return expected
+
+
+def test_responsiveness_matches_brute_force(tmp_path):
+    featurizer_objs = [
+        featurizers.HedgingFeaturizer(),
+        featurizers.AbsolutistFeaturizer(),
+    ]
+    (path,) = synthetic.write_corpus(str(tmp_path), 1, turns_per_session=200)
+    transcript = parse.parse_transcript(path, featurizer_objs)
+
+    columns, measures = responsiveness.compute_responsiveness(transcript, window=4)
+    assert columns[:5] == [
+        "hedging_patient_lag",
+        "hedging_delta",
+        "hedging_match",
+        "hedging_patient_window",
+        "hedging_window_corr",
+    ]
+    assert measures.shape == (len(transcript.lines), len(columns))
+    for name in ("hedging", "absolutist"):
+        expected = _brute_force(transcript, name, window=4)
+        cols = [
+            columns.index(f"{name}_{measure}") for measure in responsiveness.MEASURES
+        ]
+        responding = np.flatnonzero(~np.isnan(measures[:, cols[0]]))
+        assert responding.tolist() == sorted(expected)
+        for i, row in expected.items():
+            np.testing.assert_allclose(measures[i, cols], row, equal_nan=True)
+
+    out = io.StringIO()
+    responsiveness.write_tsv(out, [transcript], window=4)
+    rows = out.getvalue().splitlines()
+    assert rows[0].split("\t") == ["session_id", "line_id", *columns]
+    assert len(rows) == 1 + len(expected)
@@ -0,0 +1,117 @@
+import filecmp
+import os
+import sys
+
+sys.path.append("../psynlp")
+
+import pytest
+
+from features import columnar
+from features import featurizers
+from features import parse
+from features import shard
+from features import synthetic
+
+
+def test_assign_shards_is_deterministic_and_balanced():
+    keys = [f"{i:06d}" for i in range(200)]
+    sizes = [(i * 7919) % 1000 + 1 for i in range(200)]
+    shards = shard.assign_shards(keys, 4, sizes)
+    assert shards == shard.assign_shards(keys, 4, sizes)
+    assert sorted(set(shards)) == [0, 1, 2, 3]
+    loads = [sum(s for s, k in zip(sizes, shards) if k == i) for i in range(4)]
+    assert max(loads) - min(loads) <= max(sizes)
+
+    hashed = shard.assign_shards(keys, 4)
+    assert hashed == [shard.stable_hash(key) % 4 for key in keys]
+    with pytest.raises(ValueError):
+        shard.assign_shards(keys, 0)
+
+
+def test_shard_path():
+    assert shard.shard_path("out/transcripts.tsv.gz", 3, 12) == (
+        "out/transcripts.shard-03-of-12.tsv.gz"
+    )
+    assert shard.shard_path("columnar/", 0, 2) == "columnar.shard-0-of-2"
+
+
+def _write_outputs(transcripts, out, columnar_out, schema, manifest=None):
+    with columnar.ColumnarWriter(columnar_out, schema) as writer:
+        with open(out, mode="w", newline="") as f:
+            f.write("\t".join(featurizers.TSV_HEADER) + "\n")
+            for i, transcript in transcripts:
+                transcript.to_tsv(out=f)
+                writer.write_transcript(transcript)
+                if manifest is not None:
+                    manifest.add(manifest.assigned[i], transcript)
+
+
+def test_merged_shards_match_single_run(tmp_path):
+    paths = synthetic.write_corpus(str(tmp_path / "corpus"), 7, turns_per_session=30)
+    # An empty transcript and one that fails to parse
+    open(paths[2], mode="w").close()
+    paths.insert(4, str(tmp_path / "S1_069999_P1_03.02.01_A.TXT"))
+    featurizer_objs = [
+        featurizers.HedgingFeaturizer(),
+        featurizers.WordsPerSecondFeaturizer(),
+    ]
+    schema = featurizers.feature_schema(featurizer_objs)
+
+    def parse_paths(paths):
+        for i, transcript, _ in parse.parse_transcripts(
+            paths, featurizer_objs=featurizer_objs
+        ):
+            if transcript is not None:
+                yield i, transcript
+
+    _write_outputs(
+        parse_paths(paths),
+        str(tmp_path / "expected.tsv"),
+        str(tmp_path / "expected"),
+        schema,
+    )
+
+    num_shards = 3
+    shard_of = shard.assign_shards(
+        [os.path.basename(p) for p in paths],
+        num_shards,
+        [parse._file_size(p) for p in paths],
+    )
+    manifest_paths = []
+    for shard_num in range(num_shards):
+        assigned = [i for i, s in enumerate(shard_of) if s == shard_num]
+        out = shard.shard_path(str(tmp_path / "transcripts.tsv"), shard_num, 3)
+        columnar_out = shard.shard_path(str(tmp_path / "columnar"), shard_num, 3)
+        manifest = shard.ShardManifest(
+            shard_num, num_shards, len(paths), assigned, out, columnar_out
+        )
+        _write_outputs(
+            parse_paths([paths[i] for i in assigned]),
+            out,
+            columnar_out,
+            schema,
+            manifest,
+        )
+        manifest.write(shard.manifest_path(out))
+        manifest_paths.append(shard.manifest_path(out))
+
+    manifests = [shard.ShardManifest.read(fpath) for fpath in manifest_paths]
+    shard.check_manifests(manifests)
+    shard.merge_tsv(manifests, str(tmp_path / "merged.tsv"))
+    assert filecmp.cmp(
+        tmp_path / "merged.tsv", tmp_path / "expected.tsv", shallow=False
+    )
+    shard.merge_columnar(manifests, str(tmp_path / "merged"))
+    expected = columnar.to_dataframe(str(tmp_path / "expected"), with_text=True)
+    merged = columnar.to_dataframe(str(tmp_path / "merged"), with_text=True)
+    assert len(merged) > 0
+    assert merged.equals(expected)
+    assert columnar.read_meta(str(tmp_path / "merged")) == columnar.read_meta(
+        str(tmp_path / "expected")
+    )
+
+    with pytest.raises(ValueError, match="Expected shards"):
+        shard.check_manifests(manifests[:2])
+    manifests[0].assigned = manifests[0].assigned[1:]
+    with pytest.raises(ValueError, match="don't partition"):
+        shard.check_manifests(manifests)
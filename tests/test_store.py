@@ -0,0 +1,99 @@
+import sys
+
+sys.path.append("../psynlp")
+
+import numpy as np
+import pytest
+
+from features import featurizers
+from features import parse
+from features import planner
+from features import store
+from features import synthetic
+from features import utils
+
+
+def test_store_round_trip_matches_parsed_transcripts(tmp_path):
+    path_to_liwc, path_to_emolex = synthetic.write_lexicons(str(tmp_path / "lex"))
+    paths = synthetic.write_corpus(str(tmp_path / "corpus"), 3, turns_per_session=80)
+    featurizer_objs = planner.build_featurizers(
+        list(planner.FEATURES),
+        path_to_liwc=path_to_liwc,
+        path_to_emolex=path_to_emolex,
+    )
+    expected = [parse.parse_transcript(path, featurizer_objs) for path in paths]
+
+    with store.StoreWriter(str(tmp_path / "store"), parse.PARSER_SETTINGS) as writer:
+        for transcript in expected:
+            writer.write_transcript(transcript)
+
+    corpus_store = store.CorpusStore(str(tmp_path / "store"))
+    assert len(corpus_store) == len(expected)
+    assert corpus_store.meta["parser_settings"] == parse.PARSER_SETTINGS
+    assert corpus_store.meta["num_lines"] == sum(len(t.lines) for t in expected)
+
+    for transcript, expected_transcript in zip(
+        corpus_store.featurize(featurizer_objs), expected
+    ):
+        assert transcript.session_id == expected_transcript.session_id
+        assert transcript.session_num == expected_transcript.session_num
+        assert transcript.fpath == expected_transcript.fpath
+        assert [str(line) for line in transcript.lines] == [
+            str(line) for line in expected_transcript.lines
+        ]
+        assert [line.line_id for line in transcript.lines] == [
+            line.line_id for line in expected_transcript.lines
+        ]
+        assert transcript.schema.columns() == expected_transcript.schema.columns()
+        np.testing.assert_array_equal(
+            transcript.feature_matrix, expected_transcript.feature_matrix
+        )
+
+
+def test_store_featurizes_stored_ids_without_splitting_text(tmp_path, monkeypatch):
+    paths = synthetic.write_corpus(str(tmp_path / "corpus"), 2, turns_per_session=40)
+    featurizer_objs = planner.build_featurizers(
+        ["hedging", "checking_for_understanding", "absolutist"]
+    )
+    expected = [parse.parse_transcript(path, featurizer_objs) for path in paths]
+    with store.StoreWriter(str(tmp_path / "store")) as writer:
+        for transcript in expected:
+            writer.write_transcript(transcript)
+
+    corpus_store = store.CorpusStore(str(tmp_path / "store"))
+    line_ids = corpus_store.line_ids(1, corpus_store.transcript(1).lines)
+    lines = expected[1].lines
+    for view, sequences in (
+        (line_ids.tokens, [line.lower_tokens for line in lines]),
+        (line_ids.pieces, [line.word_pieces for line in lines]),
+    ):
+        ids, offsets = view
+        strings = [corpus_store.vocabulary.strings[i] for i in ids.tolist()]
+        assert [
+            strings[start:end] for start, end in zip(offsets[:-1], offsets[1:])
+        ] == sequences
+
+    featurized = corpus_store.featurize(featurizer_objs)
+    # Featurizing the first session compiles the lexicon tables, which splits
+    # the terms, but none of the text is split
+    transcripts = [next(featurized)]
+
+    def split_word_pieces(text):
+        raise AssertionError("featurizing a store shouldn't split text")
+
+    monkeypatch.setattr(utils, "split_word_pieces", split_word_pieces)
+    transcripts.extend(featurized)
+    for transcript, expected_transcript in zip(transcripts, expected):
+        np.testing.assert_array_equal(
+            transcript.feature_matrix, expected_transcript.feature_matrix
+        )
+
+
+def test_store_rejects_text_it_cannot_rebuild(tmp_path):
+    transcript = featurizers.Transcript(
+        lines=[featurizers.Line(line_id="0", speaker="T", text="so  i think")],
+        session_id="060001",
+    )
+    writer = store.StoreWriter(str(tmp_path / "store"))
+    with pytest.raises(ValueError):
+        writer.write_transcript(transcript)
@@ -0,0 +1,52 @@
+import sys
+
+sys.path.append("../psynlp")
+
+from features import featurizers
+from features import liwc
+from features import parse
+from features import synthetic
+from features import utils
+
+
+def test_corpus_is_reproducible(tmp_path):
+    paths_a = synthetic.write_corpus(str(tmp_path / "a"), 3, turns_per_session=50)
+    paths_b = synthetic.write_corpus(str(tmp_path / "b"), 3, turns_per_session=50)
+    paths_c = synthetic.write_corpus(
+        str(tmp_path / "c"), 3, turns_per_session=50, seed=1
+    )
+    read = lambda path: open(path, encoding="utf-8").read()
+    assert [read(path) for path in paths_a] == [read(path) for path in paths_b]
+    assert [read(path) for path in paths_a] != [read(path) for path in paths_c]
+
+
+def test_corpus_parses_and_featurizes(tmp_path):
+    path_to_liwc, path_to_emolex = synthetic.write_lexicons(str(tmp_path / "lex"))
+    (path_to_transcript,) = synthetic.write_corpus(
+        str(tmp_path / "corpus"), 1, turns_per_session=100
+    )
+    assert utils.extract_metadata_from_path(path_to_transcript) is not None
+    speakers, start_times, texts = utils.read_transcript(path_to_transcript)
+    assert set(speakers) == {"P", "T"}
+    assert start_times == sorted(start_times)
+
+    transcript = parse.parse_transcript(
+        path_to_transcript, parse.build_featurizers(path_to_liwc, path_to_emolex)
+    )
+    assert len(transcript.lines) > 0
+    totals = {
+        name: sum(line.features[name] for line in transcript.lines)
+        for name in ("i_pronouns", "past_oriented", "negative", "hedging")
+    }
+    assert all(total > 0 for total in totals.values())
+
+
+def test_synthetic_lexicons(tmp_path):
+    path_to_liwc, path_to_emolex = synthetic.write_lexicons(str(tmp_path))
+    liwc_obj = liwc.LIWC(path_to_liwc, use_compiled=False)
+    assert sorted(liwc_obj.search("i")) == ["i", "ppron", "pronoun"]
+    assert liwc_obj.search("happiness") == ["posemo"]
+    positive = featurizers.EmoLexFeaturizer(
+        "positive", "positive", path_to_lexicon=path_to_emolex
+    )
+    assert set(synthetic.CATEGORY_WORDS["posemo"]) <= positive.target_set
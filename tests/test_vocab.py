@@ -0,0 +1,141 @@
+import sys
+
+sys.path.append("../psynlp")
+
+import numpy as np
+import pytest
+
+from features import featurizers
+from features import online
+from features import parse
+from features import synthetic
+from features import utils
+from features import vocab
+from features.featurizers import Line
+
+
+def test_phrase_table_matches_phrase_matcher():
+    terms = [
+        "it sounds like",
+        "sounds like",
+        "all",
+        "All",
+        "no no",
+        "a a a",
+        "ok!",
+        "don't",
+        "i see",
+        "see",
+    ]
+    groups = [0, 1, 0, 1, 1, 0, 1, 0, 2, 2]
+    texts = [
+        "It sounds like y'all see it all i seem to i see",
+        "no no no no no and a a a a a a a",
+        "ok! ok!x don't dont don't",
+        "",
+        "sounds like",
+        "no",
+    ]
+    lines = [Line(text=text) for text in texts]
+    vocabulary = vocab.Vocabulary()
+    table = vocab.PhraseTable(terms, groups, num_groups=4, vocabulary=vocabulary)
+    matcher = utils.PhraseMatcher(terms, groups)
+
+    counts = table.count(vocab.LineIds(lines, vocabulary))
+
+    expected = np.zeros((len(lines), 4))
+    for i, line in enumerate(lines):
+        group_counts = matcher.count_groups(line.word_pieces)
+        expected[i, : len(group_counts)] = group_counts
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_transcript_features_from_shared_vocabulary_ids(synthetic_liwc):
+    featurizer_objs = [
+        featurizers.MultiLIWCFeaturizer(path_to_lexicon=synthetic_liwc),
+        featurizers.HedgingFeaturizer(),
+        featurizers.CheckingForUnderstandingFeaturizer(),
+    ]
+    texts = [
+        "i was we were",
+        "it sounds like i think so",
+        "you seem to be saying we were wrong",
+    ]
+    transcript = featurizers.Transcript(
+        lines=[
+            Line(line_id=str(i), speaker="T", start_time=float(i), text=text)
+            for i, text in enumerate(texts)
+        ],
+        session_id="060001",
+    )
+    transcript.calculate_features(featurizer_objs)
+    # Words that first showed up in this transcript are compiled on the fly
+    transcript.lines.append(Line(line_id="3", speaker="P", text="were unseen ones"))
+    transcript.calculate_features(featurizer_objs)
+
+    for line in transcript.lines:
+        expected = {}
+        for featurizer_obj in featurizer_objs:
+            for feat_value, feat_descr in featurizer_obj.featurize_multi(line):
+                expected[feat_descr] = feat_value
+        assert dict(line.features) == expected
+
+
+def test_featurize_ids_falls_back_to_featurize_batch():
+    class LengthFeaturizer(featurizers.Featurizer):
+        # Hints at ids without featurizing them
+        uses_vocab = True
+
+        def featurize(self, line: Line):
+            return len(line.tokens), self.feature_descr
+
+    featurizer = LengthFeaturizer("length")
+    lines = [Line(text="so i think"), Line(text="")]
+    expected = [[3.0], [0.0]]
+    assert featurizer.featurize_batch(lines).tolist() == expected
+    assert featurizer.featurize_ids(vocab.LineIds(lines)).tolist() == expected
+    transcript = featurizers.Transcript(lines=lines, session_id="060001")
+    transcript.calculate_features([featurizer, featurizers.HedgingFeaturizer()])
+    assert [line.features["length"] for line in transcript.lines] == [3, 0]
+
+
+def test_multi_emolex_featurize_points_to_featurize_multi(synthetic_emolex):
+    featurizer = featurizers.MultiEmoLexFeaturizer(path_to_lexicon=synthetic_emolex)
+    with pytest.raises(TypeError, match="use featurize_multi"):
+        featurizer.featurize(Line(text="happy"))
+
+
+def test_runs_intern_into_their_own_vocabulary(tmp_path, synthetic_liwc):
+    paths = synthetic.write_corpus(str(tmp_path / "corpus"), 2, turns_per_session=30)
+    featurizer_objs = [
+        featurizers.MultiLIWCFeaturizer(path_to_lexicon=synthetic_liwc),
+        featurizers.HedgingFeaturizer(),
+    ]
+    num_strings = len(vocab.VOCABULARY)
+    results = list(parse.parse_transcripts(paths, featurizer_objs=featurizer_objs))
+    expected = parse.parse_transcript(
+        paths[1], featurizer_objs, vocabulary=vocab.Vocabulary()
+    )
+    np.testing.assert_array_equal(results[1][1].feature_matrix, expected.feature_matrix)
+
+    vocabulary = vocab.Vocabulary()
+    online_transcript = online.OnlineTranscript(
+        "060001", featurizer_objs, vocabulary=vocabulary
+    )
+    online_transcript.add_line("T", 0.0, "it sounds like we were")
+    online_transcript.close()
+    assert "sounds" in vocabulary.strings
+    assert len(vocab.VOCABULARY) == num_strings
+
+
+def test_vocabulary_clear_drops_strings_and_tables(synthetic_liwc):
+    featurizer = featurizers.MultiLIWCFeaturizer(path_to_lexicon=synthetic_liwc)
+    lines = [Line(text="i was we were")]
+    vocabulary = vocab.Vocabulary()
+    expected = featurizer.featurize_ids(vocab.LineIds(lines, vocabulary))
+    vocabulary.clear()
+    assert len(vocabulary) == 0
+    lines = [Line(text="we were i was")]
+    np.testing.assert_array_equal(
+        featurizer.featurize_ids(vocab.LineIds(lines, vocabulary)), expected
+    )